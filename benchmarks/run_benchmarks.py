@@ -0,0 +1,237 @@
+"""Benchmarks reproducibles y sin red del asistente EV.
+
+Usa un snapshot falso (benchmarks/stub_snapshot/inference.py) en lugar del
+modelo de Hugging Face y StubChatModel en lugar de ChatGroq. Guarda los
+resultados en JSON para comparar entre commits:
+
+    python -m benchmarks.run_benchmarks                      # -> benchmarks/results/<commit>.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<otro>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+STUB_SNAPSHOT_DIR = os.path.join(BENCH_DIR, "stub_snapshot")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# Todo offline: el modelo sale del snapshot falso, sin caché de predicciones
+# (para medir el modelo en sí) y sin variables de entorno de Groq.
+os.environ["EV_MODEL_LOCAL_DIR"] = STUB_SNAPSHOT_DIR
+# Sin descargas (p. ej. el encoding de tiktoken): los tokens se estiman por caracteres
+os.environ["EV_MODEL_OFFLINE"] = "1"
+os.environ["EV_PREDICTION_CACHE_SIZE"] = "0"
+os.environ["EV_ANSWER_RENDERER"] = "llm"
+os.environ.pop("EV_INFERENCE_URL", None)
+
+import numpy as np
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.resources import resources
+from src.core.session_completer import SessionCompleter
+from src.core.telemetry import metrics
+from src.model.ev_model import EVEnergyModel
+from src.nlp.answer_renderer import VARIANT_TEMPLATE, AnswerRouter
+from src.pipeline.ev_pipeline import EVEnergyPipeline
+
+
+# Mensajes de chat: el primero lo resuelve el extractor local, el segundo
+# necesita la extracción del LLM (duración escrita en palabras). Ambos
+# resuelven el vehículo sin ambigüedad, así que llegan a la predicción.
+FAST_PATH_MESSAGE = "Tesla Model 3 Long Range AWD 2021 del 20% al 80% en 1.5 horas"
+LLM_PATH_MESSAGE = "Tengo un Kia EV6 Long Range AWD, lo cargué del 20% al 80% en noventa minutos"
+LLM_PATH_EXTRACTION = {
+    "brand": "Kia", "model": "EV6 Long Range AWD", "year": None,
+    "soc_start": 20, "soc_end": 80, "duration_hours": 1.5,
+}
+
+# (brand, model) que resuelve cada etapa de find_vehicle_row
+FIND_VEHICLE_CASES = {
+    "exact": ("Tesla", "Model 3 Long Range AWD"),
+    "contains": ("tes", "model 3 long"),
+    "tokens": ("Tesla", "range long"),
+    "model_only": ("Marca desconocida", "ioniq 5"),
+    "not_found": ("Marca desconocida", "zzz qqq"),
+}
+
+
+def _time_call(fn: Callable[[], Any], min_seconds: float = 0.2, repeats: int = 5) -> Dict[str, float]:
+    """Calibra el número de llamadas por repetición y devuelve µs por llamada."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds / repeats or number >= 1_000_000:
+            break
+        number *= 10
+
+    samples: List[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "calls_per_repeat": number,
+        "repeats": repeats,
+        "min_us": min(samples),
+        "median_us": statistics.median(samples),
+        "mean_us": statistics.fmean(samples),
+        "max_us": max(samples),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    min_seconds = 0.05 if quick else 0.2
+    results: Dict[str, Any] = {}
+
+    def bench(name: str, fn: Callable[[], Any], **extra: Any) -> None:
+        stats = _time_call(fn, min_seconds=min_seconds)
+        stats.update(extra)
+        results[name] = stats
+        print(f"{name:<45} {stats['median_us']:>12.2f} µs")
+
+    stub_llm = StubChatModel(extraction=LLM_PATH_EXTRACTION)
+    resources.override("llm", stub_llm)
+
+    from src.nlp import llm_ev_assistant as assistant
+
+    cold_start = time.perf_counter()
+    assistant.warm_up()
+    results["cold_start_resources"] = {
+        "seconds": time.perf_counter() - cold_start,
+        "resources": resources.stats(),
+    }
+
+    bench("normalize_text", lambda: assistant._normalize_text("  Citroën ë-C4  Électrique "))
+    for stage, (brand, model) in FIND_VEHICLE_CASES.items():
+        bench(f"find_vehicle_row[{stage}]", lambda b=brand, m=model: assistant.find_vehicle_row(b, m))
+    bench("resolve_vehicle[typo]", lambda: assistant.resolve_vehicle("Hyundai", "Ionic 5"))
+    bench("find_vehicles_by_capacity", lambda: assistant.find_vehicles_by_capacity(77.4))
+
+    vehicle_row = assistant.find_vehicle_row(*FIND_VEHICLE_CASES["exact"])
+    base_session = {
+        "Battery Capacity (kWh)": None, "SoC_diff": 60.0, "Charging Duration (hours)": 1.5,
+        "Energy_est_SoC": None, "Charging_Rate": None, "Power_proxy": None,
+        "Charge_Efficiency": None, "Energy_per_SoC": None, "Vehicle Age (years)": None,
+    }
+    bench("complete_session_info", lambda: assistant.complete_session_info(base_session, vehicle_row))
+
+    completer = SessionCompleter()
+    bench("SessionCompleter.build_from_raw",
+          lambda: completer.build_from_raw(75.0, 20.0, 80.0, 1.5, 2023))
+
+    n_rows = 10_000
+    rng = np.random.default_rng(0)
+    raw = {
+        "battery_capacity_kwh": rng.uniform(30, 110, n_rows),
+        "soc_start_pct": rng.uniform(5, 50, n_rows),
+        "soc_end_pct": rng.uniform(55, 100, n_rows),
+        "charging_duration_hours": rng.uniform(0.2, 10, n_rows),
+        "vehicle_year": rng.integers(2012, 2026, n_rows),
+    }
+    bench(f"SessionCompleter.build_matrix_from_raw[{n_rows}]",
+          lambda: completer.build_matrix_from_raw(**raw), rows=n_rows)
+
+    pipeline = EVEnergyPipeline(local_dir=STUB_SNAPSHOT_DIR)
+    bench("EVEnergyPipeline.predict", lambda: pipeline.predict(75.0, 20.0, 80.0, 1.5, 2023))
+    bench(f"EVEnergyPipeline.predict_many[{n_rows}]", lambda: pipeline.predict_many(**raw), rows=n_rows)
+    # Mismo modelo con la tabla surrogate (construida en un directorio temporal)
+    surrogate_path = os.path.join(tempfile.mkdtemp(prefix="ev-surrogate-"), "ev_surrogate.npz")
+    surrogate_pipeline = EVEnergyPipeline(
+        model=EVEnergyModel(local_dir=STUB_SNAPSHOT_DIR, surrogate=True, surrogate_path=surrogate_path)
+    )
+    bench("EVEnergyPipeline.predict[surrogate]",
+          lambda: surrogate_pipeline.predict(75.0, 20.0, 80.0, 1.5, 2023))
+    bench(f"EVEnergyPipeline.predict_many[{n_rows},surrogate]",
+          lambda: surrogate_pipeline.predict_many(**raw), rows=n_rows)
+    sweep_end, sweep_hours = np.arange(30.0, 101.0, 5.0), [0.5, 1.0, 1.5, 2.0, 3.0]
+    bench(f"EVEnergyPipeline.sweep[{len(sweep_end) * len(sweep_hours)}]",
+          lambda: pipeline.sweep(75.0, 20.0, sweep_end, sweep_hours, vehicle_year=2023),
+          rows=len(sweep_end) * len(sweep_hours))
+
+    bench("run_llm_assistant[fast_path]", lambda: assistant.run_llm_assistant(FAST_PATH_MESSAGE))
+    bench("run_llm_assistant[llm_extraction]", lambda: assistant.run_llm_assistant(LLM_PATH_MESSAGE))
+
+    # Misma conversación con la respuesta final por plantilla (sin segunda llamada al LLM)
+    llm_router = assistant.answer_router
+    assistant.answer_router = AnswerRouter(variant=VARIANT_TEMPLATE)
+    try:
+        bench("run_llm_assistant[fast_path+template]", lambda: assistant.run_llm_assistant(FAST_PATH_MESSAGE))
+    finally:
+        assistant.answer_router = llm_router
+
+    return {
+        "meta": {
+            "git_commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+        # Desglose por etapa acumulado durante todas las mediciones
+        "stage_metrics": metrics.snapshot(),
+        "prompt_tokens": assistant.prompt_stats.snapshot(),
+    }
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    print(f"\nComparación con {baseline_path} ({baseline['meta'].get('git_commit')}):")
+    for name, stats in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or "median_us" not in stats or "median_us" not in old:
+            continue
+        ratio = stats["median_us"] / old["median_us"] if old["median_us"] else float("nan")
+        print(f"{name:<45} {old['median_us']:>12.2f} -> {stats['median_us']:>12.2f} µs  (x{ratio:.2f})")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks offline del asistente EV.")
+    parser.add_argument("--output", default=None,
+                        help="Archivo JSON de salida (por defecto benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--quick", action="store_true", help="Menos tiempo por medición")
+    args = parser.parse_args(argv)
+
+    report = run(quick=args.quick)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['git_commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Chat model falso que sustituye a ChatGroq en los benchmarks (sin red)."""
+
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+# Texto que solo aparece en el prompt de extracción de llm_ev_assistant
+EXTRACTION_MARKER = "Debes devolver un JSON EXACTO"
+
+DEFAULT_ANSWER = (
+    "Detecté tu vehículo y calculé la sesión de carga. Según el modelo, la energía "
+    "consumida estimada es la indicada en la predicción, en kWh."
+)
+
+
+class StubChatModel(BaseChatModel):
+    """Devuelve `extraction` como JSON para el prompt de extracción y `answer` para el resto.
+
+    `latency_s` simula el tiempo de red por llamada; la respuesta final se
+    emite palabra a palabra en `stream`.
+    """
+
+    extraction: Dict[str, Any] = {}
+    answer: str = DEFAULT_ANSWER
+    latency_s: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        prompt = "\n".join(str(m.content) for m in messages)
+        if EXTRACTION_MARKER in prompt:
+            return json.dumps(self.extraction, ensure_ascii=False)
+        return self.answer
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for i, word in enumerate(self._reply(messages).split(" ")):
+            text = word if i == 0 else " " + word
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
@@ -0,0 +1,189 @@
+"""Servidor local compatible con la API de chat de OpenAI/Groq, para probar el cliente LLM sin red.
+
+Uso:
+    python -m benchmarks.stub_llm_server --port 8700 --latency-ms 200 --fail-rate 0.2
+    export EV_LLM_BASE_URL="http://127.0.0.1:8700"
+    export GROQ_API_KEY="stub"
+
+Atiende POST /v1/chat/completions y /openai/v1/chat/completions (la ruta que
+usa el SDK de Groq), con y sin `stream`. Responde con el JSON de
+`--extraction` al prompt de extracción y con `--answer` al resto. Con
+`--fail-rate` devuelve 503 (o 429 con Retry-After si `--rate-limit`) en esa
+fracción de peticiones, y con `--fail-first N` en las N primeras, para
+ejercitar reintentos y circuit breaker.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from benchmarks.stub_llm import DEFAULT_ANSWER, EXTRACTION_MARKER
+
+
+CHAT_PATHS = ("/v1/chat/completions", "/openai/v1/chat/completions")
+
+
+class StubLLMBehaviour:
+    def __init__(
+        self,
+        extraction: Optional[Dict[str, Any]] = None,
+        answer: str = DEFAULT_ANSWER,
+        latency_s: float = 0.0,
+        fail_rate: float = 0.0,
+        rate_limit: bool = False,
+        seed: Optional[int] = None,
+        fail_first: int = 0,
+    ):
+        self.extraction = extraction or {}
+        self.answer = answer
+        self.latency_s = latency_s
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.fail_first = fail_first
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.fail_rate or self.requests <= self.fail_first
+            self.failures += int(fail)
+            return fail
+
+    def reply(self, messages: List[Dict[str, Any]]) -> str:
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        if EXTRACTION_MARKER in prompt:
+            return json.dumps(self.extraction, ensure_ascii=False)
+        return self.answer
+
+
+def make_handler(behaviour: StubLLMBehaviour):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path not in CHAT_PATHS:
+                self._send_json(404, {"error": {"message": f"Ruta desconocida {self.path}"}})
+                return
+
+            if behaviour.latency_s:
+                time.sleep(behaviour.latency_s)
+            if behaviour.should_fail():
+                if behaviour.rate_limit:
+                    self._send_json(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0.1"})
+                else:
+                    self._send_json(503, {"error": {"message": "unavailable"}})
+                return
+
+            text = behaviour.reply(payload.get("messages", []))
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = payload.get("model", "stub")
+            created = int(time.time())
+
+            if not payload.get("stream"):
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def build_server(behaviour: StubLLMBehaviour, host: str = "127.0.0.1", port: int = 8700) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(behaviour))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stand-in local de la API de chat de OpenAI/Groq.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fracción de peticiones que fallan")
+    parser.add_argument("--fail-first", type=int, default=0, help="Número de peticiones iniciales que fallan")
+    parser.add_argument("--rate-limit", action="store_true", help="Fallar con 429 + Retry-After en vez de 503")
+    parser.add_argument("--extraction", default="{}", help="JSON devuelto al prompt de extracción")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    args = parser.parse_args(argv)
+
+    behaviour = StubLLMBehaviour(
+        extraction=json.loads(args.extraction),
+        answer=args.answer,
+        latency_s=args.latency_ms / 1000.0,
+        fail_rate=args.fail_rate,
+        rate_limit=args.rate_limit,
+        fail_first=args.fail_first,
+    )
+    server = build_server(behaviour, args.host, args.port)
+    print(f"🧪 Stand-in LLM en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Snapshot de prueba con la misma interfaz que el `inference.py` de Hugging Face.
+
+predict() es una fórmula física sencilla (energía estimada / eficiencia con
+un pequeño término por edad), suficiente para medir el coste del código que
+rodea al modelo sin depender de TensorFlow ni de la red.
+"""
+
+import numpy as np
+
+FEATURE_NAMES = [
+    "Battery Capacity (kWh)",
+    "SoC_diff",
+    "Charging Duration (hours)",
+    "Energy_est_SoC",
+    "Charging_Rate",
+    "Power_proxy",
+    "Charge_Efficiency",
+    "Energy_per_SoC",
+    "Vehicle Age (years)",
+]
+
+
+def get_feature_names():
+    return list(FEATURE_NAMES)
+
+
+def _column(session_info, name):
+    value = session_info[name]
+    return np.asarray(value if hasattr(value, "__len__") else [value], dtype=float)
+
+
+def predict(session_info):
+    """Acepta un dict (una sesión) o un DataFrame (lote)."""
+    energy = _column(session_info, "Energy_est_SoC")
+    efficiency = _column(session_info, "Charge_Efficiency")
+    age = np.nan_to_num(_column(session_info, "Vehicle Age (years)"))
+    return (energy / efficiency * (1.0 + 0.01 * age)).tolist()
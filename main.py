@@ -1,7 +1,16 @@
 
-"""Ejemplo simple por consola para la pipeline de energía EV."""
+"""Ejemplo simple por consola para la pipeline de energía EV.
+
+Sin argumentos puntúa una sesión de ejemplo. Con argumentos actúa como el
+scoring por lotes (ver src/pipeline/batch_scoring.py):
+
+    python main.py sesiones.csv predicciones.csv --chunk-size 5000
+"""
+
+import sys
 
 from src.pipeline.ev_pipeline import EVEnergyPipeline
+from src.pipeline import batch_scoring
 
 
 def main():
@@ -24,4 +33,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        batch_scoring.main(sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,19 @@
+"""Lectura de opciones booleanas desde variables de entorno, común a todos los módulos."""
+
+import os
+
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """True si `name` vale 1/true/yes (sin distinguir mayúsculas); `default` si no está definida."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+def offline_mode() -> bool:
+    """Modo sin red (EV_MODEL_OFFLINE / HF_HUB_OFFLINE): solo snapshots y encodings ya descargados."""
+    return env_flag("EV_MODEL_OFFLINE") or env_flag("HF_HUB_OFFLINE")
@@ -0,0 +1,272 @@
+"""Artefacto binario precompilado del EV-DB para un arranque rápido.
+
+En lugar de parsear `EV-DB.csv` y reconstruir el `VehicleIndex` en cada
+proceso, se compila una vez a un directorio junto al CSV:
+
+    data/EV-DB.csv.artifact/
+        meta.json            versión, huella del CSV (tamaño, mtime, sha256) y columnas
+        col_<i>.npy          columnas numéricas tipadas (el DataFrame las usa mapeadas con mmap)
+        col_<i>.codes.npy    columnas de texto internadas: códigos enteros...
+        col_<i>.values.npy   ...y sus valores únicos (se decodifican en memoria)
+        index.pkl            `VehicleIndex` ya construido (nombres normalizados incluidos)
+
+Si el CSV cambia (o el código del índice, o las versiones de pandas/numpy),
+el artefacto se considera obsoleto y se recompila automáticamente.
+
+`index.pkl` es un pickle: cargarlo ejecuta código, así que el directorio del
+artefacto debe ser de confianza (lo escribe este mismo proceso o el build de
+la imagen). Si el directorio o el pickle pertenecen a otro usuario o tienen
+permiso de escritura para grupo u otros, no se deserializa y el índice se
+reconstruye a partir de las columnas.
+
+    python -m src.core.ev_db_artifact build data/EV-DB.csv
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import stat
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.core import vehicle_index as _vehicle_index_module
+from src.core.vehicle_index import VehicleIndex
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+META_NAME = "meta.json"
+INDEX_NAME = "index.pkl"
+ARTIFACT_SUFFIX = ".artifact"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _code_fingerprint() -> str:
+    """Huella del código que define el índice picklado: si cambia, el pickle no vale."""
+    with open(_vehicle_index_module.__file__, "rb") as fh:
+        source = fh.read()
+    versions = f"{FORMAT_VERSION}|{pd.__version__}|{np.__version__}".encode("utf-8")
+    return hashlib.sha256(source + versions).hexdigest()[:16]
+
+
+def _trusted(path: str) -> bool:
+    """True si `path` es del usuario actual (o de root) y nadie más puede escribirlo."""
+    if not hasattr(os, "getuid"):
+        return True  # sin uid/permisos POSIX no hay nada que comprobar
+    info = os.stat(path)
+    if info.st_uid not in (os.getuid(), 0):
+        return False
+    return not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def default_artifact_dir(csv_path: str) -> str:
+    return csv_path + ARTIFACT_SUFFIX
+
+
+def source_fingerprint(csv_path: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    info = os.stat(csv_path)
+    return {
+        "size": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "sha256": sha256 or _sha256(csv_path),
+    }
+
+
+def _write_json(path: str, payload: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def build_artifact(csv_path: str, artifact_dir: Optional[str] = None) -> str:
+    """Compila el CSV (y su `VehicleIndex`) al directorio del artefacto; devuelve la ruta.
+
+    Se escribe en un directorio temporal y se intercambia al final, así un
+    lector concurrente nunca ve un artefacto a medio escribir.
+    """
+    artifact_dir = artifact_dir or default_artifact_dir(csv_path)
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path)
+
+    tmp_dir = f"{artifact_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Si algo falla a mitad, el artefacto anterior queda intacto y el temporal se borra
+    try:
+        columns: List[Dict[str, Any]] = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                np.save(os.path.join(tmp_dir, f"col_{i}.npy"), series.to_numpy())
+                columns.append({"name": name, "kind": "numeric", "dtype": str(series.dtype)})
+            else:
+                # Marcas y modelos se repiten mucho: se guardan como códigos + valores únicos
+                codes, uniques = pd.factorize(series)
+                code_dtype = np.int16 if len(uniques) < np.iinfo(np.int16).max else np.int32
+                np.save(os.path.join(tmp_dir, f"col_{i}.codes.npy"), codes.astype(code_dtype))
+                np.save(os.path.join(tmp_dir, f"col_{i}.values.npy"), np.asarray(uniques, dtype=str))
+                columns.append({"name": name, "kind": "interned", "dtype": str(series.dtype)})
+
+        with open(os.path.join(tmp_dir, INDEX_NAME), "wb") as fh:
+            pickle.dump(VehicleIndex(df), fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+        _write_json(os.path.join(tmp_dir, META_NAME), {
+            "format_version": FORMAT_VERSION,
+            "code_fingerprint": _code_fingerprint(),
+            "source": source_fingerprint(csv_path),
+            "rows": len(df),
+            "columns": columns,
+        })
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    old_dir = f"{artifact_dir}.old-{os.getpid()}"
+    if os.path.isdir(artifact_dir):
+        os.replace(artifact_dir, old_dir)
+    os.replace(tmp_dir, artifact_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    logger.info(
+        "📦 Artefacto EV-DB compilado en %s (%d filas, %.3f s)",
+        artifact_dir, len(df), time.perf_counter() - start,
+    )
+    return artifact_dir
+
+
+def _read_meta(artifact_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(artifact_dir, META_NAME), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(csv_path: str, artifact_dir: Optional[str] = None) -> bool:
+    """True si el artefacto corresponde al CSV actual y al código actual del índice.
+
+    Primero compara tamaño y mtime (barato); si solo cambió el mtime (p. ej.
+    tras un `git checkout`), confirma con el sha256 y actualiza la huella.
+    """
+    artifact_dir = artifact_dir or default_artifact_dir(csv_path)
+    meta = _read_meta(artifact_dir)
+    if not meta or meta.get("format_version") != FORMAT_VERSION:
+        return False
+    if meta.get("code_fingerprint") != _code_fingerprint():
+        return False
+
+    source = meta.get("source", {})
+    info = os.stat(csv_path)
+    if info.st_size != source.get("size"):
+        return False
+    if info.st_mtime_ns == source.get("mtime_ns"):
+        return True
+
+    sha256 = _sha256(csv_path)
+    if sha256 != source.get("sha256"):
+        return False
+    meta["source"] = source_fingerprint(csv_path, sha256=sha256)
+    try:
+        _write_json(os.path.join(artifact_dir, META_NAME), meta)
+    except OSError:
+        pass  # directorio de solo lectura: se volverá a hashear en el próximo arranque
+    return True
+
+
+@dataclass
+class EVDBArtifact:
+    """EV-DB cargado desde el artefacto: DataFrame con las columnas del CSV e índice."""
+
+    artifact_dir: str
+    meta: Dict[str, Any]
+    frame: pd.DataFrame
+
+    def vehicle_index(self) -> VehicleIndex:
+        """Carga el `VehicleIndex` precompilado (pickle escrito por `build_artifact`).
+
+        Si el pickle no es de confianza (ver `_trusted`) reconstruye el índice
+        desde `frame` en lugar de deserializarlo.
+        """
+        path = os.path.join(self.artifact_dir, INDEX_NAME)
+        if not (_trusted(self.artifact_dir) and _trusted(path)):
+            logger.warning("⚠️ %s no es de confianza (dueño o permisos); se reconstruye el índice", path)
+            return VehicleIndex(self.frame)
+        with open(path, "rb") as fh:
+            return pickle.load(fh)
+
+
+def _load_columns(artifact_dir: str, meta: Dict[str, Any]) -> pd.DataFrame:
+    data: Dict[str, Any] = {}
+    for i, column in enumerate(meta["columns"]):
+        if column["kind"] == "numeric":
+            data[column["name"]] = np.load(os.path.join(artifact_dir, f"col_{i}.npy"), mmap_mode="r")
+            continue
+        codes = np.load(os.path.join(artifact_dir, f"col_{i}.codes.npy"), mmap_mode="r")
+        values = np.load(os.path.join(artifact_dir, f"col_{i}.values.npy")).astype(object)
+        decoded = values[np.maximum(codes, 0)] if len(values) else np.full(len(codes), None, dtype=object)
+        decoded[np.asarray(codes) < 0] = None
+        data[column["name"]] = pd.Series(decoded).astype(column["dtype"])
+    # copy=False: las columnas numéricas siguen siendo vistas de los .npy mapeados
+    return pd.DataFrame(data, copy=False)
+
+
+def load_artifact(
+    csv_path: str,
+    artifact_dir: Optional[str] = None,
+    rebuild: bool = True,
+) -> EVDBArtifact:
+    """Carga el artefacto del CSV, recompilándolo antes si falta o está obsoleto.
+
+    Con `rebuild=False` un artefacto obsoleto lanza `FileNotFoundError`.
+    """
+    artifact_dir = artifact_dir or default_artifact_dir(csv_path)
+    if not is_fresh(csv_path, artifact_dir):
+        if not rebuild:
+            raise FileNotFoundError(f"Artefacto EV-DB ausente u obsoleto en {artifact_dir}")
+        logger.info("📦 Artefacto EV-DB ausente u obsoleto; recompilando desde %s", csv_path)
+        build_artifact(csv_path, artifact_dir)
+
+    meta = _read_meta(artifact_dir)
+    return EVDBArtifact(artifact_dir=artifact_dir, meta=meta, frame=_load_columns(artifact_dir, meta))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compila EV-DB.csv a un artefacto binario.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Compila (o recompila) el artefacto")
+    build.add_argument("csv_path")
+    build.add_argument("--out", default=None, help="Directorio del artefacto (por defecto <csv>.artifact)")
+    check = sub.add_parser("check", help="Indica si el artefacto está al día")
+    check.add_argument("csv_path")
+    check.add_argument("--out", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(f"Artefacto escrito en {build_artifact(args.csv_path, args.out)}")
+    elif is_fresh(args.csv_path, args.out):
+        print("Artefacto al día")
+    else:
+        print("Artefacto ausente u obsoleto")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
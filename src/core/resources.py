@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Resource:
+    factory: Callable[[], Any]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    instance: Any = None
+    built: bool = False
+    build_seconds: Optional[float] = None
+    accesses: int = 0
+    access_seconds: float = 0.0
+
+
+class ResourceRegistry:
+    """Registro de recursos costosos (dataset, modelo, cliente LLM) con creación perezosa.
+
+    Cada recurso se registra con una factory y se construye una sola vez por
+    proceso, la primera vez que alguien llama a `get`. Es thread-safe: si varios
+    hilos lo piden a la vez, solo uno ejecuta la factory. `stats()` expone el
+    tiempo de construcción (arranque en frío) y el coste acumulado de los
+    accesos posteriores.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, _Resource] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Registra (o reemplaza, si aún no se construyó) la factory de un recurso."""
+        with self._lock:
+            current = self._resources.get(name)
+            if current is not None and current.built:
+                return
+            self._resources[name] = _Resource(factory=factory)
+
+    def _entry(self, name: str) -> _Resource:
+        try:
+            return self._resources[name]
+        except KeyError:
+            raise KeyError(f"Recurso no registrado: {name!r}") from None
+
+    def get(self, name: str) -> Any:
+        start = time.perf_counter()
+        entry = self._entry(name)
+        if not entry.built:
+            with entry.lock:
+                if not entry.built:
+                    entry.instance = entry.factory()
+                    entry.build_seconds = time.perf_counter() - start
+                    entry.built = True
+                    logger.info("🕒 Recurso '%s' construido en %.3f s", name, entry.build_seconds)
+                    return entry.instance
+        # Solo los accesos "en caliente" cuentan para el coste por acceso
+        entry.accesses += 1
+        entry.access_seconds += time.perf_counter() - start
+        return entry.instance
+
+    def override(self, name: str, instance: Any) -> None:
+        """Fija una instancia ya construida (útil para pruebas y benchmarks)."""
+        with self._lock:
+            entry = _Resource(factory=lambda: instance, instance=instance, built=True, build_seconds=0.0)
+            self._resources[name] = entry
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Descarta la(s) instancia(s) para que se reconstruyan en el próximo `get`."""
+        with self._lock:
+            names = [name] if name is not None else list(self._resources)
+            for n in names:
+                entry = self._entry(n)
+                self._resources[n] = _Resource(factory=entry.factory)
+
+    def is_registered(self, name: str) -> bool:
+        with self._lock:
+            return name in self._resources
+
+    def is_built(self, name: str) -> bool:
+        return self._entry(name).built
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "built": entry.built,
+                "build_seconds": entry.build_seconds,
+                "warm_accesses": entry.accesses,
+                "mean_access_seconds": entry.access_seconds / entry.accesses if entry.accesses else None,
+            }
+            for name, entry in self._resources.items()
+        }
+
+
+# Registro compartido por todo el proceso
+resources = ResourceRegistry()
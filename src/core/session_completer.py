@@ -1,7 +1,25 @@
 
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence, Union
+
+import numpy as np
+
+ArrayLike = Union[Sequence[Optional[float]], np.ndarray]
+
+
+# Orden de las features tal como las espera el modelo (ver SessionInfo.to_model_dict)
+MODEL_FEATURE_NAMES: List[str] = [
+    "Battery Capacity (kWh)",
+    "SoC_diff",
+    "Charging Duration (hours)",
+    "Energy_est_SoC",
+    "Charging_Rate",
+    "Power_proxy",
+    "Charge_Efficiency",
+    "Energy_per_SoC",
+    "Vehicle Age (years)",
+]
 
 
 @dataclass
@@ -81,3 +99,62 @@ class SessionCompleter:
         )
 
         return session
+
+    def build_matrix_from_raw(
+        self,
+        battery_capacity_kwh: ArrayLike,
+        soc_start_pct: ArrayLike,
+        soc_end_pct: ArrayLike,
+        charging_duration_hours: ArrayLike,
+        vehicle_year: Optional[ArrayLike] = None,
+        default_efficiency: float = 0.92,
+        feature_names: Optional[Sequence[str]] = None,
+    ) -> np.ndarray:
+        """Versión columnar de `build_from_raw`: deriva las nueve features en un solo paso.
+
+        Acepta arrays de NumPy, listas o columnas de un DataFrame y devuelve una
+        matriz float (n, len(feature_names)) en el orden de `feature_names`
+        (por defecto MODEL_FEATURE_NAMES; pasar `EVEnergyModel.feature_names`).
+        Los valores que el camino escalar deja en None (Charging_Rate y
+        Power_proxy con duración cero o ausente, edad sin año) quedan como NaN.
+        """
+        batt = np.asarray(battery_capacity_kwh, dtype=float)
+        soc_start = np.asarray(soc_start_pct, dtype=float)
+        soc_end = np.asarray(soc_end_pct, dtype=float)
+        duration = np.asarray(charging_duration_hours, dtype=float)
+        n = batt.shape[0]
+        if not (soc_start.shape[0] == soc_end.shape[0] == duration.shape[0] == n):
+            raise ValueError("Todas las columnas de entrada deben tener la misma longitud")
+
+        if vehicle_year is None:
+            vehicle_age_years = np.full(n, np.nan)
+        else:
+            year = np.asarray(vehicle_year, dtype=float)
+            vehicle_age_years = self.current_year - np.trunc(year)
+
+        soc_diff = soc_end - soc_start
+        energy_per_soc = batt / 100.0
+        energy_est_soc = soc_diff * energy_per_soc
+
+        # Igual que el camino escalar: sin duración positiva no hay tasa de carga
+        positive = duration > 0
+        charging_rate = np.full(n, np.nan)
+        np.divide(energy_est_soc, duration, out=charging_rate, where=positive)
+
+        columns = {
+            "Battery Capacity (kWh)": batt,
+            "SoC_diff": soc_diff,
+            "Charging Duration (hours)": duration,
+            "Energy_est_SoC": energy_est_soc,
+            "Charging_Rate": charging_rate,
+            "Power_proxy": charging_rate,
+            "Charge_Efficiency": np.full(n, float(default_efficiency)),
+            "Energy_per_SoC": energy_per_soc,
+            "Vehicle Age (years)": vehicle_age_years,
+        }
+
+        names = list(feature_names or MODEL_FEATURE_NAMES)
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise ValueError(f"Features desconocidas para SessionCompleter: {unknown}")
+        return np.column_stack([columns[name] for name in names])
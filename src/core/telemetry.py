@@ -0,0 +1,219 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+LOG_LEVEL_ENV = "EV_LOG_LEVEL"
+METRICS_PORT_ENV = "EV_METRICS_PORT"
+
+# Límites (segundos) de los buckets del histograma: de 1 ms a 30 s
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+logger = logging.getLogger(__name__)
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("ev_request_id", default=None)
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Configura el logger `src` (nivel desde EV_LOG_LEVEL, por defecto INFO).
+
+    Idempotente: no añade un segundo handler si ya está configurado.
+    """
+    root = logging.getLogger("src")
+    root.setLevel((level or os.getenv(LOG_LEVEL_ENV) or "INFO").upper())
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.propagate = False
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """Asocia un request ID a todo lo que se ejecute dentro del bloque (incluidos los spans)."""
+    request_id = request_id or uuid.uuid4().hex[:12]
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+class LatencyHistogram:
+    """Histograma acumulativo (estilo Prometheus) + ventana de muestras para p50/p95/p99."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 10_000):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._window: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self._window.append(seconds)
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        if not self._window:
+            return {"p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(np.asarray(self._window), [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+@dataclass
+class Span:
+    """Tramo medido de una petición. `attrs` se puede completar dentro del bloque."""
+
+    name: str
+    request_id: Optional[str]
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    duration_s: Optional[float] = None
+
+
+class StageMetrics:
+    """Latencias por etapa (histogramas) y contadores etiquetados, exportables a Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, recent_spans: int = 1000):
+        self.buckets = buckets
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+        self._lock = threading.Lock()
+        self.recent_spans: Deque[Span] = deque(maxlen=recent_spans)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    @contextmanager
+    def span(self, stage: str, request_id: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+        """Mide el bloque, lo registra en el histograma de `stage` y lo deja en el log (DEBUG).
+
+        `request_id` (por defecto el del `request_context` activo) sirve para
+        bloques que se consumen fuera de su contexto, como un generador.
+        """
+        span = Span(name=stage, request_id=request_id or current_request_id(), attrs=dict(attrs))
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as exc:
+            span.attrs["error"] = type(exc).__name__
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - start
+            self.observe(stage, span.duration_s)
+            with self._lock:
+                self.recent_spans.append(span)
+            logger.debug(
+                "span request_id=%s stage=%s duration_ms=%.2f %s",
+                span.request_id, stage, span.duration_s * 1000.0,
+                " ".join(f"{k}={v}" for k, v in span.attrs.items()),
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.recent_spans.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                stage: {"count": h.count, "sum_seconds": h.sum, **h.percentiles()}
+                for stage, h in self._histograms.items()
+            }
+            counters: Dict[str, Dict[str, int]] = {}
+            for (name, labels), value in self._counters.items():
+                label_text = ",".join(f"{k}={v}" for k, v in labels) or "total"
+                counters.setdefault(name, {})[label_text] = value
+        return {"stages": stages, "counters": counters}
+
+    def render_prometheus(self, prefix: str = "ev_assistant") -> str:
+        """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            histograms = {stage: h for stage, h in sorted(self._histograms.items())}
+            metric = f"{prefix}_stage_duration_seconds"
+            lines.append(f"# HELP {metric} Duración de cada etapa de una respuesta del asistente.")
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, h in histograms.items():
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+
+            quantiles = f"{prefix}_stage_duration_quantile_seconds"
+            lines.append(f"# HELP {quantiles} p50/p95/p99 por etapa sobre las últimas muestras.")
+            lines.append(f"# TYPE {quantiles} gauge")
+            for stage, h in histograms.items():
+                for key, value in h.percentiles().items():
+                    if value is not None:
+                        q = int(key[1:]) / 100
+                        lines.append(f'{quantiles}{{stage="{stage}",quantile="{q:g}"}} {value:.6f}')
+
+            for name in sorted({name for name, _ in self._counters}):
+                metric = f"{prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter != name:
+                        continue
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(stage_metrics: "StageMetrics", port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sirve `GET /metrics` (formato Prometheus) en un hilo de fondo."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = stage_metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ev-metrics", daemon=True).start()
+    logger.info("Métricas Prometheus en http://%s:%d/metrics", host, port)
+    return server
+
+
+# Métricas compartidas por todo el proceso
+metrics = StageMetrics()
@@ -0,0 +1,46 @@
+import re
+from typing import List, Optional, Tuple
+
+
+BATTERY_RE = re.compile(r"(\d+(?:[\.,]\d+)?)\s*kwh")
+PERCENT_RE = re.compile(r"(\d{1,3})\s*%")
+DURATION_RE = re.compile(r"(\d+(?:[\.,]\d+)?)\s*(h|hora|horas)")
+YEAR_RE = re.compile(r"(20\d{2})")
+
+
+def find_percentages(text: str) -> List[float]:
+    """Todos los porcentajes del texto, en orden de aparición."""
+    return [float(p) for p in PERCENT_RE.findall(text.lower())]
+
+
+def extract_numbers_from_text(text: str) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float], Optional[int]]:
+    """
+    Extrae de forma sencilla algunos campos desde texto libre.
+
+    - Capacidad de batería en kWh -> número seguido de 'kWh'
+    - SoC inicio / fin           -> dos porcentajes
+    - Duración en horas          -> número seguido de 'h', 'hora', 'horas'
+    - Año del vehículo           -> año de 4 dígitos (20xx)
+    """
+    text_lower = text.lower()
+
+    # Capacidad de batería
+    batt_match = BATTERY_RE.search(text_lower)
+    battery_capacity = float(batt_match.group(1).replace(",", ".")) if batt_match else None
+
+    # SoC inicial y final
+    pct_matches = PERCENT_RE.findall(text_lower)
+    soc_start = soc_end = None
+    if len(pct_matches) >= 2:
+        soc_start = float(pct_matches[0])
+        soc_end = float(pct_matches[1])
+
+    # Duración en horas
+    dur_match = DURATION_RE.search(text_lower)
+    duration_hours = float(dur_match.group(1).replace(",", ".")) if dur_match else None
+
+    # Año del vehículo (opcional)
+    year_match = YEAR_RE.search(text_lower)
+    vehicle_year = int(year_match.group(1)) if year_match else None
+
+    return battery_capacity, soc_start, soc_end, duration_hours, vehicle_year
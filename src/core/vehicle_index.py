@@ -0,0 +1,712 @@
+import copy
+import heapq
+import itertools
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_text(s: str) -> str:
+    """Minimiza diferencias: minúsculas, sin tildes, sin espacios duplicados."""
+    s = s.strip().lower()
+    s = "".join(
+        c for c in unicodedata.normalize("NFD", s)
+        if unicodedata.category(c) != "Mn"
+    )
+    s = " ".join(s.split())
+    return s
+
+
+def _trigrams(s: str) -> Set[str]:
+    """Trigramas de caracteres con relleno, p. ej. 'ev6' -> {'  e', ' ev', 'ev6', 'v6 '}."""
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+def _fuzzy_key(s: str) -> str:
+    """Texto normalizado sin puntuación, para que 'id.3' y 'id3' se parezcan."""
+    return " ".join(re.sub(r"[^a-z0-9 ]", "", s).split())
+
+
+_YEAR_RE = re.compile(r"\b((?:19|20)\d{2})\b")
+
+
+def _parse_year(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class VehicleCandidate:
+    """Candidato de la búsqueda difusa, con su puntuación."""
+
+    row_id: int
+    score: float
+    similarity: float
+    brand: str
+    model: str
+    year: Optional[int]
+    # Camino de `search` que lo puntuó (VehicleIndex.PATH_*); None fuera de `search`
+    path: Optional[str] = None
+
+    def label(self) -> str:
+        year = f" ({self.year})" if self.year is not None else ""
+        return f"{self.brand} {self.model}{year}"
+
+
+def _token_substrings(token: str) -> Set[str]:
+    """Todas las subcadenas no vacías de un token (los tokens del EV-DB son cortos)."""
+    n = len(token)
+    return {token[i:j] for i in range(n) for j in range(i + 1, n + 1)}
+
+
+NORMALIZED_COLUMNS = ("BRAND_N", "MODEL_N")
+
+
+def _parse_capacity(value: Any) -> Optional[float]:
+    try:
+        capacity = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(capacity) else capacity
+
+
+class CapacityIndex:
+    """Índice ordenado por (BATT_CAPACITY, año) para consultas por rango y por cercanía.
+
+    Guarda tres arrays alineados (capacidad, año, row_id) ordenados por
+    capacidad: un rango de capacidades es un `searchsorted` + un corte, y el
+    filtro por año se aplica vectorizado solo sobre ese corte. Las filas sin
+    capacidad no se indexan; las filas sin año tienen año NaN.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, Optional[float], Optional[int]]]):
+        data = [(c, np.nan if y is None else float(y), r) for r, c, y in rows if c is not None]
+        capacities, years, row_ids = (np.array(col) for col in zip(*data)) if data else (np.empty(0),) * 3
+        order = np.lexsort((years, capacities))
+        self.capacities = capacities[order].astype(float)
+        self.years = years[order].astype(float)
+        self.row_ids = row_ids[order].astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def _year_mask(self, years: np.ndarray, year_min: Optional[int], year_max: Optional[int]) -> np.ndarray:
+        mask = np.ones(len(years), dtype=bool)
+        if year_min is not None:
+            mask &= years >= year_min
+        if year_max is not None:
+            mask &= years <= year_max
+        return mask
+
+    def range(
+        self,
+        capacity_min: Optional[float] = None,
+        capacity_max: Optional[float] = None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None,
+    ) -> List[int]:
+        """row_ids con capacidad y año dentro de los rangos (extremos incluidos), por capacidad."""
+        lo = 0 if capacity_min is None else int(np.searchsorted(self.capacities, capacity_min, side="left"))
+        hi = len(self) if capacity_max is None else int(np.searchsorted(self.capacities, capacity_max, side="right"))
+        mask = self._year_mask(self.years[lo:hi], year_min, year_max)
+        return self.row_ids[lo:hi][mask].tolist()
+
+    def nearest(
+        self,
+        capacity: float,
+        k: int = 5,
+        max_distance: Optional[float] = None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """Hasta k filas (row_id, |capacidad - capacity|) más cercanas, de menor a mayor distancia.
+
+        Con `max_distance` solo se mira la ventana [capacity ± max_distance];
+        sin ella, se amplía la ventana desde la posición de `capacity` hasta
+        reunir k filas que cumplan el filtro de año.
+        """
+        if max_distance is None:
+            # Ventana creciente alrededor de `capacity` hasta reunir k filas; la
+            # k-ésima distancia encontrada acota la ventana definitiva
+            pos = int(np.searchsorted(self.capacities, capacity))
+            width = max(k, 1)
+            while True:
+                lo, hi = max(pos - width, 0), min(pos + width, len(self))
+                mask = self._year_mask(self.years[lo:hi], year_min, year_max)
+                if mask.sum() >= k or (lo == 0 and hi == len(self)):
+                    break
+                width *= 2
+            distances = np.sort(np.abs(self.capacities[lo:hi][mask] - capacity))
+            if not len(distances):
+                return []
+            max_distance = float(distances[min(k, len(distances)) - 1])
+        lo = int(np.searchsorted(self.capacities, capacity - max_distance, side="left"))
+        hi = int(np.searchsorted(self.capacities, capacity + max_distance, side="right"))
+        mask = self._year_mask(self.years[lo:hi], year_min, year_max)
+        distances = np.abs(self.capacities[lo:hi][mask] - capacity)
+        row_ids = self.row_ids[lo:hi][mask]
+        # Orden estable: a igual distancia, el orden del índice (capacidad, año)
+        best = np.argsort(distances, kind="stable")[:k]
+        return [(int(row_ids[i]), float(distances[i])) for i in best]
+
+
+def _derive_row(record: Dict[str, Any]) -> Tuple[Dict[str, Any], Set[str]]:
+    """Fila con BRAND_N / MODEL_N añadidos y los trigramas de su modelo."""
+    record = dict(record)
+    record["BRAND_N"] = normalize_text(str(record["BRAND"]))
+    record["MODEL_N"] = normalize_text(str(record["MODEL"]))
+    return record, _trigrams(_fuzzy_key(record["MODEL_N"]))
+
+
+def _value_substrings(value: Optional[str]) -> Set[str]:
+    if not value:
+        return set()
+    return set().union(*(_token_substrings(tok) for tok in value.split()))
+
+
+class _SubstringIndex:
+    """Índice invertido sobre subcadenas de tokens.
+
+    Para cada subcadena de cada token de la columna guarda las filas que la
+    contienen. Una consulta `q` solo puede estar contenida en un texto si cada
+    token de `q` es subcadena de algún token del texto, así que la intersección
+    de las listas da los candidatos; luego se verifica `q in texto` solo sobre
+    ellos.
+    """
+
+    def __init__(self, values: List[Optional[str]]):
+        self.values = values
+        self.postings: Dict[str, Set[int]] = {}
+        token_rows: Dict[str, Set[int]] = {}
+        for row_id, value in enumerate(values):
+            for tok in (value or "").split():
+                token_rows.setdefault(tok, set()).add(row_id)
+        for tok, rows in token_rows.items():
+            for sub in _token_substrings(tok):
+                self.postings.setdefault(sub, set()).update(rows)
+
+    def rows_containing(self, query: str) -> Set[int]:
+        """Filas cuyo valor contiene `query` como subcadena."""
+        tokens = query.split()
+        if not tokens:
+            # Cadena vacía: como str.contains(""), coincide con todas las filas
+            return {i for i, value in enumerate(self.values) if value is not None}
+
+        # Empezamos por la lista más corta para que la intersección sea barata
+        postings = sorted((self.postings.get(t, set()) for t in tokens), key=len)
+        if not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates &= p
+            if not candidates:
+                return candidates
+
+        if len(tokens) == 1:
+            # Un solo token sin espacios: estar en las postings ya es prueba suficiente
+            return candidates
+        return {i for i in candidates if query in self.values[i]}
+
+    def updated(self, changes: Dict[int, Optional[str]]) -> "_SubstringIndex":
+        """Copia con los valores de `changes` reemplazados (None = fila eliminada).
+
+        Solo se copian las listas de postings que cambian; el resto se comparte.
+        """
+        new = _SubstringIndex.__new__(_SubstringIndex)
+        new.values = list(self.values)
+        new.postings = dict(self.postings)
+        copied: Set[str] = set()
+
+        def rows(sub: str) -> Set[int]:
+            if sub not in copied:
+                new.postings[sub] = set(new.postings.get(sub, ()))
+                copied.add(sub)
+            return new.postings[sub]
+
+        for row_id in sorted(changes):
+            if row_id == len(new.values):
+                new.values.append(None)
+            old_subs = _value_substrings(new.values[row_id])
+            new_subs = _value_substrings(changes[row_id])
+            for sub in old_subs - new_subs:
+                rows(sub).discard(row_id)
+            for sub in new_subs - old_subs:
+                rows(sub).add(row_id)
+            new.values[row_id] = changes[row_id]
+
+        for sub in copied:
+            if not new.postings[sub]:
+                del new.postings[sub]
+        return new
+
+
+class VehicleIndex:
+    """Índice de búsqueda sobre el dataset EV-DB.
+
+    Precalcula las columnas BRAND/MODEL normalizadas, un hash map para el
+    match exacto (brand, model) y un índice invertido de tokens para las
+    etapas CONTAINS / TOKENS / solo modelo de `find_vehicle_row`. Cada etapa
+    devuelve la misma fila (la primera en orden del CSV) que la cascada
+    original basada en `str.contains`, pero sin recorrer toda la tabla.
+
+    Una instancia no se modifica tras construirse: `with_changes` devuelve
+    una versión nueva (ver `src/core/vehicle_store.py`). El row_id de una
+    fila es estable entre versiones; su posición en el CSV se guarda aparte
+    y es la que decide los empates ("la primera fila del CSV").
+    """
+
+    STAGE_EXACT = "exact"
+    STAGE_CONTAINS = "contains"
+    STAGE_TOKENS = "tokens"
+    STAGE_MODEL_ONLY = "model_only"
+
+    # Camino por el que `search` puntuó un candidato: modelo idéntico con la
+    # misma marca, modelo difuso con bonus de marca, o solo por modelo
+    PATH_EXACT = "exact"
+    PATH_BRAND = "brand"
+    PATH_MODEL_ONLY = "model_only"
+
+    # Pesos de la búsqueda difusa (`search`)
+    BRAND_BONUS = 0.15
+    MIN_BRAND_SIMILARITY = 0.5
+    YEAR_BONUS = 0.05
+    RECENCY_BONUS = 0.01
+    # Solo se puntúan las filas con más trigramas en común con la consulta
+    MAX_SCORED_CANDIDATES = 48
+    BRAND_SIMS_CACHE_SIZE = 1024
+
+    def __init__(self, df: pd.DataFrame):
+        self._records: List[Optional[Dict[str, Any]]] = []
+        self._brands_n: List[Optional[str]] = []
+        self._models_n: List[Optional[str]] = []
+        self._years: List[Optional[int]] = []
+        self._fuzzy_models: List[Optional[str]] = []
+        self._model_trigram_count: List[int] = []
+        # Índice de trigramas para la búsqueda difusa
+        self._trigram_postings: Dict[str, List[int]] = {}
+        for row_id, record in enumerate(df.reset_index(drop=True).to_dict("records")):
+            record, grams = _derive_row(record)
+            self._set_row(row_id, record, grams)
+            for g in grams:
+                self._trigram_postings.setdefault(g, []).append(row_id)
+        self._live_rows = len(self._records)
+        # Posición de cada fila en el CSV (-1 si se eliminó); al construir coincide con el row_id
+        self._positions = np.arange(len(self._records), dtype=np.int64)
+
+        # Match exacto: nos quedamos con la primera aparición de cada par
+        self._exact: Dict[Tuple[str, str], int] = {}
+        for row_id, key in enumerate(zip(self._brands_n, self._models_n)):
+            self._exact.setdefault(key, row_id)
+
+        # Las marcas son pocas: indexamos las marcas únicas y mapeamos a filas
+        self._brand_rows: Dict[str, Set[int]] = {}
+        for row_id, brand_n in enumerate(self._brands_n):
+            self._brand_rows.setdefault(brand_n, set()).add(row_id)
+        self._brand_trigrams: Dict[str, Set[str]] = {}
+        self._index_brands()
+
+        self._model_index = _SubstringIndex(self._models_n)
+        self._update_year_range()
+        self._capacity_index: Optional[CapacityIndex] = None
+
+    def _set_row(self, row_id: int, record: Optional[Dict[str, Any]], grams: Set[str]) -> None:
+        """Escribe los valores derivados de una fila (None = fila eliminada)."""
+        if row_id == len(self._records):
+            for column in (self._records, self._brands_n, self._models_n, self._years, self._fuzzy_models):
+                column.append(None)
+            self._model_trigram_count.append(0)
+        self._records[row_id] = record
+        self._brands_n[row_id] = record["BRAND_N"] if record else None
+        self._models_n[row_id] = record["MODEL_N"] if record else None
+        self._years[row_id] = _parse_year(record.get("MODEL.1")) if record else None
+        self._fuzzy_models[row_id] = _fuzzy_key(record["MODEL_N"]) if record else None
+        self._model_trigram_count[row_id] = len(grams)
+
+    def _index_brands(self) -> None:
+        self._unique_brands = list(self._brand_rows)
+        self._brand_index = _SubstringIndex(self._unique_brands)
+        self._brand_trigrams = {
+            b: self._brand_trigrams.get(b) or _trigrams(b) for b in self._unique_brands
+        }
+        # Similitudes ya calculadas por marca consultada (dependen solo de las marcas)
+        self._brand_sims_cache: Dict[str, Dict[str, float]] = {}
+
+    def _update_year_range(self) -> None:
+        known_years = [y for y in self._years if y is not None]
+        self._year_range = (min(known_years), max(known_years)) if known_years else (0, 0)
+
+    def with_changes(
+        self,
+        changes: Dict[int, Optional[Dict[str, Any]]],
+        positions: Optional[Dict[int, int]] = None,
+    ) -> "VehicleIndex":
+        """Nueva versión del índice con filas cambiadas, añadidas o eliminadas.
+
+        `changes` mapea row_id -> fila del CSV (sin columnas normalizadas), o
+        None para eliminarla; los row_id nuevos continúan desde `next_row_id`.
+        `positions` mapea row_id -> posición en el CSV nuevo de todas las
+        filas vivas; sin él, las filas añadidas van detrás de las existentes.
+        Solo se recalculan las filas afectadas: el resto de estructuras se
+        comparten con esta versión (copia en escritura), que sigue siendo
+        válida para las consultas en curso. Las filas eliminadas dejan un
+        hueco, así que los row_id del resto no cambian.
+        """
+        new = copy.copy(self)
+        for name in ("_records", "_brands_n", "_models_n", "_years", "_fuzzy_models", "_model_trigram_count"):
+            setattr(new, name, list(getattr(self, name)))
+        new._exact = dict(self._exact)
+        new._brand_rows = dict(self._brand_rows)
+        new._trigram_postings = dict(self._trigram_postings)
+
+        copied_brands: Set[str] = set()
+        copied_grams: Set[str] = set()
+
+        def brand_rows(brand_n: str) -> Set[int]:
+            if brand_n not in copied_brands:
+                new._brand_rows[brand_n] = set(new._brand_rows.get(brand_n, ()))
+                copied_brands.add(brand_n)
+            return new._brand_rows[brand_n]
+
+        def gram_rows(g: str) -> List[int]:
+            if g not in copied_grams:
+                new._trigram_postings[g] = list(new._trigram_postings.get(g, ()))
+                copied_grams.add(g)
+            return new._trigram_postings[g]
+
+        touched_keys: Set[Tuple[str, str]] = set()
+        model_changes: Dict[int, Optional[str]] = {}
+        for row_id in sorted(changes):
+            if row_id > len(new._records):
+                raise ValueError(f"row_id {row_id} no es contiguo (siguiente libre: {len(new._records)})")
+            old = new._records[row_id] if row_id < len(new._records) else None
+            if old is not None:
+                touched_keys.add((old["BRAND_N"], old["MODEL_N"]))
+                brand_rows(old["BRAND_N"]).discard(row_id)
+                for g in _trigrams(new._fuzzy_models[row_id]):
+                    gram_rows(g).remove(row_id)
+                new._live_rows -= 1
+
+            record, grams = _derive_row(changes[row_id]) if changes[row_id] is not None else (None, set())
+            new._set_row(row_id, record, grams)
+            model_changes[row_id] = new._models_n[row_id]
+            if record is not None:
+                touched_keys.add((record["BRAND_N"], record["MODEL_N"]))
+                brand_rows(record["BRAND_N"]).add(row_id)
+                for g in grams:
+                    gram_rows(g).append(row_id)
+                new._live_rows += 1
+
+        for g in copied_grams:
+            if not new._trigram_postings[g]:
+                del new._trigram_postings[g]
+        emptied = {b for b in copied_brands if not new._brand_rows[b]}
+        for b in emptied:
+            del new._brand_rows[b]
+        if emptied or set(new._brand_rows) != set(self._brand_rows):
+            new._index_brands()
+
+        new._positions = new._updated_positions(changes, positions)
+        if positions is not None and not new._keeps_order(self):
+            # El CSV reordenó filas que no cambiaron: cualquier par puede tener otra primera fila
+            touched_keys = set(new._exact) | touched_keys
+
+        # Match exacto: primera fila viva (en orden del CSV) de cada par afectado
+        for brand_n, model_n in touched_keys:
+            row_id = new._first(r for r in new._brand_rows.get(brand_n, ()) if new._models_n[r] == model_n)
+            if row_id is not None:
+                new._exact[(brand_n, model_n)] = row_id
+            else:
+                new._exact.pop((brand_n, model_n), None)
+
+        new._model_index = self._model_index.updated(model_changes)
+        new._update_year_range()
+        # Se construye antes de publicar la versión: ninguna consulta lo hace a medias
+        new._capacity_index = new._build_capacity_index()
+        return new
+
+    def _updated_positions(
+        self,
+        changes: Dict[int, Optional[Dict[str, Any]]],
+        positions: Optional[Dict[int, int]],
+    ) -> np.ndarray:
+        """Posiciones en el CSV tras aplicar `changes` (ya escritos en `_records`)."""
+        old = self._positions
+        updated = np.full(len(self._records), -1, dtype=np.int64)
+        if positions is not None:
+            row_ids = np.fromiter(positions, dtype=np.int64, count=len(positions))
+            updated[row_ids] = np.fromiter(positions.values(), dtype=np.int64, count=len(positions))
+        else:
+            updated[:len(old)] = old
+            # Las filas nuevas, detrás de la última posición en uso
+            added = sorted(r for r in changes if r >= len(old) and changes[r] is not None)
+            start = int(old.max()) + 1 if len(old) else 0
+            updated[added] = np.arange(start, start + len(added))
+        removed = [r for r, record in changes.items() if record is None]
+        updated[removed] = -1
+        return updated
+
+    def _keeps_order(self, previous: "VehicleIndex") -> bool:
+        """True si las filas vivas en ambas versiones conservan su orden relativo en el CSV."""
+        n = len(previous._positions)
+        kept = np.flatnonzero((previous._positions >= 0) & (self._positions[:n] >= 0))
+        order = kept[np.argsort(previous._positions[kept])]
+        return bool(np.all(np.diff(self._positions[order]) > 0))
+
+    def __len__(self) -> int:
+        return self._live_rows
+
+    @property
+    def next_row_id(self) -> int:
+        """Primer row_id libre para filas añadidas con `with_changes`."""
+        return len(self._records)
+
+    def row(self, row_id: int) -> Dict[str, Any]:
+        """Copia de la fila `row_id` como diccionario (incluye BRAND_N / MODEL_N)."""
+        record = self._records[row_id]
+        if record is None:
+            raise KeyError(f"La fila {row_id} fue eliminada del EV-DB")
+        return dict(record)
+
+    def get_row(self, row_id: int) -> Optional[Dict[str, Any]]:
+        """Como `row`, pero devuelve None si la fila no existe o fue eliminada."""
+        if not 0 <= row_id < len(self._records) or self._records[row_id] is None:
+            return None
+        return dict(self._records[row_id])
+
+    def _build_capacity_index(self) -> CapacityIndex:
+        # `iter_rows` va en orden del CSV: a igual (capacidad, año) se mantiene ese orden
+        return CapacityIndex(
+            (row_id, _parse_capacity(record.get("BATT_CAPACITY")), self._years[row_id])
+            for row_id, record in self.iter_rows()
+        )
+
+    @property
+    def capacity_index(self) -> CapacityIndex:
+        """Índice por capacidad/año (el de la primera versión se construye en el primer uso)."""
+        if self._capacity_index is None:
+            self._capacity_index = self._build_capacity_index()
+        return self._capacity_index
+
+    def by_capacity(
+        self,
+        capacity: float,
+        tolerance: float,
+        year: Optional[int] = None,
+        k: int = 5,
+    ) -> List[VehicleCandidate]:
+        """Vehículos con capacidad a menos de `tolerance` kWh (y del año `year`, si se da).
+
+        La puntuación baja linealmente con la distancia: 1.0 para la misma capacidad.
+        """
+        matches = self.capacity_index.nearest(
+            capacity, k=k, max_distance=tolerance, year_min=year, year_max=year,
+        )
+        candidates = []
+        for row_id, distance in matches:
+            score = round(1.0 - distance / tolerance, 4) if tolerance > 0 else 1.0
+            candidates.append(VehicleCandidate(
+                row_id=row_id,
+                score=score,
+                similarity=score,
+                brand=str(self._records[row_id]["BRAND"]),
+                model=str(self._records[row_id]["MODEL"]),
+                year=self._years[row_id],
+            ))
+        return candidates
+
+    def iter_rows(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(row_id, fila) de las filas vivas, en orden del CSV."""
+        live = np.flatnonzero(self._positions >= 0)
+        for row_id in live[np.argsort(self._positions[live], kind="stable")].tolist():
+            yield row_id, self._records[row_id]
+
+    def brand_names(self) -> Dict[str, str]:
+        """Marcas normalizadas -> nombre original (primera aparición en el CSV)."""
+        return {
+            b: str(self._records[self._first(rows)]["BRAND"])
+            for b, rows in self._brand_rows.items()
+        }
+
+    def model_names(self, brand_n: str) -> List[str]:
+        """Modelos normalizados (sin repetir, en orden del CSV) de una marca normalizada."""
+        rows = sorted(self._brand_rows.get(brand_n, ()), key=self._positions.__getitem__)
+        return list(dict.fromkeys(self._models_n[i] for i in rows))
+
+    def _rows_with_brand_containing(self, brand_n: str) -> Set[int]:
+        rows: Set[int] = set()
+        for b in self._brand_index.rows_containing(brand_n):
+            rows |= self._brand_rows[self._unique_brands[b]]
+        return rows
+
+    def _first(self, rows: Iterable[int]) -> Optional[int]:
+        """La fila que aparece antes en el CSV."""
+        return min(rows, key=self._positions.__getitem__, default=None)
+
+    def lookup(self, brand_n: str, model_n: str) -> Tuple[Optional[int], Optional[str]]:
+        """Devuelve (row_id, etapa) para brand/model ya normalizados, o (None, None)."""
+        # 1) match exacto normalizado
+        row_id = self._exact.get((brand_n, model_n))
+        if row_id is not None:
+            return row_id, self.STAGE_EXACT
+
+        brand_rows = self._rows_with_brand_containing(brand_n)
+
+        # 2) BRAND contiene brand_n y MODEL contiene model_n (subcadena)
+        row_id = self._first(brand_rows & self._model_index.rows_containing(model_n))
+        if row_id is not None:
+            return row_id, self.STAGE_CONTAINS
+
+        # 3) BRAND coincide y cada token relevante del modelo aparece en MODEL
+        model_tokens = [t for t in model_n.split() if len(t) >= 3]
+        if model_tokens:
+            rows = brand_rows
+            for tok in model_tokens:
+                if not rows:
+                    break
+                rows = rows & self._model_index.rows_containing(tok)
+            row_id = self._first(rows)
+            if row_id is not None:
+                return row_id, self.STAGE_TOKENS
+
+        # 4) Último recurso: ignorar brand y matchear solo por MODEL (contiene)
+        query = model_tokens[0] if model_tokens else model_n
+        row_id = self._first(self._model_index.rows_containing(query))
+        if row_id is not None:
+            return row_id, self.STAGE_MODEL_ONLY
+
+        return None, None
+
+    def _brand_similarities(self, brand_n: Optional[str]) -> Dict[str, float]:
+        """Similitud de `brand_n` con cada marca conocida (solo las que superan el umbral)."""
+        if not brand_n:
+            return {}
+        sims = self._brand_sims_cache.get(brand_n)
+        if sims is not None:
+            return sims
+        query = _trigrams(brand_n)
+        sims = {}
+        for b, grams in self._brand_trigrams.items():
+            sim = 1.0 if b == brand_n else _dice(query, grams)
+            if sim >= self.MIN_BRAND_SIMILARITY:
+                sims[b] = sim
+        if len(self._brand_sims_cache) >= self.BRAND_SIMS_CACHE_SIZE:
+            self._brand_sims_cache = {}
+        self._brand_sims_cache[brand_n] = sims
+        return sims
+
+    def search(
+        self,
+        brand: Optional[str],
+        model: Optional[str],
+        year: Optional[int] = None,
+        k: int = 5,
+    ) -> List[VehicleCandidate]:
+        """Búsqueda difusa por trigramas con ranking de los k mejores candidatos.
+
+        Solo se puntúan las `MAX_SCORED_CANDIDATES` filas con más trigramas
+        del modelo en común con la consulta.
+
+        score = similitud del modelo (media entre Dice de trigramas y fracción
+                de tokens de la consulta presentes en el modelo)
+              + BRAND_BONUS * similitud de marca (si supera MIN_BRAND_SIMILARITY)
+              + preferencia por año (`year` o, si no hay, el año más reciente).
+
+        Si `year` es None y el modelo contiene un año (p. ej. "Model 3 2021"),
+        se usa ese año y se quita del texto del modelo.
+        """
+        if not model:
+            return []
+        model_n = normalize_text(str(model))
+        if year is None:
+            match = _YEAR_RE.search(model_n)
+            if match:
+                year = int(match.group(1))
+                model_n = _YEAR_RE.sub(" ", model_n)
+        model_key = _fuzzy_key(model_n)
+        if not model_key:
+            return []
+
+        query = _trigrams(model_key)
+        query_tokens = model_key.split()
+        postings = self._trigram_postings
+        hits = np.fromiter(
+            itertools.chain.from_iterable(postings.get(g, ()) for g in query), dtype=np.int64,
+        )
+        if not len(hits):
+            return []
+        counts = np.bincount(hits)
+        rows = np.flatnonzero(counts)
+        if len(rows) > self.MAX_SCORED_CANDIDATES:
+            # Poda: se puntúan solo las filas con mayor Dice de trigramas (la parte
+            # dominante de la similitud); el resto no llega al top-k. En empate, la
+            # primera fila, para que el corte sea determinista
+            row_grams = np.asarray(self._model_trigram_count, dtype=float)[rows]
+            dice = counts[rows] / (len(query) + row_grams)
+            order = np.lexsort((self._positions[rows], -dice))
+            rows = rows[order[:self.MAX_SCORED_CANDIDATES]]
+        overlap = dict(zip(rows.tolist(), counts[rows].tolist()))
+
+        brand_sims = self._brand_similarities(
+            normalize_text(str(brand)) if brand else None
+        )
+        year = _parse_year(year)
+        y_min, y_max = self._year_range
+        y_span = max(y_max - y_min, 1)
+        n_query = len(query)
+
+        def scored(row_id: int, common: int) -> Tuple[float, float]:
+            dice = 2.0 * common / (n_query + self._model_trigram_count[row_id])
+            row_model = self._fuzzy_models[row_id]
+            coverage = sum(tok in row_model for tok in query_tokens) / len(query_tokens)
+            similarity = 0.5 * dice + 0.5 * coverage
+            score = similarity + self.BRAND_BONUS * brand_sims.get(self._brands_n[row_id], 0.0)
+            row_year = self._years[row_id]
+            if row_year is not None:
+                if year is not None:
+                    score += self.YEAR_BONUS * max(0.0, 1.0 - abs(row_year - year) / 3.0)
+                else:
+                    score += self.RECENCY_BONUS * (row_year - y_min) / y_span
+            return score, similarity
+
+        def path(row_id: int) -> str:
+            brand_sim = brand_sims.get(self._brands_n[row_id], 0.0)
+            if brand_sim == 1.0 and self._fuzzy_models[row_id] == model_key:
+                return self.PATH_EXACT
+            return self.PATH_BRAND if brand_sim else self.PATH_MODEL_ONLY
+
+        scores = {row_id: scored(row_id, common) for row_id, common in overlap.items()}
+        # Empates: gana la primera fila en orden del CSV
+        positions = self._positions
+        best = heapq.nlargest(k, scores, key=lambda r: (scores[r][0], -positions[r]))
+        return [
+            VehicleCandidate(
+                row_id=row_id,
+                score=round(scores[row_id][0], 4),
+                similarity=round(scores[row_id][1], 4),
+                brand=str(self._records[row_id]["BRAND"]),
+                model=str(self._records[row_id]["MODEL"]),
+                year=self._years[row_id],
+                path=path(row_id),
+            )
+            for row_id in best
+        ]
+
+    def same_name(self, a: VehicleCandidate, b: VehicleCandidate) -> bool:
+        """True si dos candidatos solo difieren en año / capacidad (mismo brand+model)."""
+        return (
+            self._brands_n[a.row_id] == self._brands_n[b.row_id]
+            and self._models_n[a.row_id] == self._models_n[b.row_id]
+        )
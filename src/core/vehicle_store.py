@@ -0,0 +1,235 @@
+"""Índice de vehículos recargable en caliente cuando cambia `EV-DB.csv`.
+
+`VehicleStore.index` apunta siempre a una versión completa del
+`VehicleIndex`. Al detectar cambios en el CSV (tamaño/mtime y, si hace
+falta, sha256), se compara fila a fila con la versión actual y solo las
+filas añadidas, cambiadas o eliminadas se aplican con
+`VehicleIndex.with_changes`; la versión nueva se publica con una sola
+asignación, así que una búsqueda en curso termina sobre la versión que
+empezó y nunca ve un índice a medio construir.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.core.ev_db_artifact import source_fingerprint
+from src.core.telemetry import metrics
+from src.core.vehicle_index import NORMALIZED_COLUMNS, VehicleIndex
+
+
+logger = logging.getLogger(__name__)
+
+# Columnas que identifican un vehículo entre versiones del CSV (MODEL.1 es el año)
+KEY_COLUMNS = ("BRAND", "MODEL", "MODEL.1")
+
+RowKey = Tuple[Any, ...]
+Listener = Callable[[VehicleIndex, pd.DataFrame], None]
+
+
+def _plain(value: Any) -> Any:
+    """Valor comparable entre lecturas del CSV (NaN != NaN)."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+@dataclass
+class ReloadReport:
+    added: int
+    changed: int
+    removed: int
+    incremental: bool
+    seconds: float
+    version: int
+
+    @property
+    def total(self) -> int:
+        return self.added + self.changed + self.removed
+
+
+class VehicleStore:
+    """Mantiene el `VehicleIndex` sincronizado con el CSV sin reiniciar el proceso.
+
+    Las filas se identifican por (BRAND, MODEL, MODEL.1, nº de aparición);
+    una fila con la misma clave y otros valores cuenta como cambiada. En una
+    recarga incremental las filas nuevas reciben row_id a continuación de
+    las existentes, así que los row_id ya entregados (p. ej. candidatos
+    pendientes de una conversación) siguen apuntando al mismo vehículo; la
+    posición en el CSV nuevo se pasa aparte y decide los empates igual que
+    en un índice recién construido.
+
+    Si cambia más de `MAX_INCREMENTAL_FRACTION` de las filas, o cambian las
+    columnas, se reconstruye el índice completo (igualmente fuera de las
+    consultas) y los row_id se renumeran desde 0 en el orden del CSV nuevo:
+    un row_id de la versión anterior puede apuntar a otro vehículo o a
+    ninguno, así que quien los guarde debe comprobar la fila (como hace
+    `ConversationState.pick_candidate`).
+    """
+
+    MAX_INCREMENTAL_FRACTION = 0.5
+
+    def __init__(self, csv_path: str, load_index: Optional[Callable[[], VehicleIndex]] = None):
+        self.csv_path = csv_path
+        # La huella se toma antes de cargar: un cambio durante la carga se detecta después
+        self._fingerprint = source_fingerprint(csv_path)
+        index = load_index() if load_index is not None else VehicleIndex(pd.read_csv(csv_path))
+        self.index = index
+        self.version = 0
+        self.last_report: Optional[ReloadReport] = None
+        self._columns, self._keys, self._signatures = self._catalog(index)
+        self._listeners: List[Listener] = []
+        self._reload_lock = threading.Lock()
+        # (tamaño, mtime) de una versión del CSV que no se pudo leer: no se reintenta hasta que cambie
+        self._rejected: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _catalog(index: VehicleIndex) -> Tuple[List[str], Dict[RowKey, int], Dict[int, Tuple[Any, ...]]]:
+        columns: List[str] = []
+        keys: Dict[RowKey, int] = {}
+        signatures: Dict[int, Tuple[Any, ...]] = {}
+        occurrences: Dict[RowKey, int] = {}
+        for row_id, record in index.iter_rows():
+            if not columns:
+                columns = [c for c in record if c not in NORMALIZED_COLUMNS]
+            base = tuple(_plain(record.get(c)) for c in KEY_COLUMNS)
+            occurrence = occurrences.get(base, 0)
+            occurrences[base] = occurrence + 1
+            keys[base + (occurrence,)] = row_id
+            signatures[row_id] = tuple(_plain(record.get(c)) for c in columns)
+        return columns, keys, signatures
+
+    def add_listener(self, listener: Listener) -> None:
+        """`listener(index, df)` se llama tras publicar cada versión nueva."""
+        self._listeners.append(listener)
+
+    def _changed_on_disk(self) -> Optional[Dict[str, Any]]:
+        """Huella nueva si el contenido del CSV cambió; None si sigue igual."""
+        current = self._fingerprint
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None  # p. ej. el CSV se está reemplazando: se reintenta en la próxima pasada
+        if (stat.st_size, stat.st_mtime_ns) in ((current["size"], current["mtime_ns"]), self._rejected):
+            return None
+        fingerprint = source_fingerprint(self.csv_path)
+        if fingerprint["sha256"] == current["sha256"]:
+            self._fingerprint = fingerprint
+            return None
+        return fingerprint
+
+    def reload(self, force: bool = False) -> Optional[ReloadReport]:
+        """Aplica los cambios del CSV, si los hay; devuelve el resumen o None."""
+        with self._reload_lock:
+            fingerprint = self._changed_on_disk()
+            if fingerprint is None and not force:
+                return None
+            start = time.perf_counter()
+            try:
+                df = pd.read_csv(self.csv_path)
+            except (OSError, ValueError):
+                if fingerprint is not None:
+                    self._rejected = (fingerprint["size"], fingerprint["mtime_ns"])
+                raise
+            columns = list(df.columns)
+            plain = df.astype(object).where(df.notna(), None)
+            key_positions = [columns.index(c) if c in columns else None for c in KEY_COLUMNS]
+
+            changed_positions: Dict[int, int] = {}  # row_id -> posición en el CSV nuevo
+            positions: Dict[int, int] = {}  # ídem, de todas las filas (para los empates)
+            keys: Dict[RowKey, int] = {}
+            signatures: Dict[int, Tuple[Any, ...]] = {}
+            added = changed = 0
+            next_row_id = self.index.next_row_id
+            occurrences: Dict[RowKey, int] = {}
+            for position, signature in enumerate(plain.itertuples(index=False, name=None)):
+                base = tuple(signature[i] if i is not None else None for i in key_positions)
+                occurrence = occurrences.get(base, 0)
+                occurrences[base] = occurrence + 1
+                key = base + (occurrence,)
+                row_id = self._keys.get(key)
+                if row_id is None:
+                    row_id, next_row_id = next_row_id, next_row_id + 1
+                    changed_positions[row_id] = position
+                    added += 1
+                elif self._signatures.get(row_id) != signature:
+                    changed_positions[row_id] = position
+                    changed += 1
+                keys[key] = row_id
+                signatures[row_id] = signature
+                positions[row_id] = position
+            removed_ids = [row_id for key, row_id in self._keys.items() if key not in keys]
+
+            incremental = (
+                columns == self._columns
+                and len(changed_positions) + len(removed_ids) <= self.MAX_INCREMENTAL_FRACTION * max(len(df), 1)
+            )
+            if incremental:
+                # Solo las filas afectadas pasan a diccionario
+                records = df.iloc[list(changed_positions.values())].to_dict("records")
+                changes: Dict[int, Optional[Dict[str, Any]]] = dict(zip(changed_positions, records))
+                changes.update((row_id, None) for row_id in removed_ids)
+                index = self.index.with_changes(changes, positions=positions)
+            else:
+                index = VehicleIndex(df)
+                keys, signatures = self._catalog(index)[1:]
+
+            # Publicación: una asignación de atributo, atómica para los lectores
+            self.index = index
+            self.version += 1
+            self._columns, self._keys, self._signatures = columns, keys, signatures
+            self._fingerprint = fingerprint or source_fingerprint(self.csv_path)
+            report = ReloadReport(
+                added=added,
+                changed=changed,
+                removed=len(removed_ids),
+                incremental=incremental,
+                seconds=time.perf_counter() - start,
+                version=self.version,
+            )
+            self.last_report = report
+
+        metrics.increment("ev_db_reload", mode="incremental" if incremental else "full")
+        logger.info(
+            "🔄 EV-DB recargado (v%d, %s): +%d ~%d -%d filas en %.3f s",
+            report.version, "incremental" if incremental else "completo",
+            report.added, report.changed, report.removed, report.seconds,
+        )
+        for listener in self._listeners:
+            try:
+                listener(index, df)
+            except Exception:
+                logger.exception("Error en un listener de recarga del EV-DB")
+        return report
+
+    def _watch(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.reload()
+            except Exception:
+                # Un CSV mal formado no tumba el watcher: se sigue con la versión actual
+                logger.exception("No se pudo recargar el EV-DB desde %s", self.csv_path)
+
+    def start(self, interval_s: float) -> None:
+        """Comprueba el CSV cada `interval_s` segundos en un hilo daemon."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, args=(interval_s,), name="ev-db-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
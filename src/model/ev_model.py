@@ -1,11 +1,25 @@
+import logging
+import os
+from typing import Dict, Any, List, Optional, Sequence, Union
 
-import sys
-from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
 
-from huggingface_hub import snapshot_download
+from src.core.env import env_flag, offline_mode
+from src.core.session_completer import MODEL_FEATURE_NAMES
+from src.model.prediction_cache import PredictionCache
+from src.model.inference_loader import load_inference_module
+from src.model.snapshot import VERIFY_QUICK, resolve_snapshot_dir, snapshot_fingerprint, verify_snapshot
+from src.model.surrogate import DEFAULT_SURROGATE_PATH, SurrogateGrid, load_or_build
 
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_REPO_ID = "mchacongucenfotec/ev-test-train"
+DEFAULT_BATCH_SIZE = 4096
+
+
+FeatureBatch = Union[pd.DataFrame, Sequence[Dict[str, Any]], np.ndarray]
 
 
 class EVEnergyModel:
@@ -14,51 +28,150 @@ class EVEnergyModel:
     Asume que el snapshot contiene un módulo `inference.py` con:
         - predict(session_info) -> list[float] o np.ndarray
         - get_feature_names()   -> iterable de nombres de features
+
+    Con `cache_size > 0` se activa una caché LRU de predicciones para
+    `predict_from_session` (ver PredictionCache); `cache_quantum` fija, por
+    feature continua, el tamaño de cubeta con el que se calcula la clave.
+
+    Carga sin red (ver src/model/snapshot.py):
+        - `local_dir` (o EV_MODEL_LOCAL_DIR): usa ese directorio como snapshot.
+        - `local_files_only` (o EV_MODEL_OFFLINE=1 / HF_HUB_OFFLINE=1): solo la
+          caché de Hugging Face, sin peticiones al Hub.
+        - `revision` (o EV_MODEL_REVISION): revisión fijada del snapshot.
+        - `verify` (o EV_MODEL_VERIFY): "none", "quick" o "full".
+
+    Con `surrogate=True` (o EV_SURROGATE=1) las predicciones se interpolan en
+    una tabla precalculada con este snapshot (ver src/model/surrogate.py) y
+    solo las sesiones fuera de la tabla llegan al modelo real. La tabla se lee
+    de `surrogate_path` (o EV_SURROGATE_PATH) y se reconstruye si es de otro
+    snapshot; con EV_SURROGATE_MAX_ERROR_KWH se descarta si su error máximo
+    medido supera ese valor.
     """
 
-    def __init__(self, repo_id: str = DEFAULT_REPO_ID, force_download: bool = False):
+    def __init__(
+        self,
+        repo_id: str = DEFAULT_REPO_ID,
+        force_download: bool = False,
+        cache_size: int = 0,
+        cache_quantum: Optional[Dict[str, float]] = None,
+        revision: Optional[str] = None,
+        local_dir: Optional[str] = None,
+        local_files_only: Optional[bool] = None,
+        verify: Optional[str] = None,
+        surrogate: Optional[bool] = None,
+        surrogate_path: Optional[str] = None,
+    ):
         self.repo_id = repo_id
+        self.revision = revision or os.getenv("EV_MODEL_REVISION") or None
+        self.snapshot_dir = local_dir or os.getenv("EV_MODEL_LOCAL_DIR") or None
+        if local_files_only is None:
+            local_files_only = offline_mode()
+        self.local_files_only = local_files_only
+        self.verify = verify or os.getenv("EV_MODEL_VERIFY") or VERIFY_QUICK
         self.local_dir: Optional[str] = None
         self.hf_predict = None
         self.feature_names: Optional[list[str]] = None
+        # None = aún no sabemos si inference.predict acepta un DataFrame con varias filas
+        self._batch_supported: Optional[bool] = None
+        self.cache: Optional[PredictionCache] = (
+            PredictionCache(cache_size, quantum=cache_quantum) if cache_size > 0 else None
+        )
 
         self._load_snapshot(force_download=force_download)
 
+        if surrogate is None:
+            surrogate = env_flag("EV_SURROGATE")
+        self.surrogate: Optional[SurrogateGrid] = (
+            self._load_surrogate(surrogate_path or os.getenv("EV_SURROGATE_PATH") or DEFAULT_SURROGATE_PATH)
+            if surrogate else None
+        )
+
     def _load_snapshot(self, force_download: bool = False) -> None:
-        """Descarga (o usa caché) del snapshot y carga inference.predict."""
-        import os
-        
-        self.local_dir = snapshot_download(repo_id=self.repo_id, force_download=force_download)
-
-        if self.local_dir not in sys.path:
-            sys.path.insert(0, self.local_dir)
-
-        # Change to snapshot directory so relative paths in inference.py work correctly
-        original_dir = os.getcwd()
-        os.chdir(self.local_dir)
-        
+        """Descarga (o usa caché / directorio local) del snapshot y carga inference.predict."""
+        self.local_dir = resolve_snapshot_dir(
+            repo_id=self.repo_id,
+            revision=self.revision,
+            local_dir=self.snapshot_dir,
+            local_files_only=self.local_files_only,
+            force_download=force_download,
+        )
+        verify_snapshot(self.local_dir, level=self.verify)
+
+        # Import con nombre de módulo único y sin chdir ni sys.path: varias
+        # versiones del modelo pueden convivir y predecir en paralelo
         try:
-            from inference import predict as hf_predict, get_feature_names  # type: ignore
+            inference = load_inference_module(self.local_dir)
+            hf_predict = inference.predict
+            get_feature_names = getattr(inference, "get_feature_names", None)
         except Exception as exc:
-            os.chdir(original_dir)
             raise RuntimeError(
                 f"No se pudo importar 'inference.predict' desde el snapshot en {self.local_dir}. "
                 f"Error: {str(exc)}"
             ) from exc
 
-        os.chdir(original_dir)
-        
         self.hf_predict = hf_predict
         try:
-            self.feature_names = list(get_feature_names())
+            self.feature_names = list(get_feature_names()) if get_feature_names else None
         except Exception:
             self.feature_names = None
 
+    def _load_surrogate(self, path: str) -> Optional[SurrogateGrid]:
+        """Carga (o construye) la tabla surrogate de este snapshot; None si no es aplicable."""
+        if self.feature_names is not None and set(self.feature_names) != set(MODEL_FEATURE_NAMES):
+            logger.warning("⚠️ Tabla surrogate desactivada: el modelo usa otras features (%s)", self.feature_names)
+            return None
+        grid = load_or_build(
+            self.predict_many_exact,
+            snapshot_fingerprint(self.local_dir),
+            feature_names=self.feature_names,
+            path=path,
+            # EV_SURROGATE_BUILD=0: solo tablas precompiladas, nunca construir al arrancar
+            build_missing=env_flag("EV_SURROGATE_BUILD", default=True),
+        )
+        if grid is None:
+            return None
+        max_error = os.getenv("EV_SURROGATE_MAX_ERROR_KWH")
+        measured = (grid.meta.get("error_report") or {}).get("max_abs_error_kwh")
+        if max_error and measured is not None and measured > float(max_error):
+            logger.warning(
+                "⚠️ Tabla surrogate desactivada: error máximo %.4f kWh > EV_SURROGATE_MAX_ERROR_KWH=%s",
+                measured, max_error,
+            )
+            return None
+        return grid
+
     def predict_from_session(self, session_info: Dict[str, Any]) -> List[float]:
         """Llama a inference.predict(session_info) y devuelve una lista de floats."""
         if self.hf_predict is None:
             raise RuntimeError("El modelo aún no ha sido cargado correctamente.")
 
+        if self.surrogate is not None:
+            value = self.surrogate.predict_session(session_info)
+            if value is not None:
+                return [value]
+        return self._predict_cached(session_info)
+
+    def _predict_cached(self, session_info: Dict[str, Any]) -> List[float]:
+        if self.cache is None:
+            return self._predict_uncached(session_info)
+
+        key = self.cache.make_key(session_info)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        preds = self._predict_uncached(session_info)
+        self.cache.put(key, preds)
+        return preds
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Contadores de la caché (hits/misses/evictions) o None si está desactivada."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def surrogate_stats(self) -> Optional[Dict[str, Any]]:
+        """Aciertos de la tabla surrogate y su error medido, o None si está desactivada."""
+        return self.surrogate.stats() if self.surrogate is not None else None
+
+    def _predict_uncached(self, session_info: Dict[str, Any]) -> List[float]:
         preds = self.hf_predict(session_info)
         if isinstance(preds, (list, tuple)):
             return [float(p) for p in preds]
@@ -67,3 +180,69 @@ class EVEnergyModel:
             return [float(p) for p in preds]  # type: ignore
         except Exception:
             return [float(preds)]
+
+    def _to_frame(self, features: FeatureBatch) -> pd.DataFrame:
+        """Normaliza un lote de features a DataFrame con las columnas del modelo."""
+        columns = self.feature_names or MODEL_FEATURE_NAMES
+        if isinstance(features, pd.DataFrame):
+            return features.loc[:, columns]
+        if isinstance(features, np.ndarray):
+            if features.ndim != 2 or features.shape[1] != len(columns):
+                raise ValueError(
+                    f"Se esperaba una matriz (n, {len(columns)}) en el orden {columns}, "
+                    f"se recibió shape={features.shape}"
+                )
+            return pd.DataFrame(features, columns=columns)
+        return pd.DataFrame.from_records(list(features), columns=columns)
+
+    def _predict_chunk(self, chunk: pd.DataFrame) -> np.ndarray:
+        """Una llamada vectorizada al modelo; si el snapshot no lo soporta, fila a fila."""
+        if self._batch_supported is not False:
+            try:
+                preds = np.asarray(self.hf_predict(chunk), dtype=float).reshape(-1)
+                if len(preds) == len(chunk):
+                    self._batch_supported = True
+                    return preds
+            except Exception:
+                if self._batch_supported:
+                    raise
+            self._batch_supported = False
+
+        records = chunk.to_dict("records")
+        return np.array([self._predict_cached(r)[0] for r in records], dtype=float)
+
+    def predict_many(self, features: FeatureBatch, chunk_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+        """Predice un lote de sesiones con una llamada al modelo por bloque.
+
+        `features` puede ser un DataFrame con las columnas del modelo, una lista
+        de diccionarios (`SessionInfo.to_model_dict()`) o una matriz (n, 9) en el
+        orden de `feature_names`. Devuelve un np.ndarray en el orden de entrada.
+        Con la tabla surrogate activa, solo las filas que no cubre van al modelo.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size debe ser mayor que 0")
+        if self.surrogate is None:
+            return self.predict_many_exact(features, chunk_size=chunk_size)
+
+        frame = self._to_frame(features)
+        preds = self.surrogate.predict_frame(frame)
+        missing = np.isnan(preds)
+        if missing.any():
+            preds[missing] = self.predict_many_exact(frame[missing], chunk_size=chunk_size)
+        return preds
+
+    def predict_many_exact(self, features: FeatureBatch, chunk_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+        """Como `predict_many`, pero siempre con el modelo real (sin tabla surrogate)."""
+        if self.hf_predict is None:
+            raise RuntimeError("El modelo aún no ha sido cargado correctamente.")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size debe ser mayor que 0")
+
+        frame = self._to_frame(features)
+        if len(frame) == 0:
+            return np.empty(0, dtype=float)
+
+        return np.concatenate([
+            self._predict_chunk(frame.iloc[start:start + chunk_size].reset_index(drop=True))
+            for start in range(0, len(frame), chunk_size)
+        ])
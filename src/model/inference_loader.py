@@ -0,0 +1,141 @@
+"""Carga del `inference.py` de un snapshot sin tocar estado global del proceso.
+
+Cada snapshot se importa como un paquete con nombre único
+(`_ev_snapshot_<hash de la ruta>`, con `__path__ = [snapshot_dir]`) e
+`inference.py` como su submódulo `inference`, así que varias versiones del
+modelo pueden convivir en el mismo proceso. No se modifica `sys.path` ni se
+hace `os.chdir`:
+
+- Los módulos hermanos del snapshot son submódulos del paquete. Un
+  `import helper` absoluto dentro del snapshot se redirige a
+  `<paquete>.helper`, también si se hace de forma diferida dentro de una
+  función, y un `helper` ya presente en `sys.modules` no lo tapa.
+- `__file__` apunta al archivo real y el módulo recibe `SNAPSHOT_DIR`; las
+  rutas a pesos y artefactos deben construirse a partir de ellos.
+- `open()` dentro de los módulos del snapshot resuelve además rutas relativas
+  contra el directorio del snapshot.
+"""
+
+import builtins
+import hashlib
+import importlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import threading
+from types import ModuleType
+from typing import Dict, FrozenSet
+
+
+INFERENCE_FILENAME = "inference.py"
+INFERENCE_MODULE = "inference"
+
+_LOAD_LOCK = threading.RLock()
+_LOADED: Dict[str, ModuleType] = {}
+
+
+def _package_name(snapshot_dir: str) -> str:
+    digest = hashlib.sha1(snapshot_dir.encode("utf-8")).hexdigest()[:12]
+    return f"_ev_snapshot_{digest}"
+
+
+def _top_level_modules(snapshot_dir: str) -> FrozenSet[str]:
+    """Nombres importables en la raíz del snapshot (`helper.py` o `helper/__init__.py`)."""
+    names = set()
+    for entry in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, entry)
+        if entry.endswith(".py") and os.path.isfile(path):
+            names.add(entry[:-3])
+        elif os.path.isfile(os.path.join(path, "__init__.py")):
+            names.add(entry)
+    return frozenset(name for name in names if name.isidentifier())
+
+
+class _SnapshotFinder(importlib.abc.MetaPathFinder):
+    """Sirve `<paquete>.*` desde el snapshot con un loader que aísla sus imports.
+
+    Queda registrado mientras viva el proceso (los imports diferidos lo
+    necesitan), pero solo responde a nombres bajo su propio paquete.
+    """
+
+    def __init__(self, package: str, snapshot_dir: str):
+        self.package = package
+        self.snapshot_dir = snapshot_dir
+        self.siblings = _top_level_modules(snapshot_dir)
+        self._builtins = dict(builtins.__dict__, __import__=self._import, open=self._open)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not fullname.startswith(self.package + "."):
+            return None
+        base = os.path.join(self.snapshot_dir, *fullname.split(".")[1:])
+        if os.path.isfile(base + ".py"):
+            location, search = base + ".py", None
+        elif os.path.isfile(os.path.join(base, "__init__.py")):
+            location, search = os.path.join(base, "__init__.py"), [base]
+        else:
+            return None
+        return importlib.util.spec_from_file_location(
+            fullname, location,
+            loader=_SnapshotLoader(fullname, location, self),
+            submodule_search_locations=search,
+        )
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        top = name.partition(".")[0]
+        if level != 0 or top not in self.siblings:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+        # `import helper` -> `<paquete>.helper`, ligado igualmente como `helper`
+        module = builtins.__import__(f"{self.package}.{name}", globals, locals, fromlist, 0)
+        return module if fromlist else sys.modules[f"{self.package}.{top}"]
+
+    def _open(self, file, *args, **kwargs):
+        if isinstance(file, (str, os.PathLike)) and not os.path.isabs(file):
+            file = os.path.join(self.snapshot_dir, file)
+        return builtins.open(file, *args, **kwargs)
+
+
+class _SnapshotLoader(importlib.machinery.SourceFileLoader):
+    def __init__(self, fullname: str, path: str, finder: _SnapshotFinder):
+        super().__init__(fullname, path)
+        self.finder = finder
+
+    def exec_module(self, module: ModuleType) -> None:
+        module.__dict__["__builtins__"] = self.finder._builtins
+        module.__dict__["SNAPSHOT_DIR"] = self.finder.snapshot_dir
+        super().exec_module(module)
+
+
+def _discard(package: str, finder: _SnapshotFinder) -> None:
+    if finder in sys.meta_path:
+        sys.meta_path.remove(finder)
+    for name in [n for n in sys.modules if n == package or n.startswith(package + ".")]:
+        sys.modules.pop(name, None)
+
+
+def load_inference_module(snapshot_dir: str) -> ModuleType:
+    """Importa `<snapshot_dir>/inference.py` como `<paquete único>.inference` (una vez por snapshot)."""
+    snapshot_dir = os.path.realpath(snapshot_dir)
+    if not os.path.isfile(os.path.join(snapshot_dir, INFERENCE_FILENAME)):
+        raise FileNotFoundError(f"No existe {INFERENCE_FILENAME} en el snapshot {snapshot_dir}")
+
+    with _LOAD_LOCK:
+        module = _LOADED.get(snapshot_dir)
+        if module is not None:
+            return module
+
+        package = _package_name(snapshot_dir)
+        spec = importlib.machinery.ModuleSpec(package, None, is_package=True)
+        spec.submodule_search_locations = [snapshot_dir]
+        sys.modules[package] = importlib.util.module_from_spec(spec)
+        finder = _SnapshotFinder(package, snapshot_dir)
+        sys.meta_path.insert(0, finder)
+        try:
+            module = importlib.import_module(f"{package}.{INFERENCE_MODULE}")
+        except BaseException:
+            _discard(package, finder)
+            raise
+
+        _LOADED[snapshot_dir] = module
+        return module
@@ -0,0 +1,106 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+
+
+# Features continuas que admiten cubetas. Charge_Efficiency (parámetro fijo) y
+# Vehicle Age (años enteros) siempre se comparan exactos.
+QUANTIZABLE_FEATURES = (
+    "Battery Capacity (kWh)",
+    "SoC_diff",
+    "Charging Duration (hours)",
+    "Energy_est_SoC",
+    "Charging_Rate",
+    "Power_proxy",
+    "Energy_per_SoC",
+)
+
+
+class PredictionCache:
+    """Caché LRU acotada y thread-safe para predicciones del modelo.
+
+    La clave es la versión canónica del diccionario de features
+    (`SessionInfo.to_model_dict()`): claves ordenadas, números como float y
+    None/NaN como None. `quantum` fija un tamaño de cubeta por feature
+    (p. ej. {"Battery Capacity (kWh)": 0.5, "Energy_per_SoC": 0.005}): las
+    features de QUANTIZABLE_FEATURES que aparecen se redondean a su cubeta,
+    y el resto se compara exacto, así una cubeta ancha en kWh no mezcla
+    duraciones ni eficiencias distintas. Las features derivadas de una
+    entrada (Energy_per_SoC de la capacidad, etc.) necesitan su propia cubeta
+    para que sesiones cercanas compartan entrada; el valor guardado es la
+    predicción de la primera sesión de la cubeta.
+    """
+
+    def __init__(self, maxsize: int, quantum: Optional[Mapping[str, float]] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize debe ser mayor que 0")
+        quantum = dict(quantum or {})
+        unknown = set(quantum) - set(QUANTIZABLE_FEATURES)
+        if unknown:
+            raise ValueError(f"quantum solo admite features continuas {QUANTIZABLE_FEATURES}; no {sorted(unknown)}")
+        if any(not q > 0 for q in quantum.values()):
+            raise ValueError("Cada quantum debe ser mayor que 0")
+        self.maxsize = maxsize
+        self.quantum: Dict[str, float] = quantum
+        self._data: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _canonical_value(self, name: str, value: Any) -> Any:
+        if value is None:
+            return None
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return value
+        if math.isnan(number):
+            return None
+        quantum = self.quantum.get(name)
+        if quantum is not None:
+            return round(number / quantum)
+        return number
+
+    def make_key(self, session_info: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+        return tuple(
+            (name, self._canonical_value(name, session_info[name]))
+            for name in sorted(session_info)
+        )
+
+    def get(self, key: Hashable) -> Optional[List[float]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return list(value)
+
+    def put(self, key: Hashable, value: List[float]) -> None:
+        with self._lock:
+            self._data[key] = list(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "quantum": dict(self.quantum),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,173 @@
+"""Resolución y verificación del directorio del snapshot del modelo.
+
+Permite cargar el modelo sin contactar el Hub:
+    - `local_dir`: un directorio con el snapshot ya copiado (nodos sin red).
+    - `local_files_only`: usa la caché de Hugging Face sin hacer peticiones.
+    - `revision`: fija la revisión (commit, tag o rama) del snapshot.
+
+La verificación de integridad usa un manifiesto opcional
+(`ev_snapshot_manifest.json`) con tamaño y sha256 de cada archivo:
+
+    python -m src.model.snapshot write-manifest /ruta/al/snapshot
+    python -m src.model.snapshot verify /ruta/al/snapshot --full
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+from huggingface_hub import snapshot_download
+
+
+MANIFEST_NAME = "ev_snapshot_manifest.json"
+REQUIRED_FILES = ("inference.py",)
+
+# Niveles de verificación de integridad
+VERIFY_NONE = "none"
+VERIFY_QUICK = "quick"  # archivos presentes y tamaños del manifiesto
+VERIFY_FULL = "full"    # además, sha256 de cada archivo
+VERIFY_LEVELS = (VERIFY_NONE, VERIFY_QUICK, VERIFY_FULL)
+
+
+class SnapshotIntegrityError(RuntimeError):
+    """El snapshot local está incompleto o no coincide con su manifiesto."""
+
+
+def resolve_snapshot_dir(
+    repo_id: str,
+    revision: Optional[str] = None,
+    local_dir: Optional[str] = None,
+    local_files_only: bool = False,
+    force_download: bool = False,
+) -> str:
+    """Devuelve el directorio del snapshot, sin red si `local_dir` o `local_files_only`."""
+    if local_dir:
+        if not os.path.isdir(local_dir):
+            raise FileNotFoundError(f"No existe el directorio de snapshot local {local_dir}")
+        return os.path.abspath(local_dir)
+
+    if local_files_only:
+        try:
+            return snapshot_download(repo_id=repo_id, revision=revision, local_files_only=True)
+        except Exception as exc:
+            raise RuntimeError(
+                f"El snapshot {repo_id}@{revision or 'main'} no está en la caché local "
+                f"y el modo sin red está activo. Error: {exc}"
+            ) from exc
+
+    return snapshot_download(repo_id=repo_id, revision=revision, force_download=force_download)
+
+
+def _iter_files(snapshot_dir: str) -> List[str]:
+    files = []
+    for root, dirs, names in os.walk(snapshot_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+        for name in names:
+            if name == MANIFEST_NAME or name.startswith("."):
+                continue
+            files.append(os.path.relpath(os.path.join(root, name), snapshot_dir))
+    return sorted(files)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_fingerprint(snapshot_dir: str) -> str:
+    """Huella corta del snapshot: nombre y tamaño de cada archivo + sha256 de inference.py.
+
+    Sirve para invalidar datos derivados del modelo (p. ej. la tabla surrogate)
+    sin hashear los pesos en cada arranque.
+    """
+    digest = hashlib.sha256()
+    for rel in _iter_files(snapshot_dir):
+        if rel.endswith(".pyc"):
+            continue
+        digest.update(f"{rel}:{os.path.getsize(os.path.join(snapshot_dir, rel))}\n".encode("utf-8"))
+    inference_path = os.path.join(snapshot_dir, "inference.py")
+    if os.path.isfile(inference_path):
+        digest.update(_sha256(inference_path).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def write_manifest(snapshot_dir: str, revision: Optional[str] = None) -> str:
+    """Genera el manifiesto (tamaño + sha256 por archivo) y devuelve su ruta."""
+    files: Dict[str, Dict[str, object]] = {}
+    for rel in _iter_files(snapshot_dir):
+        path = os.path.join(snapshot_dir, rel)
+        files[rel] = {"size": os.path.getsize(path), "sha256": _sha256(path)}
+
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    with open(manifest_path, "w", encoding="utf-8") as fh:
+        json.dump({"revision": revision, "files": files}, fh, indent=2, sort_keys=True)
+    return manifest_path
+
+
+def verify_snapshot(snapshot_dir: str, level: str = VERIFY_QUICK) -> None:
+    """Comprueba el snapshot; lanza SnapshotIntegrityError si algo no cuadra.
+
+    Sin manifiesto solo se comprueban los archivos obligatorios y que no haya
+    enlaces rotos (típico de una caché de HF a medio descargar).
+    """
+    if level not in VERIFY_LEVELS:
+        raise ValueError(f"Nivel de verificación desconocido: {level!r} (usa {VERIFY_LEVELS})")
+    if level == VERIFY_NONE:
+        return
+
+    problems: List[str] = []
+    for name in REQUIRED_FILES:
+        if not os.path.isfile(os.path.join(snapshot_dir, name)):
+            problems.append(f"falta {name}")
+
+    for root, _, names in os.walk(snapshot_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.islink(path) and not os.path.exists(path):
+                problems.append(f"enlace roto {os.path.relpath(path, snapshot_dir)}")
+
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        for rel, expected in manifest.get("files", {}).items():
+            path = os.path.join(snapshot_dir, rel)
+            if not os.path.isfile(path):
+                problems.append(f"falta {rel}")
+                continue
+            if os.path.getsize(path) != expected.get("size"):
+                problems.append(f"tamaño distinto en {rel}")
+            elif level == VERIFY_FULL and _sha256(path) != expected.get("sha256"):
+                problems.append(f"sha256 distinto en {rel}")
+
+    if problems:
+        raise SnapshotIntegrityError(
+            f"Snapshot inválido en {snapshot_dir}: " + "; ".join(problems)
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manifiesto e integridad del snapshot del modelo.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    write = sub.add_parser("write-manifest", help="Genera el manifiesto del snapshot")
+    write.add_argument("snapshot_dir")
+    write.add_argument("--revision", default=None)
+    verify = sub.add_parser("verify", help="Verifica el snapshot contra su manifiesto")
+    verify.add_argument("snapshot_dir")
+    verify.add_argument("--full", action="store_true", help="Comprueba también los sha256")
+    args = parser.parse_args(argv)
+
+    if args.command == "write-manifest":
+        print(f"Manifiesto escrito en {write_manifest(args.snapshot_dir, args.revision)}")
+    else:
+        verify_snapshot(args.snapshot_dir, VERIFY_FULL if args.full else VERIFY_QUICK)
+        print(f"Snapshot OK: {args.snapshot_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""Tabla surrogate del modelo: predicciones precalculadas e interpolación multilineal.
+
+Las nueve features de `SessionInfo.to_model_dict()` se derivan de cuatro
+entradas (capacidad, SoC_diff, duración y edad) más una eficiencia fija, así
+que basta precalcular el modelo real sobre una rejilla 4-D de esas entradas.
+Una consulta interpola entre las 16 esquinas de su celda (microsegundos, sin
+llamar al modelo). Las sesiones fuera de la rejilla, o cuyas features no
+siguen las fórmulas de `SessionCompleter`, se devuelven como "no cubiertas"
+para que `EVEnergyModel` use el modelo real.
+
+La rejilla se guarda en un `.npz` con la huella del snapshot y un informe
+de error medido contra el modelo real en puntos aleatorios. Conviene
+construirla antes de desplegar; construirla al arrancar evalúa el modelo en
+toda la rejilla (~212 000 puntos) y bloquea la carga hasta terminar:
+
+    python -m src.model.surrogate build --local-dir /opt/models/ev-test-train
+    python -m src.model.surrogate report
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.core.session_completer import SessionCompleter
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_SURROGATE_PATH = os.path.join(PROJECT_ROOT, "data", "ev_surrogate.npz")
+FORMAT_VERSION = 1
+
+# Entradas efectivas del modelo, en el orden de los ejes de la rejilla
+SURROGATE_INPUTS = (
+    "Battery Capacity (kWh)",
+    "SoC_diff",
+    "Charging Duration (hours)",
+    "Vehicle Age (years)",
+)
+DEFAULT_EFFICIENCY = 0.92
+_REFERENCE_YEAR = 2000
+
+# Recibe una matriz (n, 9) en el orden de `feature_names` y devuelve n predicciones
+PredictFn = Callable[[np.ndarray], np.ndarray]
+
+
+def default_axes() -> List[np.ndarray]:
+    """Ejes por defecto: la duración es geométrica porque Charging_Rate ~ 1/duración."""
+    return [
+        np.linspace(10.0, 200.0, 20),        # capacidad (kWh), paso 10
+        np.linspace(0.0, 100.0, 21),         # SoC_diff (puntos), paso 5
+        np.geomspace(0.1, 48.0, 24),         # duración (h)
+        np.arange(0.0, 21.0),                # edad (años)
+    ]
+
+
+def _isclose(a: float, b: float) -> bool:
+    return math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-9)
+
+
+class SurrogateGrid:
+    """Rejilla 4-D de predicciones con interpolación multilineal."""
+
+    def __init__(
+        self,
+        axes: Sequence[np.ndarray],
+        values: np.ndarray,
+        efficiency: float = DEFAULT_EFFICIENCY,
+        meta: Optional[Dict[str, Any]] = None,
+    ):
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self.values = np.asarray(values, dtype=float)
+        if self.values.shape != tuple(len(axis) for axis in self.axes):
+            raise ValueError(f"values.shape={self.values.shape} no coincide con los ejes")
+        if any(len(axis) < 2 or np.any(np.diff(axis) <= 0) for axis in self.axes):
+            raise ValueError("Cada eje necesita al menos dos valores estrictamente crecientes")
+        self.efficiency = float(efficiency)
+        self.meta: Dict[str, Any] = dict(meta or {})
+        # Contadores compartidos por los hilos que predicen con la misma tabla
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+
+        # Camino escalar en Python puro: numpy cuesta más que la propia cuenta para un punto
+        self._axes_list = [axis.tolist() for axis in self.axes]
+        self._flat = self.values.ravel().tolist()
+        self._strides = [s // self.values.itemsize for s in self.values.strides]
+        self._corners = list(itertools.product((0, 1), repeat=len(self.axes)))
+        # Desplazamiento de cada esquina respecto a la esquina inferior de la celda
+        self._corner_offsets = [
+            sum(bit * stride for bit, stride in zip(corner, self._strides)) for corner in self._corners
+        ]
+
+    @property
+    def bounds(self) -> List[Tuple[float, float]]:
+        return [(axis[0], axis[-1]) for axis in self._axes_list]
+
+    def interpolate_one(self, point: Sequence[float]) -> Optional[float]:
+        """Valor interpolado en `point` (capacidad, SoC_diff, duración, edad); None si está fuera."""
+        base = 0
+        fractions: List[float] = []
+        for x, axis, stride in zip(point, self._axes_list, self._strides):
+            if not axis[0] <= x <= axis[-1]:
+                return None
+            i = min(bisect.bisect_right(axis, x) - 1, len(axis) - 2)
+            fractions.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+            base += i * stride
+
+        # Interpolación lineal eje a eje empezando por el último (15 lerps para 4 ejes)
+        flat = self._flat
+        values = [flat[base + offset] for offset in self._corner_offsets]
+        for t in reversed(fractions):
+            values = [lo + t * (hi - lo) for lo, hi in zip(values[::2], values[1::2])]
+        return values[0]
+
+    def interpolate(self, points: np.ndarray) -> np.ndarray:
+        """Versión vectorizada: matriz (n, 4) -> n valores (NaN fuera de la rejilla)."""
+        points = np.asarray(points, dtype=float)
+        n = len(points)
+        inside = np.ones(n, dtype=bool)
+        index, frac = [], []
+        for d, axis in enumerate(self.axes):
+            x = points[:, d]
+            inside &= (x >= axis[0]) & (x <= axis[-1])
+            i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+            index.append(i)
+            frac.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+
+        result = np.zeros(n)
+        for corner in self._corners:
+            w = np.ones(n)
+            idx = []
+            for bit, i, t in zip(corner, index, frac):
+                w *= t if bit else 1.0 - t
+                idx.append(i + bit)
+            result += w * self.values[tuple(idx)]
+        result[~inside] = np.nan
+        return result
+
+    def session_point(self, session_info: Dict[str, Any]) -> Optional[Tuple[float, ...]]:
+        """Entradas de la rejilla para una sesión, o None si sus features no son las derivadas estándar."""
+        try:
+            batt, soc_diff, duration, age = (float(session_info[name]) for name in SURROGATE_INPUTS)
+            energy_est = float(session_info["Energy_est_SoC"])
+            rate = float(session_info["Charging_Rate"])
+            proxy = float(session_info["Power_proxy"])
+            efficiency = float(session_info["Charge_Efficiency"])
+            energy_per_soc = float(session_info["Energy_per_SoC"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if math.isnan(age) or duration <= 0:
+            return None
+        consistent = (
+            _isclose(efficiency, self.efficiency)
+            and _isclose(energy_per_soc, batt / 100.0)
+            and _isclose(energy_est, soc_diff * batt / 100.0)
+            and _isclose(rate, energy_est / duration)
+            and _isclose(proxy, rate)
+        )
+        return (batt, soc_diff, duration, age) if consistent else None
+
+    def predict_session(self, session_info: Dict[str, Any]) -> Optional[float]:
+        """Predicción interpolada para una sesión; None si hay que usar el modelo real."""
+        point = self.session_point(session_info)
+        value = self.interpolate_one(point) if point is not None else None
+        with self._stats_lock:
+            if value is None:
+                self.fallbacks += 1
+            else:
+                self.hits += 1
+        return value
+
+    def predict_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """Predicciones para un lote con las columnas del modelo; NaN donde hay que usar el modelo real."""
+        batt, soc_diff, duration, age = (frame[name].to_numpy(dtype=float) for name in SURROGATE_INPUTS)
+        energy_est = frame["Energy_est_SoC"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            expected_rate = energy_est / duration
+        close = lambda a, b: np.isclose(a, b, rtol=1e-6, atol=1e-9)
+        consistent = (
+            close(frame["Charge_Efficiency"].to_numpy(dtype=float), self.efficiency)
+            & close(frame["Energy_per_SoC"].to_numpy(dtype=float), batt / 100.0)
+            & close(energy_est, soc_diff * batt / 100.0)
+            & close(frame["Charging_Rate"].to_numpy(dtype=float), expected_rate)
+            & close(frame["Power_proxy"].to_numpy(dtype=float), expected_rate)
+            & (duration > 0)
+        )
+        preds = self.interpolate(np.column_stack([batt, soc_diff, duration, age]))
+        preds[~consistent] = np.nan
+        covered = int(np.count_nonzero(~np.isnan(preds)))
+        with self._stats_lock:
+            self.hits += covered
+            self.fallbacks += len(preds) - covered
+        return preds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            hits, fallbacks = self.hits, self.fallbacks
+        total = hits + fallbacks
+        return {
+            "hits": hits,
+            "fallbacks": fallbacks,
+            "hit_rate": hits / total if total else None,
+            "grid_points": int(self.values.size),
+            "error_report": self.meta.get("error_report"),
+        }
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = dict(self.meta, format_version=FORMAT_VERSION, efficiency=self.efficiency)
+        arrays = {f"axis_{d}": axis for d, axis in enumerate(self.axes)}
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez_compressed(tmp, values=self.values, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "SurrogateGrid":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format_version") != FORMAT_VERSION:
+                raise ValueError(f"Versión de tabla surrogate no soportada en {path}")
+            axes = [data[f"axis_{d}"] for d in range(len(SURROGATE_INPUTS))]
+            return cls(axes, data["values"], efficiency=meta["efficiency"], meta=meta)
+
+
+def _feature_matrix(
+    points: np.ndarray,
+    efficiency: float,
+    feature_names: Optional[Sequence[str]],
+) -> np.ndarray:
+    """Features del modelo para puntos (capacidad, SoC_diff, duración, edad)."""
+    # Año de referencia arbitrario: solo importa la edad (los ejes de edad son enteros)
+    completer = SessionCompleter(current_year=_REFERENCE_YEAR)
+    return completer.build_matrix_from_raw(
+        battery_capacity_kwh=points[:, 0],
+        soc_start_pct=np.zeros(len(points)),
+        soc_end_pct=points[:, 1],
+        charging_duration_hours=points[:, 2],
+        vehicle_year=_REFERENCE_YEAR - points[:, 3],
+        default_efficiency=efficiency,
+        feature_names=feature_names,
+    )
+
+
+def measure_error(
+    grid: SurrogateGrid,
+    predict_fn: PredictFn,
+    feature_names: Optional[Sequence[str]] = None,
+    samples: int = 2000,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Error de la interpolación frente al modelo real en puntos aleatorios dentro de la rejilla.
+
+    La duración se muestrea en escala logarítmica y la edad en años enteros,
+    como llegan desde la app.
+    """
+    rng = np.random.default_rng(seed)
+    (c0, c1), (s0, s1), (d0, d1), (a0, a1) = grid.bounds
+    points = np.column_stack([
+        rng.uniform(c0, c1, samples),
+        rng.uniform(s0, s1, samples),
+        np.exp(rng.uniform(np.log(d0), np.log(d1), samples)),
+        rng.integers(int(a0), int(a1) + 1, samples).astype(float),
+    ])
+    exact = np.asarray(predict_fn(_feature_matrix(points, grid.efficiency, feature_names)), dtype=float)
+    approx = grid.interpolate(points)
+    abs_error = np.abs(approx - exact)
+    # Error relativo solo donde la energía es apreciable (evita dividir por ~0)
+    significant = np.abs(exact) >= 1.0
+    rel_error = abs_error[significant] / np.abs(exact[significant])
+    return {
+        "samples": samples,
+        "seed": seed,
+        "max_abs_error_kwh": float(abs_error.max()),
+        "mean_abs_error_kwh": float(abs_error.mean()),
+        "p99_abs_error_kwh": float(np.percentile(abs_error, 99)),
+        "max_rel_error": float(rel_error.max()) if len(rel_error) else None,
+        "mean_rel_error": float(rel_error.mean()) if len(rel_error) else None,
+    }
+
+
+def build_surrogate(
+    predict_fn: PredictFn,
+    feature_names: Optional[Sequence[str]] = None,
+    axes: Optional[Sequence[np.ndarray]] = None,
+    efficiency: float = DEFAULT_EFFICIENCY,
+    samples: int = 2000,
+    meta: Optional[Dict[str, Any]] = None,
+) -> SurrogateGrid:
+    """Evalúa el modelo real en toda la rejilla (una llamada por lotes) y mide el error."""
+    axes = [np.asarray(axis, dtype=float) for axis in (axes or default_axes())]
+    start = time.perf_counter()
+    mesh = np.meshgrid(*axes, indexing="ij")
+    points = np.column_stack([m.ravel() for m in mesh])
+    values = np.asarray(predict_fn(_feature_matrix(points, efficiency, feature_names)), dtype=float)
+    grid = SurrogateGrid(axes, values.reshape(mesh[0].shape), efficiency=efficiency, meta=meta)
+    build_s = time.perf_counter() - start
+
+    grid.meta["error_report"] = measure_error(grid, predict_fn, feature_names, samples=samples)
+    grid.meta["build_seconds"] = round(build_s, 3)
+    logger.info(
+        "🧮 Tabla surrogate: %d puntos en %.1f s; error máx %.4f kWh, medio %.4f kWh",
+        values.size, build_s,
+        grid.meta["error_report"]["max_abs_error_kwh"], grid.meta["error_report"]["mean_abs_error_kwh"],
+    )
+    return grid
+
+
+def load_or_build(
+    predict_fn: PredictFn,
+    fingerprint: str,
+    feature_names: Optional[Sequence[str]] = None,
+    path: str = DEFAULT_SURROGATE_PATH,
+    build_missing: bool = True,
+) -> Optional[SurrogateGrid]:
+    """Carga la tabla de `path` si corresponde al snapshot `fingerprint`; si no, la construye y guarda.
+
+    Con `build_missing=False` no se construye: devuelve None y el modelo
+    predice sin tabla hasta que se ejecute `python -m src.model.surrogate build`.
+    """
+    if os.path.exists(path):
+        try:
+            grid = SurrogateGrid.load(path)
+            if grid.meta.get("model_fingerprint") == fingerprint:
+                return grid
+            logger.info("🧮 La tabla surrogate de %s es de otro snapshot; se reconstruye", path)
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("⚠️ Tabla surrogate ilegible en %s (%s); se reconstruye", path, exc)
+
+    if not build_missing:
+        logger.warning(
+            "⚠️ Sin tabla surrogate válida en %s: se usa el modelo real. "
+            "Constrúyela con `python -m src.model.surrogate build --output %s`", path, path,
+        )
+        return None
+    points = int(np.prod([len(axis) for axis in default_axes()]))
+    logger.warning(
+        "⚠️ Construyendo la tabla surrogate al arrancar: %d evaluaciones del modelo, la carga "
+        "queda bloqueada hasta terminar. Precompílala con `python -m src.model.surrogate build "
+        "--output %s` (o EV_SURROGATE_BUILD=0 para no construirla aquí)", points, path,
+    )
+    grid = build_surrogate(predict_fn, feature_names, meta={"model_fingerprint": fingerprint})
+    try:
+        grid.save(path)
+    except OSError as exc:
+        logger.warning("⚠️ No se pudo guardar la tabla surrogate en %s (%s)", path, exc)
+    return grid
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Tabla surrogate del modelo de energía.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Precalcula la rejilla con el modelo real y la guarda")
+    build.add_argument("--local-dir", default=None, help="Snapshot local del modelo (o EV_MODEL_LOCAL_DIR)")
+    build.add_argument("--output", default=DEFAULT_SURROGATE_PATH)
+    build.add_argument("--samples", type=int, default=2000, help="Puntos aleatorios para medir el error")
+    report = sub.add_parser("report", help="Muestra el informe de error de una tabla guardada")
+    report.add_argument("path", nargs="?", default=DEFAULT_SURROGATE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        grid = SurrogateGrid.load(args.path)
+        print(json.dumps({"grid_points": int(grid.values.size), "bounds": grid.bounds, **grid.meta}, indent=2))
+        return
+
+    # Import diferido: ev_model importa este módulo
+    from src.model.ev_model import EVEnergyModel
+    from src.model.snapshot import snapshot_fingerprint
+
+    model = EVEnergyModel(local_dir=args.local_dir, surrogate=False)
+    grid = build_surrogate(
+        model.predict_many_exact,
+        model.feature_names,
+        samples=args.samples,
+        meta={"model_fingerprint": snapshot_fingerprint(model.local_dir)},
+    )
+    grid.save(args.output)
+    print(f"Tabla surrogate escrita en {args.output}")
+    print(json.dumps(grid.meta["error_report"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
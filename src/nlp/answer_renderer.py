@@ -0,0 +1,116 @@
+import hashlib
+import os
+from typing import Any, Callable, Dict, Optional
+
+
+RENDERER_ENV = "EV_ANSWER_RENDERER"
+TEMPLATE_SHARE_ENV = "EV_ANSWER_TEMPLATE_SHARE"
+
+VARIANT_LLM = "llm"
+VARIANT_TEMPLATE = "template"
+# Modo A/B: una fracción de las respuestas en modo predict usa la plantilla
+VARIANT_AB = "ab"
+
+# Recibe el resultado de `run_prediction_logic` y devuelve la respuesta al usuario
+AnswerRenderer = Callable[[Dict[str, Any]], str]
+
+
+def _num(value: Optional[float], digits: int = 1) -> str:
+    """Número con coma decimal, como se escribe en español."""
+    return f"{value:.{digits}f}".replace(".", ",")
+
+
+def render_prediction_answer(logic_result: Dict[str, Any]) -> str:
+    """Respuesta determinista en español para `mode == "predict"` (sin llamar al LLM)."""
+    session = logic_result["session_info"]
+    extracted = logic_result.get("extracted") or {}
+    row = logic_result.get("vehicle_row") or {}
+    prediction = logic_result["prediction"]
+
+    lines = []
+    if row:
+        name = f"{row.get('BRAND', '')} {row.get('MODEL', '')}".strip()
+        year = row.get("MODEL.1")
+        lines.append(f"🚗 Vehículo detectado: **{name}**" + (f" ({int(year)})." if year else "."))
+    else:
+        lines.append("🚗 No identifiqué un vehículo concreto; uso los datos que me diste.")
+
+    soc_start, soc_end = extracted.get("soc_start"), extracted.get("soc_end")
+    duration = session.get("Charging Duration (hours)")
+    window = (f"del {_num(soc_start, 0)} % al {_num(soc_end, 0)} %"
+              if soc_start is not None and soc_end is not None
+              else f"{_num(session.get('SoC_diff'), 0)} puntos de SoC")
+    lines.append("")
+    lines.append(f"Para tu sesión de carga ({window} en {_num(duration)} h):")
+
+    battery = session.get("Battery Capacity (kWh)")
+    energy = session.get("Energy_est_SoC")
+    if energy is not None:
+        detail = f" (batería de {_num(battery)} kWh)" if battery is not None else ""
+        lines.append(f"- Energía estimada cargada: **{_num(energy)} kWh**{detail}")
+    if session.get("Charging_Rate") is not None:
+        lines.append(f"- Potencia media de carga: **{_num(session['Charging_Rate'])} kW**")
+    if session.get("Charge_Efficiency") is not None:
+        lines.append(f"- Eficiencia de carga asumida: **{_num(session['Charge_Efficiency'] * 100, 0)} %**")
+    if session.get("Vehicle Age (years)") is not None:
+        lines.append(f"- Edad estimada del vehículo: **{_num(session['Vehicle Age (years)'], 0)} años**")
+
+    lines.append("")
+    lines.append(f"🔋 **Predicción del modelo: {_num(prediction)} kWh** para esta sesión.")
+    if energy:
+        # Solo la diferencia numérica: el sistema no sabe a qué se debe
+        diff = prediction - energy
+        sign = "+" if diff >= 0 else "-"
+        lines.append(
+            f"Diferencia con la energía estimada a partir del SoC: "
+            f"{sign}{_num(abs(diff))} kWh ({sign}{_num(abs(diff) / energy * 100, 0)} %)."
+        )
+    return "\n".join(lines)
+
+
+class AnswerRouter:
+    """Decide si la respuesta final la escribe el LLM o un renderer determinista.
+
+    Solo el modo `predict` puede usar el renderer; `ask_missing` y el resto
+    siempre van al LLM. Con `variant="ab"`, la asignación es estable por
+    conversación (hash de su ID; el request ID si no hay conversación), con
+    `template_share` de las conversaciones en plantilla: un usuario no ve
+    respuestas de las dos variantes en la misma conversación.
+    """
+
+    def __init__(
+        self,
+        variant: str = VARIANT_LLM,
+        renderer: AnswerRenderer = render_prediction_answer,
+        template_share: float = 0.5,
+    ):
+        if variant not in (VARIANT_LLM, VARIANT_TEMPLATE, VARIANT_AB):
+            raise ValueError(f"Variante de respuesta desconocida: {variant!r}")
+        self.variant = variant
+        self.renderer = renderer
+        self.template_share = template_share
+
+    @classmethod
+    def from_env(cls, renderer: AnswerRenderer = render_prediction_answer) -> "AnswerRouter":
+        return cls(
+            variant=os.getenv(RENDERER_ENV, VARIANT_LLM).strip().lower(),
+            renderer=renderer,
+            template_share=float(os.getenv(TEMPLATE_SHARE_ENV, "0.5")),
+        )
+
+    def variant_for(
+        self,
+        logic_result: Dict[str, Any],
+        request_id: str,
+        conversation_id: Optional[str] = None,
+    ) -> str:
+        if logic_result.get("mode") != "predict" or self.variant == VARIANT_LLM:
+            return VARIANT_LLM
+        if self.variant == VARIANT_TEMPLATE:
+            return VARIANT_TEMPLATE
+        unit = conversation_id or request_id
+        bucket = int(hashlib.sha1(unit.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return VARIANT_TEMPLATE if bucket < self.template_share else VARIANT_LLM
+
+    def render(self, logic_result: Dict[str, Any]) -> str:
+        return self.renderer(logic_result)
@@ -0,0 +1,214 @@
+"""Estado por conversación para completar los datos de la sesión en varios turnos.
+
+Tras una respuesta `ask_missing`, el siguiente mensaje ("75 kWh, 2 horas")
+solo trae lo que faltaba. `ConversationState` acumula los campos ya
+conocidos, guarda el vehículo resuelto y los candidatos pendientes de
+elegir, de modo que cada turno solo extrae el delta del mensaje nuevo.
+"""
+
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.vehicle_index import VehicleCandidate, VehicleIndex, normalize_text
+
+
+SLOT_NAMES = (
+    "brand", "model", "year", "battery_capacity_kwh", "vehicle_age_years",
+    "soc_start", "soc_end", "soc_diff", "duration_hours",
+)
+# Lo mínimo para poder predecir sin volver a preguntar: cada requisito se cumple
+# con cualquiera de sus alternativas (el vehículo o solo su capacidad; el SoC
+# inicial y final o solo su diferencia, que es lo que pregunta `ask_missing`)
+REQUIRED_SLOTS = (
+    (("brand", "model"), ("battery_capacity_kwh",)),
+    (("soc_start", "soc_end"), ("soc_diff",)),
+    (("duration_hours",),),
+)
+# Slots que describen al vehículo concreto: no sobreviven a un cambio de marca/modelo
+VEHICLE_SLOTS = ("year", "battery_capacity_kwh", "vehicle_age_years")
+# Dos formas de dar el SoC: la que llega sustituye a la otra
+SOC_SLOTS = ("soc_start", "soc_end")
+
+VehicleResolution = Tuple[Optional[Dict[str, Any]], List[VehicleCandidate]]
+
+_ORDINALS = {
+    "primero": 1, "primera": 1, "primer": 1,
+    "segundo": 2, "segunda": 2,
+    "tercero": 3, "tercera": 3, "tercer": 3,
+    "cuarto": 4, "cuarta": 4,
+    "quinto": 5, "quinta": 5,
+}
+# Respuesta a "¿Cuál de estos vehículos es el tuyo? 1) ... 2) ...": "2", "el 2", "opcion 3", "el segundo"
+CHOICE_RE = re.compile(
+    r"^(?:el|la)?\s*(?:opcion|numero|n)?\s*(\d{1,2}|" + "|".join(_ORDINALS) + r")\s*[.)]?$"
+)
+
+
+@dataclass
+class ConversationState:
+    """Campos conocidos de una conversación y la resolución de vehículo en caché."""
+
+    conversation_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    slots: Dict[str, Any] = field(default_factory=lambda: {name: None for name in SLOT_NAMES})
+    candidates: List[VehicleCandidate] = field(default_factory=list)
+    turns: int = 0
+    predictions: int = 0
+    turns_since_prediction: int = 0
+    # Entradas de la última predicción, para explorar variantes ("¿y si cargo al 90 %?")
+    last_prediction: Optional[Dict[str, Any]] = None
+    updated_at: float = field(default_factory=time.time)
+    _resolution_key: Optional[Tuple[str, str, Optional[int]]] = None
+    _resolution: Optional[VehicleResolution] = None
+
+    def merge(self, extracted: Dict[str, Any]) -> List[str]:
+        """Sobrescribe los slots con los valores no nulos de `extracted`; devuelve los que cambiaron.
+
+        Si cambia la marca o el modelo, antes se olvida lo que dependía del
+        vehículo anterior (año, batería, resolución y candidatos).
+        """
+        changed = []
+        if self._vehicle_changed(extracted):
+            for name in VEHICLE_SLOTS:
+                if self.slots.get(name) is not None:
+                    self.slots[name] = None
+                    changed.append(name)
+            self._resolution_key = self._resolution = None
+            self.candidates = []
+        replaced = ()
+        if extracted.get("soc_diff") is not None and all(extracted.get(n) is None for n in SOC_SLOTS):
+            replaced = SOC_SLOTS
+        elif any(extracted.get(n) is not None for n in SOC_SLOTS):
+            replaced = ("soc_diff",)
+        for name in replaced:
+            if self.slots.get(name) is not None:
+                self.slots[name] = None
+                changed.append(name)
+        for name in SLOT_NAMES:
+            value = extracted.get(name)
+            if value is not None and value != self.slots.get(name):
+                self.slots[name] = value
+                if name not in changed:
+                    changed.append(name)
+        return changed
+
+    def _vehicle_changed(self, extracted: Dict[str, Any]) -> bool:
+        for name in ("brand", "model"):
+            new, old = extracted.get(name), self.slots.get(name)
+            if new is None or old is None:
+                continue
+            new_n, old_n = normalize_text(str(new)), normalize_text(str(old))
+            # "ev6" tras "EV6 Long Range AWD" (o al revés) es el mismo vehículo, más o menos detallado
+            if not (new_n.startswith(old_n) or old_n.startswith(new_n)):
+                return True
+        return False
+
+    @property
+    def missing(self) -> List[str]:
+        """Slots que faltan de los requisitos sin cumplir (de su primera alternativa)."""
+        missing = []
+        for alternatives in REQUIRED_SLOTS:
+            if not any(all(self.slots.get(n) is not None for n in names) for names in alternatives):
+                missing.extend(n for n in alternatives[0] if self.slots.get(n) is None)
+        return missing
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+    def pick_candidate(self, user_msg: str, vehicle_index: VehicleIndex) -> bool:
+        """Si el mensaje elige uno de los candidatos pendientes, fija ese vehículo."""
+        if not self.candidates:
+            return False
+        match = CHOICE_RE.match(normalize_text(user_msg))
+        if not match:
+            return False
+        token = match.group(1)
+        choice = int(token) if token.isdigit() else _ORDINALS[token]
+        if not 1 <= choice <= len(self.candidates):
+            return False
+
+        chosen = self.candidates[choice - 1]
+        row = vehicle_index.get_row(chosen.row_id)
+        # El EV-DB pudo recargarse desde que se listaron los candidatos
+        if row is None or (str(row["BRAND"]), str(row["MODEL"])) != (chosen.brand, chosen.model):
+            return False
+        self.slots.update(brand=chosen.brand, model=chosen.model, year=chosen.year)
+        self._resolution_key = self._vehicle_key()
+        self._resolution = (row, [chosen])
+        self.candidates = []
+        return True
+
+    def _vehicle_key(self) -> Optional[Tuple[str, str, Optional[int]]]:
+        brand, model = self.slots.get("brand"), self.slots.get("model")
+        if not brand or not model:
+            return None
+        return normalize_text(str(brand)), normalize_text(str(model)), self.slots.get("year")
+
+    def resolve(self, resolve_fn: Callable[..., VehicleResolution]) -> VehicleResolution:
+        """Resolución del vehículo actual, reutilizada mientras marca/modelo/año no cambien."""
+        key = self._vehicle_key()
+        if key is not None and key == self._resolution_key and self._resolution is not None:
+            return self._resolution
+        resolution = resolve_fn(self.slots.get("brand"), self.slots.get("model"), year=self.slots.get("year"))
+        self._resolution_key, self._resolution = key, resolution
+        return resolution
+
+    def record_result(self, logic_result: Dict[str, Any]) -> None:
+        """Actualiza contadores y candidatos pendientes tras `run_prediction_logic`."""
+        self.turns += 1
+        self.turns_since_prediction += 1
+        self.updated_at = time.time()
+        # Candidatos por nombre o por capacidad: el siguiente turno puede elegir uno
+        self.candidates = (
+            [VehicleCandidate(**c) for c in logic_result.get("vehicle_candidates", [])]
+            if logic_result.get("vehicle_row") is None else []
+        )
+        if logic_result["mode"] == "predict":
+            self.predictions += 1
+            self.turns_since_prediction = 0
+            # Las entradas de la sesión predicha, tal como las construyó run_prediction_logic
+            self.last_prediction = dict(logic_result["raw_inputs"], prediction=logic_result["prediction"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "conversation_id": self.conversation_id,
+            "slots": dict(self.slots),
+            "pending_candidates": [c.label() for c in self.candidates],
+            "turns": self.turns,
+            "predictions": self.predictions,
+        }
+
+
+class ConversationStore:
+    """Estados por ID de conversación (para usos fuera de Streamlit), con LRU y expiración."""
+
+    def __init__(self, max_conversations: int = 10_000, ttl_s: float = 3600.0):
+        self.max_conversations = max_conversations
+        self.ttl_s = ttl_s
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str) -> ConversationState:
+        """Estado de `conversation_id` (se crea vacío si no existe o expiró)."""
+        now = time.time()
+        with self._lock:
+            state = self._states.get(conversation_id)
+            if state is None or now - state.updated_at > self.ttl_s:
+                state = ConversationState(conversation_id=conversation_id)
+                self._states[conversation_id] = state
+            self._states.move_to_end(conversation_id)
+            while len(self._states) > self.max_conversations:
+                self._states.popitem(last=False)
+            return state
+
+    def drop(self, conversation_id: str) -> None:
+        with self._lock:
+            self._states.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._states)
@@ -0,0 +1,519 @@
+"""Cliente LLM resiliente: pool HTTP compartido, deadlines, reintentos, límite de concurrencia y circuit breaker.
+
+`ResilientChatModel` envuelve cualquier chat model de LangChain (ChatGroq en
+producción, un stub en benchmarks) y sigue siendo un chat model, así que
+`prompt | llm | parser`, `invoke`, `ainvoke` y `stream` funcionan igual.
+
+Variables de entorno (ver `LLMClientConfig.from_env`):
+    EV_LLM_BASE_URL          servidor compatible con OpenAI/Groq (p. ej. un stand-in local)
+    EV_LLM_TIMEOUT_S         deadline total por llamada, reintentos incluidos (60)
+    EV_LLM_ATTEMPT_TIMEOUT_S timeout HTTP de cada intento (20)
+    EV_LLM_MAX_RETRIES       reintentos ante errores transitorios (2)
+    EV_LLM_MAX_CONCURRENCY   llamadas simultáneas por proceso (8)
+    EV_LLM_BREAKER_FAILURES  fallos seguidos que abren el circuito (5)
+    EV_LLM_BREAKER_RESET_S   segundos con el circuito abierto antes de probar otra vez (30)
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, TypeVar
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+from src.core.telemetry import metrics
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Códigos HTTP que vale la pena reintentar
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Errores de transporte (httpx / SDKs de Groq y OpenAI), por nombre para no importar los SDKs
+RETRYABLE_ERROR_NAMES = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "TimeoutException", "ConnectError", "ReadError", "RemoteProtocolError", "PoolTimeout",
+}
+
+
+class LLMUnavailableError(RuntimeError):
+    """El LLM no respondió a tiempo, se agotaron los reintentos o el circuito está abierto."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+@dataclass
+class LLMClientConfig:
+    timeout_s: float = 60.0
+    attempt_timeout_s: float = 20.0
+    max_retries: int = 2
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    max_concurrency: int = 8
+    breaker_failures: int = 5
+    breaker_reset_s: float = 30.0
+    max_connections: int = 20
+    base_url: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "LLMClientConfig":
+        return cls(
+            timeout_s=float(os.getenv("EV_LLM_TIMEOUT_S", "60")),
+            attempt_timeout_s=float(os.getenv("EV_LLM_ATTEMPT_TIMEOUT_S", "20")),
+            max_retries=int(os.getenv("EV_LLM_MAX_RETRIES", "2")),
+            max_concurrency=int(os.getenv("EV_LLM_MAX_CONCURRENCY", "8")),
+            breaker_failures=int(os.getenv("EV_LLM_BREAKER_FAILURES", "5")),
+            breaker_reset_s=float(os.getenv("EV_LLM_BREAKER_RESET_S", "30")),
+            base_url=os.getenv("EV_LLM_BASE_URL") or None,
+        )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def _retry_after_s(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Abre el circuito tras `failures` fallos transitorios seguidos.
+
+    Abierto: las llamadas fallan al instante durante `reset_s`. Después deja
+    pasar una llamada de prueba (half-open): si sale bien se cierra, si no
+    vuelve a abrirse.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failures: int = 5, reset_s: float = 30.0):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_s:
+                    raise CircuitOpenError("Circuito del LLM abierto: demasiados fallos seguidos")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError("Circuito del LLM en prueba: reintenta en unos segundos")
+                self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._consecutive = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+                if self.state != self.OPEN:
+                    logger.warning("🔌 Circuito del LLM abierto tras %d fallos", self._consecutive)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_non_retryable(self) -> None:
+        """Errores del cliente (4xx): el servicio responde, solo liberamos la prueba."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class ResilientChatModel(BaseChatModel):
+    """Chat model que delega en `inner` aplicando deadline, reintentos, semáforo y circuit breaker.
+
+    En `stream`, los reintentos cubren la petición hasta el primer fragmento
+    (un stream ya empezado no se repite); el permiso del semáforo y el
+    deadline cubren el stream completo, hasta que termina o se cierra.
+
+    `async_inner_factory`, si se da, crea el modelo usado por `ainvoke` /
+    `astream` una vez por event loop (p. ej. ChatGroq con un
+    `httpx.AsyncClient` propio de ese loop).
+    """
+
+    inner: BaseChatModel
+    config: LLMClientConfig = Field(default_factory=LLMClientConfig)
+    # Pasa `timeout=` por llamada al modelo interno (ChatGroq lo reenvía al SDK)
+    pass_timeout: bool = True
+    async_inner_factory: Optional[Callable[[], BaseChatModel]] = None
+
+    _semaphore: threading.BoundedSemaphore = PrivateAttr()
+    _breaker: CircuitBreaker = PrivateAttr()
+    _async_inners: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BaseChatModel]" = PrivateAttr()
+    _async_inners_lock: threading.Lock = PrivateAttr()
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._semaphore = threading.BoundedSemaphore(self.config.max_concurrency)
+        self._breaker = CircuitBreaker(self.config.breaker_failures, self.config.breaker_reset_s)
+        self._async_inners = weakref.WeakKeyDictionary()
+        self._async_inners_lock = threading.Lock()
+
+    def _async_inner(self) -> BaseChatModel:
+        """Modelo para las llamadas async del event loop actual."""
+        if self.async_inner_factory is None:
+            return self.inner
+        loop = asyncio.get_running_loop()
+        with self._async_inners_lock:
+            inner = self._async_inners.get(loop)
+            if inner is None:
+                inner = self._async_inners[loop] = self.async_inner_factory()
+            return inner
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient-{self.inner._llm_type}"
+
+    @property
+    def breaker_state(self) -> str:
+        return self._breaker.state
+
+    # --- utilidades comunes ---
+
+    def _attempt_kwargs(self, kwargs: dict, deadline: float) -> dict:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMUnavailableError(f"Deadline de {self.config.timeout_s:.0f} s agotado")
+        if self.pass_timeout:
+            kwargs = {**kwargs, "timeout": min(self.config.attempt_timeout_s, remaining)}
+        return kwargs
+
+    def _backoff_s(self, attempt: int, exc: BaseException, deadline: float) -> Optional[float]:
+        """Espera antes del siguiente intento (full jitter), o None si no hay más intentos."""
+        if attempt >= self.config.max_retries or not is_retryable(exc):
+            return None
+        delay = _retry_after_s(exc)
+        if delay is None:
+            delay = random.uniform(0, min(self.config.backoff_max_s, self.config.backoff_base_s * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _on_error(self, exc: BaseException) -> None:
+        if is_retryable(exc):
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_non_retryable()
+        metrics.increment("llm_error", kind=type(exc).__name__)
+
+    def _give_up(self, exc: BaseException, attempt: int) -> None:
+        # Los errores transitorios agotados se unifican; los del cliente (4xx) se propagan tal cual
+        if is_retryable(exc):
+            raise LLMUnavailableError(
+                f"El LLM no respondió ({type(exc).__name__}) tras {attempt + 1} intento(s)"
+            ) from exc
+        raise exc
+
+    def _acquire(self, deadline: float) -> None:
+        if not self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise LLMUnavailableError("Sin hueco para llamar al LLM antes del deadline")
+
+    async def _aacquire(self, deadline: float) -> None:
+        if self._semaphore.acquire(blocking=False):
+            return
+        loop = asyncio.get_running_loop()
+        timeout = max(0.0, deadline - time.monotonic())
+        future = loop.run_in_executor(None, functools.partial(self._semaphore.acquire, timeout=timeout))
+        try:
+            # shield: cancelar la espera no cancela el hilo, que puede conseguir el permiso después
+            acquired = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(self._release_if_acquired)
+            raise
+        if not acquired:
+            raise LLMUnavailableError("Sin hueco para llamar al LLM antes del deadline")
+
+    def _release_if_acquired(self, future: "asyncio.Future[bool]") -> None:
+        if not future.cancelled() and future.exception() is None and future.result():
+            self._semaphore.release()
+
+    def _check_deadline(self, deadline: float) -> None:
+        if time.monotonic() > deadline:
+            metrics.increment("llm_error", kind="StreamDeadline")
+            raise LLMUnavailableError(f"Deadline de {self.config.timeout_s:.0f} s agotado durante el stream")
+
+    def _call(
+        self,
+        fn: Callable[[dict], T],
+        kwargs: dict,
+        deadline: Optional[float] = None,
+        keep_permit: bool = False,
+    ) -> T:
+        """Ejecuta `fn` con reintentos. Con `keep_permit`, si sale bien el permiso
+        del semáforo queda tomado y el llamador debe liberarlo."""
+        deadline = deadline or time.monotonic() + self.config.timeout_s
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            succeeded = False
+            try:
+                self._breaker.before_call()
+                result = fn(self._attempt_kwargs(kwargs, deadline))
+                succeeded = True
+            except CircuitOpenError:
+                raise
+            except LLMUnavailableError:
+                self._breaker.record_non_retryable()
+                raise
+            except Exception as exc:
+                self._on_error(exc)
+                delay = self._backoff_s(attempt, exc, deadline)
+                if delay is None:
+                    self._give_up(exc, attempt)
+                logger.info("↻ Reintento %d del LLM en %.2f s (%s)", attempt + 1, delay, type(exc).__name__)
+                metrics.increment("llm_retry")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            finally:
+                if not (keep_permit and succeeded):
+                    self._semaphore.release()
+            self._breaker.record_success()
+            return result
+
+    async def _acall(
+        self,
+        fn: Callable[[dict], Any],
+        kwargs: dict,
+        deadline: Optional[float] = None,
+        keep_permit: bool = False,
+    ) -> Any:
+        deadline = deadline or time.monotonic() + self.config.timeout_s
+        attempt = 0
+        while True:
+            await self._aacquire(deadline)
+            succeeded = False
+            try:
+                self._breaker.before_call()
+                call_kwargs = self._attempt_kwargs(kwargs, deadline)
+                result = await asyncio.wait_for(fn(call_kwargs), timeout=deadline - time.monotonic())
+                succeeded = True
+            except CircuitOpenError:
+                raise
+            except LLMUnavailableError:
+                self._breaker.record_non_retryable()
+                raise
+            except asyncio.TimeoutError as exc:
+                self._on_error(exc)
+                raise LLMUnavailableError(f"Deadline de {self.config.timeout_s:.0f} s agotado") from exc
+            except Exception as exc:
+                self._on_error(exc)
+                delay = self._backoff_s(attempt, exc, deadline)
+                if delay is None:
+                    self._give_up(exc, attempt)
+                logger.info("↻ Reintento %d del LLM en %.2f s (%s)", attempt + 1, delay, type(exc).__name__)
+                metrics.increment("llm_retry")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            finally:
+                # También ante CancelledError (no es Exception): el permiso nunca se pierde
+                if not (keep_permit and succeeded):
+                    self._semaphore.release()
+            self._breaker.record_success()
+            return result
+
+    # --- interfaz de BaseChatModel ---
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._call(lambda kw: self.inner._generate(messages, stop=stop, **kw), kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        inner = self._async_inner()
+        return await self._acall(lambda kw: inner._agenerate(messages, stop=stop, **kw), kwargs)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # El primer fragmento se pide dentro de _call (con reintentos); el resto fluye sin
+        # reintentos, pero con el permiso tomado y bajo el mismo deadline
+        def first_chunk(kw: dict):
+            iterator = self.inner._stream(messages, stop=stop, **kw)
+            return iterator, next(iterator, None)
+
+        deadline = time.monotonic() + self.config.timeout_s
+        iterator, first = self._call(first_chunk, kwargs, deadline=deadline, keep_permit=True)
+        try:
+            if first is None:
+                return
+            if run_manager:
+                run_manager.on_llm_new_token(first.text, chunk=first)
+            yield first
+            for chunk in iterator:
+                self._check_deadline(deadline)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            self._semaphore.release()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        inner = self._async_inner()
+
+        async def first_chunk(kw: dict):
+            iterator = inner._astream(messages, stop=stop, **kw).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, None
+
+        deadline = time.monotonic() + self.config.timeout_s
+        iterator, first = await self._acall(first_chunk, kwargs, deadline=deadline, keep_permit=True)
+        try:
+            if first is None:
+                return
+            if run_manager:
+                await run_manager.on_llm_new_token(first.text, chunk=first)
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=deadline - time.monotonic())
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError as exc:
+                    metrics.increment("llm_error", kind="StreamDeadline")
+                    raise LLMUnavailableError(
+                        f"Deadline de {self.config.timeout_s:.0f} s agotado durante el stream"
+                    ) from exc
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            try:
+                if aclose is not None:
+                    await aclose()
+            finally:
+                self._semaphore.release()
+
+
+def _http_options(max_connections: int, timeout_s: float) -> dict:
+    import httpx
+
+    return {
+        "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        "timeout": httpx.Timeout(timeout_s, connect=5.0),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def shared_http_client(max_connections: int = 20, timeout_s: float = 20.0):
+    """`httpx.Client` compartido por proceso: conexiones keep-alive reutilizadas entre hilos."""
+    import httpx
+
+    return httpx.Client(**_http_options(max_connections, timeout_s))
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def loop_http_async_client(max_connections: int = 20, timeout_s: float = 20.0):
+    """`httpx.AsyncClient` del event loop actual (un AsyncClient no se puede usar desde otro loop)."""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = httpx.AsyncClient(**_http_options(max_connections, timeout_s))
+        return client
+
+
+def build_groq_chat_model(
+    model: str,
+    api_key: Optional[str],
+    config: Optional[LLMClientConfig] = None,
+) -> ResilientChatModel:
+    """ChatGroq sobre el pool HTTP compartido, envuelto en `ResilientChatModel`.
+
+    Los reintentos del SDK se desactivan (max_retries=0): los gestiona el wrapper.
+    """
+    from langchain_groq import ChatGroq
+
+    config = config or LLMClientConfig.from_env()
+    options = {}
+    if config.base_url:
+        options["base_url"] = config.base_url
+
+    def make(**clients: Any) -> ChatGroq:
+        return ChatGroq(
+            model=model,
+            api_key=api_key,
+            max_retries=0,
+            timeout=config.attempt_timeout_s,
+            **clients,
+            **options,
+        )
+
+    # Llamadas sync: un pool por proceso. Async: un AsyncClient (y un ChatGroq) por event loop
+    inner = make(http_client=shared_http_client(config.max_connections, config.attempt_timeout_s))
+    return ResilientChatModel(
+        inner=inner,
+        config=config,
+        async_inner_factory=lambda: make(
+            http_async_client=loop_http_async_client(config.max_connections, config.attempt_timeout_s)
+        ),
+    )
@@ -1,7 +1,16 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
 import os
 import sys
-from typing import Any, Dict, List, Optional, Tuple
-import unicodedata
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 import pandas as pd
 
 # Aseguramos que el proyecto raíz esté en sys.path
@@ -9,18 +18,38 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
+from src.core.ev_db_artifact import EVDBArtifact, load_artifact
+from src.core.resources import resources
+from src.core.telemetry import metrics, request_context
 from src.model.ev_model import EVEnergyModel
+from src.serving.client import remote_model_from_env
+from src.core.vehicle_index import VehicleCandidate, VehicleIndex, normalize_text as _normalize_text
+from src.core.vehicle_store import VehicleStore
+from src.nlp.local_extractor import ExtractionStats, LocalExtraction, LocalExtractor
+from src.nlp.answer_renderer import VARIANT_LLM, VARIANT_TEMPLATE, AnswerRouter
+from src.nlp.conversation import ConversationState, ConversationStore, VehicleResolution
+from src.nlp.llm_client import ResilientChatModel, build_groq_chat_model
+from src.nlp.prompt_builder import PromptBuilder, PromptStats
 
-from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from dotenv import load_dotenv
 load_dotenv()
+
+logger = logging.getLogger(__name__)
+
 # ----------------------------------------------------
 # Configuración: rutas, modelo HF, LLM, dataset EV-DB
 # ----------------------------------------------------
 
 DATA_PATH = os.path.join(PROJECT_ROOT, "data", "EV-DB.csv")  # ajusta si tu CSV está en otro lugar
+# EV-DB precompilado (columnas tipadas + índice de vehículos) junto al CSV; se
+# recompila solo si el CSV cambia. EV_DB_ARTIFACT=0 vuelve a parsear el CSV.
+USE_EV_DB_ARTIFACT = os.getenv("EV_DB_ARTIFACT", "1") != "0"
+EV_DB_ARTIFACT_DIR = os.getenv("EV_DB_ARTIFACT_DIR") or None
+# Cada cuántos segundos se comprueba si el CSV cambió para recargar el índice
+# de vehículos en caliente. EV_DB_RELOAD_INTERVAL_S=0 desactiva la recarga.
+EV_DB_RELOAD_INTERVAL_S = float(os.getenv("EV_DB_RELOAD_INTERVAL_S", "30"))
 
 HF_REPO_ID = "mchacongucenfotec/ev-test-train"
 
@@ -33,20 +62,153 @@ HF_REPO_ID = "mchacongucenfotec/ev-test-train"
 HF_TOKEN = os.getenv("HF_TOKEN")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-# Carga de dataset
-if not os.path.exists(DATA_PATH):
-    raise FileNotFoundError(f"No se encontró EV-DB.csv en {DATA_PATH}")
+# EV_LOCAL_EXTRACTOR=0 desactiva el extractor local (evita la llamada al LLM
+# cuando el mensaje ya trae todos los datos).
+USE_LOCAL_EXTRACTOR = os.getenv("EV_LOCAL_EXTRACTOR", "1") != "0"
+extraction_stats = ExtractionStats()
 
-df_ev = pd.read_csv(DATA_PATH)
+# Caché de predicciones: el chat repite vehículos y ventanas de carga típicas.
+# EV_PREDICTION_CACHE_SIZE=0 la desactiva. EV_PREDICTION_CACHE_QUANTUM: cubetas
+# por feature en JSON, p. ej. '{"Battery Capacity (kWh)": 0.5, "Energy_per_SoC": 0.005}'.
+PREDICTION_CACHE_SIZE = int(os.getenv("EV_PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_QUANTUM = json.loads(os.getenv("EV_PREDICTION_CACHE_QUANTUM") or "{}") or None
 
-# Modelo de energía en HF
-ev_model = EVEnergyModel(repo_id=HF_REPO_ID, force_download=False)
+# Prompt final compacto (solo campos relevantes + instrucciones del modo activo).
+# EV_COMPACT_PROMPT=0 vuelve al prompt extenso; EV_PROMPT_TOKEN_BUDGET fija el presupuesto.
+USE_COMPACT_PROMPT = os.getenv("EV_COMPACT_PROMPT", "1") != "0"
+prompt_builder = PromptBuilder()
+prompt_stats = PromptStats()
+
+# Respuesta final en modo predict: LLM (por defecto), plantilla determinista o A/B.
+# EV_ANSWER_RENDERER=llm|template|ab, EV_ANSWER_TEMPLATE_SHARE=0.5 (solo en ab).
+answer_router = AnswerRouter.from_env()
+
+# Estado multi-turno por ID de conversación (Streamlit guarda el suyo en st.session_state)
+conversations = ConversationStore()
+
+
+# ----------------------------------------------------
+# Recursos costosos: se construyen una vez por proceso, en el primer uso
+# ----------------------------------------------------
+
+def _load_ev_db_artifact() -> Optional[EVDBArtifact]:
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"No se encontró EV-DB.csv en {DATA_PATH}")
+    if not USE_EV_DB_ARTIFACT:
+        return None
+    try:
+        return load_artifact(DATA_PATH, EV_DB_ARTIFACT_DIR)
+    except OSError as exc:
+        # p. ej. directorio de datos de solo lectura sin artefacto compilado
+        logger.warning("⚠️ No se pudo usar el artefacto EV-DB (%s); se parsea el CSV", exc)
+        return None
+
+
+def _load_ev_db() -> pd.DataFrame:
+    artifact = resources.get("ev_db_artifact")
+    if artifact is not None:
+        return artifact.frame
+    return pd.read_csv(DATA_PATH)
+
+
+def _load_vehicle_index() -> VehicleIndex:
+    artifact = resources.get("ev_db_artifact")
+    if artifact is not None:
+        return artifact.vehicle_index()
+    return VehicleIndex(get_ev_db())
+
+
+def _publish_vehicle_db(index: VehicleIndex, df: pd.DataFrame) -> None:
+    # Tras una recarga del CSV: los lectores pasan a la versión nueva en su próximo `get`
+    resources.override("ev_db", df)
+    resources.override("vehicle_index", index)
+    if resources.is_built("local_extractor"):
+        resources.override("local_extractor", LocalExtractor(index))
+
+
+def _build_vehicle_store() -> VehicleStore:
+    store = VehicleStore(DATA_PATH, load_index=_load_vehicle_index)
+    store.add_listener(_publish_vehicle_db)
+    if EV_DB_RELOAD_INTERVAL_S > 0:
+        store.start(EV_DB_RELOAD_INTERVAL_S)
+    return store
+
+
+def _build_ev_model() -> EVEnergyModel:
+    # Con EV_INFERENCE_URL se usa el servicio de inferencia compartido
+    remote = remote_model_from_env()
+    if remote is not None:
+        return remote
+    return EVEnergyModel(
+        repo_id=HF_REPO_ID,
+        force_download=False,
+        cache_size=PREDICTION_CACHE_SIZE,
+        cache_quantum=PREDICTION_CACHE_QUANTUM,
+    )
+
+
+def _build_llm() -> ResilientChatModel:
+    # ChatGroq sobre un pool HTTP compartido, con deadline, reintentos,
+    # límite de concurrencia y circuit breaker (ver src/nlp/llm_client.py)
+    return build_groq_chat_model(model="qwen/qwen3-32b", api_key=GROQ_API_KEY)
+
+
+resources.register("ev_db_artifact", _load_ev_db_artifact)
+resources.register("ev_db", _load_ev_db)
+# Índice de búsqueda de vehículos (normalización y estructuras calculadas una sola vez)
+resources.register("vehicle_store", _build_vehicle_store)
+resources.register("vehicle_index", lambda: get_vehicle_store().index)
+resources.register("local_extractor", lambda: LocalExtractor(get_vehicle_index()))
+resources.register("ev_model", _build_ev_model)
+resources.register("llm", _build_llm)
+
+
+def get_ev_db() -> pd.DataFrame:
+    return resources.get("ev_db")
+
+
+def get_vehicle_store() -> VehicleStore:
+    return resources.get("vehicle_store")
+
+
+def get_vehicle_index() -> VehicleIndex:
+    return resources.get("vehicle_index")
+
+
+def get_local_extractor() -> LocalExtractor:
+    return resources.get("local_extractor")
+
+
+def get_ev_model() -> EVEnergyModel:
+    return resources.get("ev_model")
+
+
+def get_llm() -> ResilientChatModel:
+    return resources.get("llm")
+
+
+def warm_up() -> Dict[str, Dict[str, Any]]:
+    """Construye todos los recursos por adelantado y devuelve sus estadísticas."""
+    for name in ("ev_db_artifact", "ev_db", "vehicle_store", "vehicle_index", "local_extractor", "ev_model", "llm"):
+        resources.get(name)
+    return resources.stats()
+
+
+# Compatibilidad: `llm_ev_assistant.df_ev`, `.ev_model`, etc. siguen funcionando
+_LAZY_ATTRIBUTES = {
+    "df_ev": "ev_db",
+    "vehicle_index": "vehicle_index",
+    "local_extractor": "local_extractor",
+    "ev_model": "ev_model",
+    "llm": "llm",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return resources.get(_LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# LLM en Groq
-llm = ChatGroq(
-    model="qwen/qwen3-32b",
-    api_key=GROQ_API_KEY,
-)
 
 parser = JsonOutputParser()
 
@@ -69,8 +231,13 @@ Debes devolver un JSON EXACTO con esta forma:
 Campos:
 - brand: marca del vehículo (texto) o null si no se menciona.
 - model: modelo del vehículo (texto) o null si no se menciona.
+- year: año del modelo del vehículo, número entero o null.
+- battery_capacity_kwh: capacidad de la batería en kWh, número o null.
+- vehicle_age_years: antigüedad del vehículo en años, número o null.
 - soc_start: SoC inicial en %, número o null.
 - soc_end: SoC final en %, número o null.
+- soc_diff: diferencia de SoC (final - inicial) en %, número o null; solo si el usuario
+  da la diferencia sin los valores inicial y final.
 - duration_hours: duración aproximada de la carga en horas, número (ej. 1.5) o null.
 """,
     input_variables=["user_msg"],
@@ -78,84 +245,162 @@ Campos:
 )
 
 
+def _try_local_extraction(user_msg: str) -> Optional[LocalExtraction]:
+    """Ejecuta el extractor local (si está activo) y registra el resultado en las estadísticas."""
+    if not USE_LOCAL_EXTRACTOR:
+        return None
+    with metrics.span("extract_local") as span:
+        local = get_local_extractor().extract(user_msg)
+        span.attrs["complete"] = local.complete
+    if local.complete:
+        extraction_stats.record_local()
+        logger.info("⚡ Extracción local sin LLM: %s", local.fields)
+    else:
+        extraction_stats.record_fallback(local)
+    return local
+
+
 def extract_session_info(user_msg: str) -> Dict[str, Any]:
-    """Llama al LLM para extraer brand, model, soc_start, soc_end, duration_hours."""
-    chain = extract_prompt | llm | parser
-    extracted = chain.invoke({"user_msg": user_msg})
-    # esperado: {"brand": ..., "model": ..., "soc_start": ..., "soc_end": ..., "duration_hours": ...}
+    """Extrae brand, model, soc_start, soc_end, duration_hours.
+
+    Primero prueba el extractor local (regex + diccionario de EV-DB); solo si
+    faltan campos o hay ambigüedad se llama al LLM.
+    """
+    local = _try_local_extraction(user_msg)
+    if local is not None and local.complete:
+        return local.fields
+
+    return _llm_extract(user_msg)
+
+
+async def aextract_session_info(user_msg: str) -> Dict[str, Any]:
+    """Versión async de `extract_session_info` (usa `ainvoke` del LLM)."""
+    local = _try_local_extraction(user_msg)
+    if local is not None and local.complete:
+        return local.fields
+
+    return await _allm_extract(user_msg)
+
+
+def _llm_extract(user_msg: str) -> Dict[str, Any]:
+    chain = extract_prompt | get_llm() | parser
+    with metrics.span("extract_llm"):
+        extracted = chain.invoke({"user_msg": user_msg})
+    # esperado: {"brand": ..., "model": ..., "year": ..., "battery_capacity_kwh": ..., "soc_start": ..., ...}
     return extracted
 
 
+async def _allm_extract(user_msg: str) -> Dict[str, Any]:
+    chain = extract_prompt | get_llm() | parser
+    with metrics.span("extract_llm"):
+        return await chain.ainvoke({"user_msg": user_msg})
+
+
 # -------------------------
 # 2) Búsqueda de vehículo en EV-DB
 # -------------------------
 
-def _normalize_text(s: str) -> str:
-    """Minimiza diferencias: minúsculas, sin tildes, sin espacios duplicados."""
-    s = s.strip().lower()
-    s = "".join(
-        c for c in unicodedata.normalize("NFD", s)
-        if unicodedata.category(c) != "Mn"
-    )
-    s = " ".join(s.split())
-    return s
-
-
 def find_vehicle_row(brand: Optional[str], model: Optional[str]) -> Optional[Dict[str, Any]]:
     """
     Intenta encontrar una fila en EV-DB usando coincidencias FLEXIBLES
     entre (brand, model) del LLM y las columnas BRAND / MODEL del CSV.
+
+    La búsqueda usa el `VehicleIndex` (precalculado una sola vez), por lo
+    que su coste no depende del tamaño de la tabla.
     """
     if not brand or not model:
-        print(f"⚠️ find_vehicle_row: brand/model vacíos -> brand={brand!r}, model={model!r}")
+        logger.warning("⚠️ find_vehicle_row: brand/model vacíos -> brand=%r, model=%r", brand, model)
         return None
 
     brand_n = _normalize_text(str(brand))
     model_n = _normalize_text(str(model))
 
-    df_tmp = df_ev.copy()
-    df_tmp["BRAND_N"] = df_tmp["BRAND"].astype(str).apply(_normalize_text)
-    df_tmp["MODEL_N"] = df_tmp["MODEL"].astype(str).apply(_normalize_text)
+    logger.debug("🔍 Buscando vehículo para brand='%s', model='%s'", brand_n, model_n)
 
-    print(f"🔍 Buscando vehículo para brand='{brand_n}', model='{model_n}'")
+    vehicle_index = get_vehicle_index()
+    with metrics.span("vehicle_lookup") as span:
+        row_id, stage = vehicle_index.lookup(brand_n, model_n)
+        span.attrs["match"] = stage or "none"
+    metrics.increment("vehicle_match", method="lookup", match=stage or "none")
+    if row_id is None:
+        logger.info("⚠️ No se encontró vehículo para brand='%s' model='%s'", brand, model)
+        return None
 
-    # 1) match exacto normalizado
-    mask_exact = (df_tmp["BRAND_N"] == brand_n) & (df_tmp["MODEL_N"] == model_n)
-    subset = df_tmp[mask_exact]
-    if len(subset) > 0:
-        print("✅ Match EXACTO encontrado")
-        return subset.iloc[0].to_dict()
+    messages = {
+        VehicleIndex.STAGE_EXACT: "✅ Match EXACTO encontrado",
+        VehicleIndex.STAGE_CONTAINS: "✅ Match por CONTAINS (brand y model) encontrado",
+        VehicleIndex.STAGE_TOKENS: "✅ Match por TOKENS del modelo encontrado",
+        VehicleIndex.STAGE_MODEL_ONLY: "✅ Match SOLO por modelo encontrado (brand ignorado)",
+    }
+    logger.debug(messages[stage])
+    return vehicle_index.row(row_id)
 
-    # 2) BRAND contiene brand_n y MODEL contiene model_n (subcadena)
-    mask_contains = (
-        df_tmp["BRAND_N"].str.contains(brand_n, na=False) &
-        df_tmp["MODEL_N"].str.contains(model_n, na=False)
-    )
-    subset = df_tmp[mask_contains]
-    if len(subset) > 0:
-        print("✅ Match por CONTAINS (brand y model) encontrado")
-        return subset.iloc[0].to_dict()
-
-    # 3) BRAND coincide y cualquier token relevante del modelo aparece en MODEL
-    model_tokens = [t for t in model_n.split() if len(t) >= 3]
-    if model_tokens:
-        mask_token = df_tmp["BRAND_N"].str.contains(brand_n, na=False)
-        for tok in model_tokens:
-            mask_token &= df_tmp["MODEL_N"].str.contains(tok, na=False)
-        subset = df_tmp[mask_token]
-        if len(subset) > 0:
-            print(f"✅ Match por TOKENS del modelo ({model_tokens}) encontrado")
-            return subset.iloc[0].to_dict()
-
-    # 4) Último recurso: ignorar brand y matchear solo por MODEL (contiene)
-    mask_model_only = df_tmp["MODEL_N"].str.contains(model_tokens[0] if model_tokens else model_n, na=False)
-    subset = df_tmp[mask_model_only]
-    if len(subset) > 0:
-        print("✅ Match SOLO por modelo encontrado (brand ignorado)")
-        return subset.iloc[0].to_dict()
-
-    print(f"⚠️ No se encontró vehículo para brand='{brand}' model='{model}'")
-    return None
+
+# Umbrales para aceptar el mejor candidato de la búsqueda difusa sin preguntar
+MIN_CONFIDENT_SIMILARITY = 0.6
+MIN_CONFIDENT_MARGIN = 0.05
+# Sin marca/modelo: vehículos cuya capacidad está a menos de esto de la indicada
+CAPACITY_MATCH_TOLERANCE_KWH = 1.0
+
+
+def resolve_vehicle(
+    brand: Optional[str],
+    model: Optional[str],
+    year: Optional[int] = None,
+    k: int = 5,
+) -> Tuple[Optional[Dict[str, Any]], List[VehicleCandidate]]:
+    """
+    Búsqueda difusa con ranking (trigramas + bonus de marca + preferencia de año).
+
+    Devuelve (fila, candidatos):
+      - fila: el mejor candidato si es suficientemente claro, o None.
+      - candidatos: top-k con su puntuación, para poder pedir al usuario que elija.
+    """
+    vehicle_index = get_vehicle_index()
+    with metrics.span("vehicle_resolve") as span:
+        candidates = vehicle_index.search(brand, model, year=year, k=k)
+        if not candidates:
+            span.attrs["match"] = span.attrs["path"] = "none"
+        else:
+            best = candidates[0]
+            # Camino de `search` que dio el mejor candidato (exact/brand/model_only),
+            # para seguir qué tipo de consulta llega
+            span.attrs["path"] = best.path
+            # Los candidatos con el mismo nombre (distinto año) no cuentan como ambigüedad
+            rival = next((c for c in candidates[1:] if not vehicle_index.same_name(best, c)), None)
+            margin = best.score - rival.score if rival else float("inf")
+            confident = best.similarity >= MIN_CONFIDENT_SIMILARITY and margin >= MIN_CONFIDENT_MARGIN
+            span.attrs["match"] = "fuzzy" if confident else "ambiguous"
+    metrics.increment("vehicle_match", method="search", match=span.attrs["match"], path=span.attrs["path"])
+
+    if not candidates:
+        logger.info("⚠️ resolve_vehicle: sin candidatos para brand=%r, model=%r", brand, model)
+        return None, []
+
+    if confident:
+        logger.info("✅ Vehículo resuelto: %s (score=%s)", best.label(), best.score)
+        return vehicle_index.row(best.row_id), candidates
+
+    logger.info("❓ Vehículo ambiguo para brand=%r, model=%r: %s",
+                brand, model, [c.label() for c in candidates])
+    return None, candidates
+
+
+def find_vehicles_by_capacity(
+    capacity_kwh: Optional[float],
+    year: Optional[int] = None,
+    k: int = 5,
+) -> List[VehicleCandidate]:
+    """Vehículos de EV-DB con capacidad de batería cercana (y del año dado), los más cercanos primero."""
+    if capacity_kwh is None:
+        return []
+    with metrics.span("vehicle_capacity") as span:
+        candidates = get_vehicle_index().by_capacity(
+            float(capacity_kwh), CAPACITY_MATCH_TOLERANCE_KWH, year=year, k=k,
+        )
+        span.attrs["match"] = {0: "none", 1: "unique"}.get(len(candidates), "multiple")
+    metrics.increment("vehicle_match", method="capacity", match=span.attrs["match"])
+    return candidates
 
 # -------------------------
 # 3) Completar sesión + cálculos físicos
@@ -239,10 +484,18 @@ def complete_session_info(
 # 4) Llamar al modelo HF si no faltan datos
 # -------------------------
 
-def run_prediction_logic(extracted: Dict[str, Any]) -> Dict[str, Any]:
+def run_prediction_logic(
+    extracted: Dict[str, Any],
+    resolved: Optional[VehicleResolution] = None,
+) -> Dict[str, Any]:
     """
+    `resolved`: resultado de `resolve_vehicle` ya calculado (opcional).
+
     Orquesta:
-      - usa brand/model para buscar en EV-DB
+      - usa brand/model (y año) para buscar en EV-DB con ranking difuso;
+        si hay varios candidatos parecidos, pide al usuario que elija
+      - sin brand/model, busca por capacidad de batería (y año, si se conoce)
+        para deducir el año o el vehículo, o proponer vehículos
       - construye session_info base
       - completa con cálculos físicos
       - si faltan datos: mode = ask_missing
@@ -254,10 +507,13 @@ def run_prediction_logic(extracted: Dict[str, Any]) -> Dict[str, Any]:
     soc_end = extracted.get("soc_end")
     duration_hours = extracted.get("duration_hours")
 
-    vehicle_row = find_vehicle_row(brand, model)
+    if resolved is None:
+        resolved = resolve_vehicle(brand, model, year=extracted.get("year"))
+    vehicle_row, candidates = resolved
 
     base_session = {
-        "Battery Capacity (kWh)": None,
+        # Lo que dice el usuario tiene prioridad sobre la fila de EV-DB
+        "Battery Capacity (kWh)": extracted.get("battery_capacity_kwh"),
         "SoC_diff": None,
         "Charging Duration (hours)": duration_hours,
         "Energy_est_SoC": None,
@@ -265,34 +521,123 @@ def run_prediction_logic(extracted: Dict[str, Any]) -> Dict[str, Any]:
         "Power_proxy": None,
         "Charge_Efficiency": None,
         "Energy_per_SoC": None,
-        "Vehicle Age (years)": None,
+        "Vehicle Age (years)": extracted.get("vehicle_age_years"),
     }
 
     if soc_start is not None and soc_end is not None:
         base_session["SoC_diff"] = soc_end - soc_start
-
-    session_info, questions = complete_session_info(base_session, vehicle_row=vehicle_row)
+    else:
+        base_session["SoC_diff"] = extracted.get("soc_diff")
+
+    # Sin marca/modelo: se busca por capacidad (filtrando por el año o la antigüedad, si se conocen).
+    # Sin año: si todos los vehículos con esa capacidad son del mismo año, se usa
+    # ese año; si no, se proponen como candidatos. Con año: si un solo vehículo
+    # encaja, se usa su fila; si encajan varios no se pregunta, porque capacidad
+    # y año ya bastan para predecir.
+    vehicle_year = extracted.get("year")
+    if vehicle_year is None and base_session["Vehicle Age (years)"] is not None:
+        from datetime import datetime
+        vehicle_year = datetime.now().year - int(base_session["Vehicle Age (years)"])
+    if vehicle_row is None and not candidates and not (brand or model):
+        by_capacity = find_vehicles_by_capacity(extracted.get("battery_capacity_kwh"), year=vehicle_year)
+        if vehicle_year is not None:
+            if len(by_capacity) == 1:
+                vehicle_row = get_vehicle_index().row(by_capacity[0].row_id)
+                logger.info("✅ Vehículo deducido de capacidad y año: %s", by_capacity[0].label())
+        else:
+            years = {c.year for c in by_capacity}
+            if len(years) == 1 and None not in years:
+                vehicle_year = years.pop()
+                logger.info("✅ Año %s deducido de la capacidad (%s)", vehicle_year,
+                            [c.label() for c in by_capacity])
+            else:
+                candidates = by_capacity
+
+    # Sin vehículo identificado, la edad sale del año que haya indicado el usuario (o deducido)
+    if vehicle_row is None and vehicle_year is not None and base_session["Vehicle Age (years)"] is None:
+        from datetime import datetime
+        base_session["Vehicle Age (years)"] = datetime.now().year - int(vehicle_year)
+
+    with metrics.span("complete_session"):
+        session_info, questions = complete_session_info(base_session, vehicle_row=vehicle_row)
+
+    if vehicle_row is None and candidates:
+        options = "; ".join(f"{i}) {c.label()}" for i, c in enumerate(candidates, start=1))
+        questions.insert(0, f"¿Cuál de estos vehículos es el tuyo? {options}")
 
     result: Dict[str, Any] = {
         "extracted": extracted,
         "vehicle_row": vehicle_row,
+        "vehicle_candidates": [asdict(c) for c in candidates],
         "session_info": session_info,
         "questions": questions,
         "mode": None,
         "prediction": None,
+        "raw_inputs": None,
     }
 
     if questions:
         result["mode"] = "ask_missing"
         return result
 
+    # Entradas crudas (columnas de RAW_COLUMNS) de la sesión que se va a predecir,
+    # coherentes entre sí: el SoC es el que dio SoC_diff y el resto sale de session_info
+    from datetime import datetime
+    age = session_info.get("Vehicle Age (years)")
+    result["raw_inputs"] = {
+        "battery_capacity_kwh": session_info["Battery Capacity (kWh)"],
+        "soc_start_pct": soc_start,
+        "soc_end_pct": soc_end,
+        "charging_duration_hours": session_info["Charging Duration (hours)"],
+        "vehicle_year": None if age is None else datetime.now().year - int(age),
+    }
+
     # Si no faltan datos, llamamos al modelo HF
-    pred_value = ev_model.predict_from_session(session_info)[0]
+    with metrics.span("model_predict"):
+        pred_value = get_ev_model().predict_from_session(session_info)[0]
     result["mode"] = "predict"
     result["prediction"] = float(pred_value)
     return result
 
 
+def _apply_local_turn(user_msg: str, conversation: ConversationState) -> bool:
+    """Aplica al estado lo que se resuelve sin LLM; devuelve True si aún hace falta el LLM."""
+    if conversation.pick_candidate(user_msg, get_vehicle_index()):
+        logger.info("✅ [%s] Vehículo elegido: %s %s",
+                    conversation.conversation_id, conversation.slots["brand"], conversation.slots["model"])
+        return False
+    local = _try_local_extraction(user_msg)
+    if local is None:
+        return True
+    changed = conversation.merge(local.fields)
+    # Si el regex no entendió nada del mensaje, puede ser una corrección que solo el LLM entiende
+    return bool(local.ambiguous) or not changed or not conversation.complete
+
+
+def _finish_conversation_turn(conversation: ConversationState) -> Dict[str, Any]:
+    resolution = conversation.resolve(resolve_vehicle)
+    logic_result = run_prediction_logic(dict(conversation.slots), resolution)
+    conversation.record_result(logic_result)
+    metrics.increment("conversation_turn", mode=logic_result["mode"])
+    return logic_result
+
+
+def prepare_turn(user_msg: str, conversation: Optional[ConversationState] = None) -> Dict[str, Any]:
+    """
+    Extracción + `run_prediction_logic` de un mensaje.
+
+    Con `conversation`, el mensaje se trata como un delta: sus campos se
+    combinan con los ya conocidos, el vehículo resuelto se reutiliza y el
+    LLM de extracción solo se llama si el estado sigue incompleto.
+    """
+    if conversation is None:
+        return run_prediction_logic(extract_session_info(user_msg))
+
+    if _apply_local_turn(user_msg, conversation):
+        conversation.merge(_llm_extract(user_msg))
+    return _finish_conversation_turn(conversation)
+
+
 # -------------------------
 # 5) Prompt final para el LLM
 # -------------------------
@@ -340,20 +685,8 @@ Responde SOLO en español.
 """)
 
 
-def run_llm_assistant(user_msg: str) -> str:
-    """
-    Entrada: mensaje libre del usuario.
-    Salida: respuesta en español generada por el LLM,
-            usando extracción estructurada + modelo HF.
-    """
-    # 1) Extraer info con el LLM
-    extracted = extract_session_info(user_msg)
-
-    # 2) Lógica Python: completar sesión y (posible) predicción
-    logic_result = run_prediction_logic(extracted)
-
-    # 3) Preparar campos para el prompt final
-    import json
+def build_final_prompt(logic_result: Dict[str, Any]) -> str:
+    """Rellena `final_prompt` con el resultado de `run_prediction_logic`."""
     prompt_input = {
         "extracted": json.dumps(logic_result["extracted"], ensure_ascii=False, indent=2),
         "vehicle_row": json.dumps(logic_result["vehicle_row"], ensure_ascii=False, indent=2) if logic_result["vehicle_row"] else "null",
@@ -362,8 +695,267 @@ def run_llm_assistant(user_msg: str) -> str:
         "mode": logic_result["mode"],
         "prediction": logic_result["prediction"],
     }
+    return final_prompt.format(**prompt_input)
+
+
+def make_final_prompt(logic_result: Dict[str, Any]) -> str:
+    """Prompt que se envía al LLM: compacto (por defecto) o el extenso de `build_final_prompt`.
+
+    Registra en `prompt_stats` los tokens enviados y los del prompt extenso
+    (solo se formatea; sus tokens se estiman por caracteres y se cuentan con
+    el tokenizador en una muestra de peticiones, EV_PROMPT_BASELINE_SAMPLE).
+    """
+    if not USE_COMPACT_PROMPT:
+        return build_final_prompt(logic_result)
+    built = prompt_builder.build(
+        logic_result,
+        baseline=build_final_prompt(logic_result),
+        count_baseline=prompt_stats.should_sample(),
+    )
+    prompt_stats.record(built)
+    logger.info("🧾 Prompt final: %d tokens (extenso: %s%d, ahorro: %d)%s", built.tokens,
+                "" if built.baseline_counted else "~", built.baseline_tokens, built.saved_tokens,
+                f", sin {built.dropped_sections}" if built.dropped_sections else "")
+    return built.text
 
-    # 4) LLM genera la respuesta final
-    prompt = final_prompt.format(**prompt_input)
-    response = llm.invoke(prompt)
+
+def _response_text(response: Any) -> str:
     return response.content if hasattr(response, "content") else str(response)
+
+
+def render_without_llm(
+    logic_result: Dict[str, Any],
+    request_id: str,
+    conversation: Optional[ConversationState] = None,
+) -> Optional[str]:
+    """Respuesta de `answer_router` si esta petición usa la plantilla; None si va al LLM.
+
+    En modo A/B la variante se fija por conversación (o por petición, si no hay).
+    """
+    conversation_id = conversation.conversation_id if conversation is not None else None
+    variant = answer_router.variant_for(logic_result, request_id, conversation_id)
+    metrics.increment("answer", variant=variant, mode=logic_result["mode"])
+    if variant != VARIANT_TEMPLATE:
+        return None
+    with metrics.span("template_render"):
+        return answer_router.render(logic_result)
+
+
+def run_llm_assistant(user_msg: str, conversation: Optional[ConversationState] = None) -> str:
+    """
+    Entrada: mensaje libre del usuario (y, opcionalmente, el estado de la
+             conversación para completar datos en varios turnos).
+    Salida: respuesta en español generada por el LLM,
+            usando extracción estructurada + modelo HF.
+    """
+    with request_context() as request_id, metrics.span("turn"):
+        # 1) Extraer info (con el LLM si hace falta) y
+        # 2) lógica Python: completar sesión y (posible) predicción
+        logic_result = prepare_turn(user_msg, conversation)
+
+        # En modo predict la respuesta puede salir de la plantilla, sin segunda llamada
+        rendered = render_without_llm(logic_result, request_id, conversation)
+        if rendered is not None:
+            return rendered
+
+        # 3) Preparar campos para el prompt final
+        prompt = make_final_prompt(logic_result)
+
+        # 4) LLM genera la respuesta final
+        with metrics.span("final_llm"):
+            response = get_llm().invoke(prompt)
+        return _response_text(response)
+
+
+async def arun_llm_assistant(
+    user_msg: str,
+    executor: Optional[Executor] = None,
+    conversation: Optional[ConversationState] = None,
+) -> str:
+    """
+    Versión async de `run_llm_assistant` para servir muchas conversaciones
+    desde un mismo event loop.
+
+    - Las llamadas al LLM usan `ainvoke`.
+    - La búsqueda en EV-DB y la inferencia del modelo (CPU) corren en
+      `executor` (por defecto el thread pool del loop).
+    - Si el extractor local ya encontró marca/modelo pero faltan otros campos,
+      la resolución del vehículo arranca en paralelo con la extracción del LLM
+      y se reutiliza si el LLM devuelve el mismo vehículo.
+    - Con `conversation`, funciona como `prepare_turn` (delta sobre el estado).
+    """
+    with request_context() as request_id, metrics.span("turn"):
+        return await _arun_llm_assistant(user_msg, executor, request_id, conversation)
+
+
+def _in_executor(loop: asyncio.AbstractEventLoop, executor: Optional[Executor], fn, *args, **kwargs):
+    # run_in_executor no propaga contextvars: copiamos el contexto para conservar el request ID
+    call = functools.partial(fn, *args, **kwargs)
+    return loop.run_in_executor(executor, contextvars.copy_context().run, call)
+
+
+async def _aprepare_turn(
+    user_msg: str,
+    executor: Optional[Executor],
+    conversation: Optional[ConversationState],
+) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+
+    # El extractor local y la elección de candidato consultan el índice de EV-DB
+    # (y pueden construirlo en el primer uso): también van al executor
+    if conversation is not None:
+        if await _in_executor(loop, executor, _apply_local_turn, user_msg, conversation):
+            conversation.merge(await _allm_extract(user_msg))
+        return await _in_executor(loop, executor, _finish_conversation_turn, conversation)
+
+    local = await _in_executor(loop, executor, _try_local_extraction, user_msg)
+    speculative: Optional["asyncio.Future[VehicleResolution]"] = None
+    if local is not None and local.complete:
+        extracted = local.fields
+    else:
+        if local is not None and local.fields["brand"] and local.fields["model"]:
+            speculative = _in_executor(
+                loop, executor, resolve_vehicle, local.fields["brand"], local.fields["model"],
+                year=local.fields["year"],
+            )
+        extracted = await _allm_extract(user_msg)
+
+    resolved: Optional[VehicleResolution] = None
+    if speculative is not None:
+        speculative_result = await speculative
+        same_vehicle = all(
+            _normalize_text(str(extracted.get(k) or "")) == _normalize_text(str(local.fields[k] or ""))
+            for k in ("brand", "model", "year")
+        )
+        if same_vehicle:
+            resolved = speculative_result
+
+    return await _in_executor(loop, executor, run_prediction_logic, extracted, resolved)
+
+
+async def _arun_llm_assistant(
+    user_msg: str,
+    executor: Optional[Executor],
+    request_id: str,
+    conversation: Optional[ConversationState],
+) -> str:
+    logic_result = await _aprepare_turn(user_msg, executor, conversation)
+
+    rendered = render_without_llm(logic_result, request_id, conversation)
+    if rendered is not None:
+        return rendered
+
+    prompt = make_final_prompt(logic_result)
+    with metrics.span("final_llm"):
+        response = await get_llm().ainvoke(prompt)
+    return _response_text(response)
+
+
+# -------------------------
+# 6) Respuesta en streaming
+# -------------------------
+
+@dataclass
+class AnswerTiming:
+    """Tiempos de una respuesta en streaming (segundos desde que llega el mensaje)."""
+
+    request_id: str
+    ttft_s: Optional[float]
+    total_s: float
+    chunks: int
+    variant: str = VARIANT_LLM
+
+
+_STREAM_END = object()
+
+# Últimas mediciones de time-to-first-token, para seguimiento
+answer_timings: Deque[AnswerTiming] = deque(maxlen=1000)
+
+
+class AnswerStream:
+    """Iterable de fragmentos de la respuesta final del LLM.
+
+    Se consume una sola vez (p. ej. con `st.write_stream`). Al terminar,
+    `timing` tiene el TTFT y la duración total, que también se añaden a
+    `answer_timings`. Si se pasa `text` (respuesta de plantilla), se emite
+    tal cual sin llamar al LLM.
+    """
+
+    def __init__(
+        self,
+        prompt: Optional[str],
+        started_at: float,
+        request_id: Optional[str] = None,
+        text: Optional[str] = None,
+    ):
+        self.prompt = prompt
+        self.text = text
+        self.variant = VARIANT_TEMPLATE if text is not None else VARIANT_LLM
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self._started_at = started_at
+        self.ttft_s: Optional[float] = None
+        self.timing: Optional[AnswerTiming] = None
+
+    def _chunks(self) -> Iterator[Any]:
+        if self.text is not None:
+            yield self.text
+            return
+        # El generador se consume fuera de `stream_llm_assistant`: el request ID se
+        # restablece solo mientras avanza el stream del LLM, no entre fragmentos
+        with metrics.span("final_llm", request_id=self.request_id, streamed=True):
+            with request_context(self.request_id):
+                source = iter(get_llm().stream(self.prompt))
+            try:
+                while True:
+                    with request_context(self.request_id):
+                        chunk = next(source, _STREAM_END)
+                    if chunk is _STREAM_END:
+                        return
+                    yield chunk
+            finally:
+                close = getattr(source, "close", None)
+                if close is not None:
+                    with request_context(self.request_id):
+                        close()
+
+    def __iter__(self) -> Iterator[str]:
+        chunks = 0
+        source = self._chunks()
+        try:
+            for chunk in source:
+                text = _response_text(chunk)
+                if not text:
+                    continue
+                if self.ttft_s is None:
+                    self.ttft_s = time.perf_counter() - self._started_at
+                    metrics.observe("ttft", self.ttft_s)
+                    logger.info("⏱️ [%s] primer token en %.3f s", self.request_id, self.ttft_s)
+                chunks += 1
+                yield text
+        finally:
+            source.close()
+            self.timing = AnswerTiming(
+                request_id=self.request_id,
+                ttft_s=self.ttft_s,
+                total_s=time.perf_counter() - self._started_at,
+                chunks=chunks,
+                variant=self.variant,
+            )
+            answer_timings.append(self.timing)
+            metrics.observe("turn", self.timing.total_s)
+
+
+def stream_llm_assistant(user_msg: str, conversation: Optional[ConversationState] = None) -> AnswerStream:
+    """
+    Como `run_llm_assistant`, pero devuelve la respuesta final en fragmentos.
+
+    La extracción y la predicción se hacen al llamar a esta función; el LLM
+    final se invoca con `stream` al iterar el resultado (salvo que la
+    respuesta salga de la plantilla, ver `answer_router`).
+    """
+    started_at = time.perf_counter()
+    with request_context() as request_id:
+        logic_result = prepare_turn(user_msg, conversation)
+        rendered = render_without_llm(logic_result, request_id, conversation)
+        prompt = make_final_prompt(logic_result) if rendered is None else None
+    return AnswerStream(prompt, started_at=started_at, request_id=request_id, text=rendered)
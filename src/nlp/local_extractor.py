@@ -0,0 +1,218 @@
+"""Extractor local (sin LLM) para mensajes que ya traen todos los datos.
+
+Combina las expresiones regulares de `src.core.text_parsing` con un
+diccionario de marcas/modelos construido desde el índice de EV-DB. Si el
+mensaje es completo y no ambiguo devuelve el mismo esquema que
+`extract_session_info`; en otro caso indica qué falta para que el llamador
+recurra al LLM.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.text_parsing import YEAR_RE, extract_numbers_from_text, find_percentages
+from src.core.vehicle_index import VehicleIndex, normalize_text
+
+
+# Formas cortas habituales de marcas del EV-DB (ya normalizadas)
+BRAND_ALIASES: Dict[str, str] = {
+    "vw": "volkswagen",
+    "mercedes": "mercedes-benz",
+    "benz": "mercedes-benz",
+    "ds": "ds automobiles",
+    "rolls royce": "rolls-royce",
+    "lynk & co": "lynk&co",
+    "lynk and co": "lynk&co",
+}
+
+REQUIRED_FIELDS = ("brand", "model", "soc_start", "soc_end", "duration_hours")
+
+# Más estricta que text_parsing.DURATION_RE: la unidad debe ser una palabra completa,
+# para que "2021 hasta" no se lea como 2021 horas. Admite minutos a continuación
+# ("1h30", "2 horas y 15 min") y fracciones ("2 horas y media", "1 hora y cuarto").
+STRICT_DURATION_RE = re.compile(
+    r"(?<![\d.,])(?P<hours>\d+(?:[\.,]\d+)?)\s*(?:h|hr|hrs|hora|horas)(?![a-z])"
+    r"(?:(?<=h)(?P<attached>[0-5]\d)(?![\d%a-z])"
+    r"|\s*(?:y\s*)?(?P<minutes>\d{1,2})\s*(?:min|mins|minuto|minutos)(?![a-z])"
+    r"|\s+y\s+(?P<fraction>media|cuarto)(?![a-z]))?"
+)
+MINUTES_RE = re.compile(r"(?<![\d.,])(\d+(?:[\.,]\d+)?)\s*(?:min|mins|minuto|minutos)(?![a-z])")
+# Lo que sigue a una duración y sugiere que no la hemos leído entera ("2 horas y tres cuartos")
+DURATION_TAIL_RE = re.compile(r"\s*(?:y\s+)?(?:\d|un|una|dos|tres|cuart|medi|min)")
+_FRACTIONS = {"media": 0.5, "cuarto": 0.25}
+# Antigüedad del vehículo ("3 años", ya normalizado: "3 anos"), respuesta a "¿Cuántos años tiene tu vehículo?"
+AGE_RE = re.compile(r"(?<![\d.,])(\d{1,2})\s*anos?(?![a-z])")
+
+# Los prefijos de modelo más cortos que esto ("e", "i") dan demasiados falsos positivos
+MIN_MODEL_PREFIX_CHARS = 2
+
+
+def parse_duration(text_n: str) -> Tuple[Optional[float], bool]:
+    """(horas, ambigua) a partir de un texto normalizado.
+
+    Cada mención ("1h30", "45 min", "2 horas y media") da una duración; si hay
+    más de una, o si una mención va seguida de algo que parece continuarla
+    y no se reconoce, la duración se marca como ambigua para que decida el LLM.
+    """
+    values: List[float] = []
+    ambiguous = False
+    for m in STRICT_DURATION_RE.finditer(text_n):
+        hours = float(m.group("hours").replace(",", "."))
+        minutes = m.group("attached") or m.group("minutes")
+        if minutes:
+            hours += int(minutes) / 60.0
+        elif m.group("fraction"):
+            hours += _FRACTIONS[m.group("fraction")]
+        values.append(hours)
+        ambiguous = ambiguous or bool(DURATION_TAIL_RE.match(text_n, m.end()))
+
+    # Minutos sueltos, fuera de las menciones en horas ya leídas
+    rest = STRICT_DURATION_RE.sub(" ", text_n)
+    for m in MINUTES_RE.finditer(rest):
+        values.append(float(m.group(1).replace(",", ".")) / 60.0)
+        ambiguous = ambiguous or bool(DURATION_TAIL_RE.match(rest, m.end()))
+
+    if not values:
+        return None, False
+    return values[0], ambiguous or len(values) > 1
+
+
+def _word_pattern(phrases: List[str]) -> "re.Pattern[str]":
+    """Regex que encuentra cualquiera de las frases como palabras completas (la más larga primero)."""
+    alternation = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    return re.compile(rf"(?<![a-z0-9])(?:{alternation})(?![a-z0-9])")
+
+
+@dataclass
+class LocalExtraction:
+    """Resultado del extractor local."""
+
+    fields: Dict[str, Any]
+    missing: List[str] = field(default_factory=list)
+    ambiguous: List[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing and not self.ambiguous
+
+
+class LocalExtractor:
+    """Extrae brand/model/año/batería/antigüedad/SoC/duración con regex + diccionario de EV-DB."""
+
+    def __init__(self, vehicle_index: VehicleIndex):
+        brands = vehicle_index.brand_names()
+        self._brand_display = brands
+        self._brand_lookup: Dict[str, str] = {b: b for b in brands}
+        self._brand_lookup.update({a: b for a, b in BRAND_ALIASES.items() if b in brands})
+        self._brand_re = _word_pattern(list(self._brand_lookup))
+
+        # Para cada marca: todos los prefijos (por tokens) de sus modelos, para que
+        # "model 3" encuentre "Model 3 Long Range AWD" aunque el usuario no diga la versión
+        self._model_re: Dict[str, "re.Pattern[str]"] = {}
+        for brand_n in brands:
+            prefixes = set()
+            for model_n in vehicle_index.model_names(brand_n):
+                tokens = model_n.split()
+                for i in range(1, len(tokens) + 1):
+                    prefix = " ".join(tokens[:i])
+                    if len(prefix) >= MIN_MODEL_PREFIX_CHARS:
+                        prefixes.add(prefix)
+            if prefixes:
+                self._model_re[brand_n] = _word_pattern(list(prefixes))
+
+    def _find_brand(self, text_n: str) -> Tuple[Optional[str], bool]:
+        """(marca normalizada, ambigua)."""
+        found = {self._brand_lookup[m.group(0)] for m in self._brand_re.finditer(text_n)}
+        if len(found) == 1:
+            return found.pop(), False
+        return None, len(found) > 1
+
+    def _find_model(self, brand_n: str, text_n: str) -> Tuple[Optional[str], bool]:
+        """(modelo, ambiguo): el prefijo de modelo más largo que aparece en el texto."""
+        pattern = self._model_re.get(brand_n)
+        if pattern is None:
+            return None, False
+        # Quitamos la marca para que no cuente como modelo (p. ej. "mini" en "Mini Cooper")
+        text_n = self._brand_re.sub(" ", text_n)
+        matches = {m.group(0) for m in pattern.finditer(text_n)}
+        if not matches:
+            return None, False
+        longest = max(len(m) for m in matches)
+        best = {m for m in matches if len(m) == longest}
+        if len(best) > 1:
+            return None, True
+        return best.pop(), False
+
+    def extract(self, user_msg: str) -> LocalExtraction:
+        text_n = normalize_text(user_msg)
+        battery_kwh, soc_start, soc_end, _, year = extract_numbers_from_text(text_n)
+        duration_hours, duration_ambiguous = parse_duration(text_n)
+        age_match = AGE_RE.search(text_n)
+
+        fields: Dict[str, Any] = {
+            "brand": None,
+            "model": None,
+            "year": year,
+            "battery_capacity_kwh": battery_kwh,
+            "vehicle_age_years": int(age_match.group(1)) if age_match else None,
+            "soc_start": soc_start,
+            "soc_end": soc_end,
+            "duration_hours": duration_hours,
+        }
+        ambiguous: List[str] = []
+
+        brand_n, brand_ambiguous = self._find_brand(text_n)
+        if brand_ambiguous:
+            ambiguous.append("brand")
+        if brand_n:
+            fields["brand"] = self._brand_display[brand_n]
+            # Los años no forman parte del nombre del modelo en EV-DB
+            model_n, model_ambiguous = self._find_model(brand_n, YEAR_RE.sub(" ", text_n))
+            fields["model"] = model_n
+            if model_ambiguous:
+                ambiguous.append("model")
+
+        if len(find_percentages(text_n)) > 2:
+            ambiguous.append("soc")
+        if duration_ambiguous:
+            ambiguous.append("duration_hours")
+
+        missing = [f for f in REQUIRED_FIELDS if fields[f] is None]
+        return LocalExtraction(fields=fields, missing=missing, ambiguous=ambiguous)
+
+
+class ExtractionStats:
+    """Contadores thread-safe de cuántas extracciones evitaron el LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.llm_fallbacks = 0
+        self.fallback_reasons: Dict[str, int] = {}
+
+    def record_local(self) -> None:
+        with self._lock:
+            self.local_hits += 1
+
+    def record_fallback(self, extraction: LocalExtraction) -> None:
+        with self._lock:
+            self.llm_fallbacks += 1
+            for name in extraction.missing:
+                key = f"missing:{name}"
+                self.fallback_reasons[key] = self.fallback_reasons.get(key, 0) + 1
+            for name in extraction.ambiguous:
+                key = f"ambiguous:{name}"
+                self.fallback_reasons[key] = self.fallback_reasons.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.local_hits + self.llm_fallbacks
+            return {
+                "requests": total,
+                "local_hits": self.local_hits,
+                "llm_fallbacks": self.llm_fallbacks,
+                "local_ratio": self.local_hits / total if total else 0.0,
+                "fallback_reasons": dict(self.fallback_reasons),
+            }
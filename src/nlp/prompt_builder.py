@@ -0,0 +1,255 @@
+import functools
+import json
+import logging
+import math
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.env import offline_mode
+
+
+logger = logging.getLogger(__name__)
+
+ENCODING_ENV = "EV_PROMPT_ENCODING"
+BUDGET_ENV = "EV_PROMPT_TOKEN_BUDGET"
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_TOKEN_BUDGET = 400
+# Aproximación cuando tiktoken o su encoding no están disponibles (p. ej. sin red)
+CHARS_PER_TOKEN = 4.0
+# Fracción de peticiones en las que los tokens del prompt extenso se cuentan con el
+# tokenizador; en el resto se estiman por su longitud en caracteres
+BASELINE_SAMPLE_ENV = "EV_PROMPT_BASELINE_SAMPLE"
+DEFAULT_BASELINE_SAMPLE = 0.05
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(name: str):
+    # tiktoken descarga el encoding en el primer uso; sin red solo se usa si ya
+    # está en TIKTOKEN_CACHE_DIR (de donde lo lee sin conectarse)
+    if offline_mode() and not os.getenv("TIKTOKEN_CACHE_DIR"):
+        logger.info("Modo sin red: se estiman tokens como caracteres/%g", CHARS_PER_TOKEN)
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as exc:
+        logger.warning("tiktoken no disponible (%s); se estiman tokens como caracteres/%g",
+                       exc, CHARS_PER_TOKEN)
+        return None
+
+
+def count_tokens(text: str, encoding: Optional[str] = None) -> int:
+    """Tokens de `text` según tiktoken (el tokenizador de Qwen no está disponible; es una aproximación)."""
+    enc = _encoding(encoding or os.getenv(ENCODING_ENV) or DEFAULT_ENCODING)
+    if enc is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(enc.encode(text))
+
+
+def _compact(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _round(value: Any, digits: int = 2) -> Any:
+    if isinstance(value, float):
+        return round(value, digits)
+    return value
+
+
+# Campos de la fila de EV-DB que el LLM necesita (el resto son columnas internas)
+VEHICLE_FIELDS = {"BRAND": "marca", "MODEL": "modelo", "MODEL.1": "año", "BATT_CAPACITY": "bateria_kWh"}
+
+# Campos de session_info que se explican en modo predict
+PREDICT_SESSION_FIELDS = {
+    "Energy_est_SoC": "energia_est_kWh",
+    "Charging_Rate": "potencia_media_kW",
+    "Charge_Efficiency": "eficiencia",
+    "Vehicle Age (years)": "edad_años",
+    "SoC_diff": "soc_diff_pct",
+    "Charging Duration (hours)": "duracion_h",
+}
+
+HEADER = "Eres un asistente especializado en vehículos eléctricos. Responde SOLO en español."
+
+INSTRUCTIONS = {
+    "ask_missing": (
+        "Faltan datos. No inventes valores ni des una predicción. Pregunta al usuario, "
+        "de forma clara y amable, lo indicado en PREGUNTAS; puedes mencionar lo que ya sabes."
+    ),
+    "predict": (
+        "Explica de forma clara: el vehículo detectado (marca, modelo, año), la energía "
+        "estimada cargada (kWh), la potencia media (kW), la eficiencia asumida, la edad del "
+        "vehículo y la predicción del modelo en kWh y qué significa para el usuario."
+    ),
+}
+
+
+@dataclass
+class BuiltPrompt:
+    """Prompt final compacto y su contabilidad de tokens."""
+
+    text: str
+    tokens: int
+    budget: int
+    baseline_tokens: Optional[int] = None
+    # True si `baseline_tokens` se contó con el tokenizador; False si es la estimación por caracteres
+    baseline_counted: bool = False
+    dropped_sections: List[str] = field(default_factory=list)
+
+    @property
+    def saved_tokens(self) -> Optional[int]:
+        return None if self.baseline_tokens is None else self.baseline_tokens - self.tokens
+
+    @property
+    def over_budget(self) -> bool:
+        return self.tokens > self.budget
+
+
+class PromptBuilder:
+    """Construye el prompt final solo con los campos relevantes y las instrucciones del modo activo.
+
+    Las secciones opcionales se descartan (de menor a mayor prioridad) hasta
+    que el prompt cabe en `budget` tokens. Si se pasa `baseline`, se miden
+    también los tokens del prompt extenso para calcular el ahorro: contados
+    con `count_baseline`, o estimados con los tokens por carácter del prompt
+    compacto (sin volver a tokenizar).
+    """
+
+    def __init__(self, budget: Optional[int] = None, encoding: Optional[str] = None):
+        self.budget = budget or int(os.getenv(BUDGET_ENV, str(DEFAULT_TOKEN_BUDGET)))
+        self.encoding = encoding
+
+    def _vehicle(self, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not row:
+            return None
+        return {
+            label: _round(row[col])
+            for col, label in VEHICLE_FIELDS.items()
+            if row.get(col) is not None and row[col] == row[col]  # descarta NaN
+        }
+
+    def _sections(self, logic_result: Dict[str, Any]) -> List[Tuple[str, str, bool]]:
+        """(nombre, texto, obligatoria) en el orden en que aparecen en el prompt."""
+        mode = logic_result["mode"]
+        sections: List[Tuple[str, str, bool]] = [
+            ("header", HEADER, True),
+            ("instructions", f"INSTRUCCIONES: {INSTRUCTIONS[mode]}", True),
+        ]
+        vehicle = self._vehicle(logic_result.get("vehicle_row"))
+
+        if mode == "predict":
+            session = logic_result["session_info"]
+            summary = {
+                label: _round(session[key])
+                for key, label in PREDICT_SESSION_FIELDS.items()
+                if session.get(key) is not None
+            }
+            sections.append(("vehicle", f"VEHICULO: {_compact(vehicle)}", True))
+            sections.append(("session", f"SESION: {_compact(summary)}", True))
+            sections.append(("prediction", f"PREDICCION_kWh: {_round(logic_result['prediction'])}", True))
+            return sections
+
+        extracted = {k: v for k, v in (logic_result.get("extracted") or {}).items() if v is not None}
+        known = {k: _round(v) for k, v in logic_result["session_info"].items() if v is not None}
+        sections.append(("questions", f"PREGUNTAS: {_compact(logic_result['questions'])}", True))
+        if vehicle:
+            sections.append(("vehicle", f"VEHICULO: {_compact(vehicle)}", False))
+        if extracted:
+            sections.append(("extracted", f"DATOS_USUARIO: {_compact(extracted)}", False))
+        if known:
+            sections.append(("session", f"SESION_CONOCIDA: {_compact(known)}", False))
+        return sections
+
+    def build(
+        self,
+        logic_result: Dict[str, Any],
+        baseline: Optional[str] = None,
+        count_baseline: bool = False,
+    ) -> BuiltPrompt:
+        sections = self._sections(logic_result)
+        dropped: List[str] = []
+
+        text = "\n".join(s[1] for s in sections)
+        tokens = count_tokens(text, self.encoding)
+        # Se descartan primero las últimas secciones opcionales (las de menor prioridad)
+        while tokens > self.budget:
+            optional = [i for i, s in enumerate(sections) if not s[2]]
+            if not optional:
+                logger.warning("El prompt final (%d tokens) supera el presupuesto de %d", tokens, self.budget)
+                break
+            dropped.append(sections.pop(optional[-1])[0])
+            text = "\n".join(s[1] for s in sections)
+            tokens = count_tokens(text, self.encoding)
+
+        baseline_tokens = None
+        if baseline is not None:
+            if count_baseline:
+                baseline_tokens = count_tokens(baseline, self.encoding)
+            else:
+                baseline_tokens = round(tokens * len(baseline) / max(len(text), 1))
+
+        return BuiltPrompt(
+            text=text,
+            tokens=tokens,
+            budget=self.budget,
+            baseline_tokens=baseline_tokens,
+            baseline_counted=baseline is not None and count_baseline,
+            dropped_sections=dropped,
+        )
+
+
+class PromptStats:
+    """Acumulado thread-safe de tokens de entrada enviados y ahorrados frente al prompt extenso.
+
+    Cada petición aporta los tokens del prompt extenso (estimados o, en la
+    muestra de `should_sample`, contados); `sampled_saved_ratio` es el ahorro
+    medido solo con los contados, para contrastar la estimación.
+    """
+
+    def __init__(self, sample_rate: Optional[float] = None):
+        if sample_rate is None:
+            sample_rate = float(os.getenv(BASELINE_SAMPLE_ENV, str(DEFAULT_BASELINE_SAMPLE)))
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens = 0
+        self.sampled = 0
+        self.sampled_tokens = 0
+        self.sampled_baseline_tokens = 0
+        self.baseline_tokens = 0
+        self.over_budget = 0
+
+    def should_sample(self) -> bool:
+        """True si esta petición debe contar con el tokenizador el prompt extenso."""
+        return random.random() < self.sample_rate
+
+    def record(self, built: BuiltPrompt) -> None:
+        with self._lock:
+            self.requests += 1
+            self.tokens += built.tokens
+            self.over_budget += int(built.over_budget)
+            self.baseline_tokens += built.tokens if built.baseline_tokens is None else built.baseline_tokens
+            if built.baseline_counted:
+                self.sampled += 1
+                self.sampled_tokens += built.tokens
+                self.sampled_baseline_tokens += built.baseline_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.baseline_tokens - self.tokens
+            return {
+                "requests": self.requests,
+                "sampled_requests": self.sampled,
+                "input_tokens": self.tokens,
+                "baseline_input_tokens": self.baseline_tokens,
+                "saved_tokens": saved,
+                "saved_ratio": saved / self.baseline_tokens if self.baseline_tokens else 0.0,
+                "sampled_saved_ratio": (
+                    1.0 - self.sampled_tokens / self.sampled_baseline_tokens
+                    if self.sampled_baseline_tokens else None
+                ),
+                "over_budget": self.over_budget,
+            }
@@ -0,0 +1,250 @@
+"""Scoring por lotes de sesiones de carga desde CSV / JSONL, en streaming.
+
+Uso:
+    python -m src.pipeline.batch_scoring sesiones.csv predicciones.csv --chunk-size 5000
+
+El archivo de entrada debe tener las columnas de RAW_COLUMNS
+(`vehicle_year` es opcional). Se lee y se escribe por bloques de tamaño fijo,
+así que la memoria no crece con el tamaño del archivo.
+
+Con `--workers N` los bloques se reparten entre N procesos; cada proceso carga
+el snapshot del modelo una sola vez (en el initializer del pool) y los
+resultados se escriben en el orden original.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Iterator, List, Optional
+
+import pandas as pd
+
+from src.pipeline.ev_pipeline import EVEnergyPipeline, RAW_COLUMNS
+
+
+DEFAULT_CHUNK_SIZE = 10_000
+PREDICTION_COLUMN = "predicted_energy_kwh"
+
+_JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+# Un .json es un array de registros: no se puede leer por líneas
+_JSON_EXTENSIONS = (".json",)
+
+
+@dataclass
+class BatchStats:
+    """Resumen de una ejecución de scoring por lotes."""
+
+    rows: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Procesadas {self.rows} filas en {self.chunks} bloques, "
+            f"{self.seconds:.2f} s ({self.rows_per_second:,.0f} filas/s)"
+        )
+
+
+def _is_jsonl(path: str) -> bool:
+    return path.lower().endswith(_JSONL_EXTENSIONS)
+
+
+def _is_json_array(path: str) -> bool:
+    return path.lower().endswith(_JSON_EXTENSIONS)
+
+
+def _iter_frame_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def iter_input_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Itera el archivo de entrada (CSV, JSONL o array JSON) en bloques de `chunk_size` filas.
+
+    CSV y JSONL se leen en streaming; un `.json` (array de registros) se
+    carga entero y después se trocea.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No se encontró el archivo de entrada {path}")
+
+    if _is_json_array(path):
+        chunks = _iter_frame_chunks(pd.read_json(path, orient="records"), chunk_size)
+        yield from (_check_columns(path, chunk) for chunk in chunks)
+        return
+
+    if _is_jsonl(path):
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        reader = pd.read_csv(path, chunksize=chunk_size)
+
+    with reader:
+        for chunk in reader:
+            yield _check_columns(path, chunk)
+
+
+def _check_columns(path: str, chunk: pd.DataFrame) -> pd.DataFrame:
+    missing = [c for c in RAW_COLUMNS if c != "vehicle_year" and c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en {path}: {missing}")
+    return chunk
+
+
+class ChunkWriter:
+    """Escribe bloques de resultados de forma incremental en CSV, JSONL o array JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jsonl = _is_jsonl(path)
+        self.json_array = _is_json_array(path)
+        self._fh: Optional[IO[str]] = None
+        self._header_written = False
+
+    def __enter__(self) -> "ChunkWriter":
+        self._fh = open(self.path, "w", encoding="utf-8", newline="")
+        if self.json_array:
+            self._fh.write("[")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._fh is not None:
+            if self.json_array:
+                self._fh.write("]\n")
+            self._fh.close()
+            self._fh = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self._fh is None:
+            raise RuntimeError("ChunkWriter debe usarse como context manager")
+        if self.jsonl:
+            text = chunk.to_json(orient="records", lines=True, force_ascii=False)
+            self._fh.write(text if text.endswith("\n") else text + "\n")
+        elif self.json_array:
+            # Registros del bloque sin los corchetes, separados por comas del bloque anterior
+            records = chunk.to_json(orient="records", force_ascii=False)[1:-1]
+            if records:
+                self._fh.write(("," if self._header_written else "") + records)
+                self._header_written = True
+        else:
+            chunk.to_csv(self._fh, index=False, header=not self._header_written)
+            self._header_written = True
+        self._fh.flush()
+
+
+def score_chunk(pipeline: EVEnergyPipeline, chunk: pd.DataFrame) -> pd.DataFrame:
+    """Devuelve el bloque de entrada con la columna de predicción añadida."""
+    out = chunk.copy()
+    out[PREDICTION_COLUMN] = pipeline.predict_many(chunk, chunk_size=len(chunk))
+    return out
+
+
+# Pipeline propia de cada proceso del pool (se crea en _init_worker)
+_worker_pipeline: Optional[EVEnergyPipeline] = None
+
+
+def _init_worker(repo_id: Optional[str]) -> None:
+    """Initializer del pool: carga el snapshot una única vez por proceso."""
+    global _worker_pipeline
+    _worker_pipeline = EVEnergyPipeline(repo_id=repo_id)
+
+
+def _score_in_worker(chunk: pd.DataFrame) -> pd.DataFrame:
+    if _worker_pipeline is None:
+        raise RuntimeError("El proceso no fue inicializado con _init_worker")
+    return score_chunk(_worker_pipeline, chunk)
+
+
+def _score_parallel(
+    input_path: str,
+    writer: ChunkWriter,
+    chunk_size: int,
+    workers: int,
+    repo_id: Optional[str],
+) -> int:
+    """Reparte los bloques entre procesos y los escribe en orden.
+
+    Como mucho hay 2 bloques en vuelo por proceso, así que la memoria sigue
+    acotada aunque la lectura sea más rápida que el scoring.
+    """
+    max_in_flight = 2 * workers
+    pending: "deque[Future]" = deque()
+    rows = 0
+    # spawn: evita heredar por fork el estado de TensorFlow del proceso padre
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(repo_id,)) as pool:
+        for chunk in iter_input_chunks(input_path, chunk_size):
+            if len(pending) >= max_in_flight:
+                writer.write(pending.popleft().result())
+            pending.append(pool.submit(_score_in_worker, chunk))
+            rows += len(chunk)
+        while pending:
+            writer.write(pending.popleft().result())
+    return rows
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    pipeline: Optional[EVEnergyPipeline] = None,
+    workers: int = 1,
+    repo_id: Optional[str] = None,
+) -> BatchStats:
+    """Puntúa `input_path` por bloques y escribe las predicciones en `output_path`.
+
+    Con `workers > 1` se usa un pool de procesos (se ignora `pipeline`; cada
+    proceso construye la suya con `repo_id`).
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size debe ser mayor que 0")
+    if workers <= 0:
+        raise ValueError("workers debe ser mayor que 0")
+
+    rows = chunks = 0
+    start = time.perf_counter()
+    with ChunkWriter(output_path) as writer:
+        if workers > 1:
+            rows = _score_parallel(input_path, writer, chunk_size, workers, repo_id)
+            chunks = -(-rows // chunk_size)
+        else:
+            pipeline = pipeline or EVEnergyPipeline(repo_id=repo_id)
+            for chunk in iter_input_chunks(input_path, chunk_size):
+                writer.write(score_chunk(pipeline, chunk))
+                rows += len(chunk)
+                chunks += 1
+    return BatchStats(rows=rows, chunks=chunks, seconds=time.perf_counter() - start)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Predice la energía cargada para un CSV/JSONL de sesiones de carga."
+    )
+    parser.add_argument("input", help="Archivo de entrada (.csv o .jsonl)")
+    parser.add_argument("output", help="Archivo de salida (.csv o .jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Filas por bloque (por defecto {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--repo-id", default=None, help="Repositorio del modelo en Hugging Face")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos de scoring en paralelo (por defecto 1; 0 = todos los núcleos)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> BatchStats:
+    args = build_arg_parser().parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+    stats = score_file(args.input, args.output, chunk_size=args.chunk_size,
+                       workers=workers, repo_id=args.repo_id)
+    print(stats.summary())
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,28 @@
 
-from typing import Optional
+from typing import Optional, Sequence, Union
 
-from src.model.ev_model import EVEnergyModel, DEFAULT_REPO_ID
+import numpy as np
+import pandas as pd
+
+from src.model.ev_model import EVEnergyModel, DEFAULT_REPO_ID, DEFAULT_BATCH_SIZE
 from src.core.session_completer import SessionCompleter, SessionInfo
 
 
+ArrayLike = Union[Sequence[float], np.ndarray, pd.Series]
+
+# Columnas de entrada cruda aceptadas por predict_many(data=...)
+RAW_COLUMNS = [
+    "battery_capacity_kwh",
+    "soc_start_pct",
+    "soc_end_pct",
+    "charging_duration_hours",
+    "vehicle_year",
+]
+
+# Tamaño máximo de la rejilla de `sweep` (producto de los valores de cada eje)
+MAX_SWEEP_POINTS = 100_000
+
+
 class EVEnergyPipeline:
     """Arquitectura mínima de inferencia.
 
@@ -17,12 +35,25 @@ class EVEnergyPipeline:
             charging_duration_hours=1.5,
             vehicle_year=2023,
         )
+
+        # Lote: arrays o un DataFrame con las columnas de RAW_COLUMNS
+        preds = pipeline.predict_many(df_sessions)
+
+        # "¿Y si...?": rejilla de SoC final x duración para un vehículo
+        table = pipeline.sweep(75, soc_start_pct=20, soc_end_pct=[60, 80, 90],
+                               charging_duration_hours=[1, 1.5, 2], vehicle_year=2023)
     """
 
-    def __init__(self, repo_id: str = None, force_download: bool = False):
+    def __init__(self, repo_id: str = None, force_download: bool = False, model=None, **model_options):
+        """
+        `model`: instancia ya creada con la interfaz de EVEnergyModel (p. ej.
+        RemoteEVEnergyModel para usar el servicio de inferencia). Si no se
+        pasa, se carga EVEnergyModel con `model_options` (revision, local_dir, ...).
+        """
         self.session_completer = SessionCompleter()
-        self.model = EVEnergyModel(repo_id=repo_id or DEFAULT_REPO_ID,
-                                   force_download=force_download)
+        self.model = model or EVEnergyModel(repo_id=repo_id or DEFAULT_REPO_ID,
+                                            force_download=force_download,
+                                            **model_options)
 
     def build_session(
         self,
@@ -58,3 +89,99 @@ class EVEnergyPipeline:
         )
         preds = self.model.predict_from_session(session.to_model_dict())
         return float(preds[0])
+
+    def predict_many(
+        self,
+        data: Optional[pd.DataFrame] = None,
+        *,
+        battery_capacity_kwh: Optional[ArrayLike] = None,
+        soc_start_pct: Optional[ArrayLike] = None,
+        soc_end_pct: Optional[ArrayLike] = None,
+        charging_duration_hours: Optional[ArrayLike] = None,
+        vehicle_year: Optional[ArrayLike] = None,
+        chunk_size: int = DEFAULT_BATCH_SIZE,
+    ) -> np.ndarray:
+        """Predicción por lotes: devuelve un np.ndarray (kWh) en el orden de entrada.
+
+        Acepta un DataFrame `data` con las columnas de RAW_COLUMNS
+        (`vehicle_year` es opcional) o los mismos campos como arrays.
+        """
+        if data is not None:
+            battery_capacity_kwh = data["battery_capacity_kwh"]
+            soc_start_pct = data["soc_start_pct"]
+            soc_end_pct = data["soc_end_pct"]
+            charging_duration_hours = data["charging_duration_hours"]
+            vehicle_year = data["vehicle_year"] if "vehicle_year" in data else None
+
+        required = (battery_capacity_kwh, soc_start_pct, soc_end_pct, charging_duration_hours)
+        if any(col is None for col in required):
+            raise ValueError(
+                "predict_many necesita battery_capacity_kwh, soc_start_pct, "
+                "soc_end_pct y charging_duration_hours"
+            )
+
+        features = self.session_completer.build_matrix_from_raw(
+            battery_capacity_kwh=battery_capacity_kwh,
+            soc_start_pct=soc_start_pct,
+            soc_end_pct=soc_end_pct,
+            charging_duration_hours=charging_duration_hours,
+            vehicle_year=vehicle_year,
+            feature_names=self.model.feature_names,
+        )
+        return self.model.predict_many(features, chunk_size=chunk_size)
+
+    def sweep(
+        self,
+        battery_capacity_kwh: float,
+        soc_start_pct: Union[float, ArrayLike],
+        soc_end_pct: Union[float, ArrayLike],
+        charging_duration_hours: Union[float, ArrayLike],
+        vehicle_year: Optional[int] = None,
+        chunk_size: int = DEFAULT_BATCH_SIZE,
+    ) -> pd.DataFrame:
+        """Predicciones "¿y si...?" de un vehículo sobre una rejilla de SoC y duración.
+
+        `soc_start_pct`, `soc_end_pct` y `charging_duration_hours` aceptan un
+        valor o una secuencia; se evalúa su producto cartesiano, descartando
+        las combinaciones imposibles (SoC fuera de 0-100, final <= inicial,
+        duración <= 0). Toda la rejilla se puntúa con una sola llamada por
+        lotes al modelo. Devuelve una fila por combinación con las columnas
+        soc_start_pct, soc_end_pct, charging_duration_hours, soc_diff,
+        energy_est_soc_kwh, charging_rate_kw y predicted_energy_kwh.
+        """
+        axes = [
+            np.atleast_1d(np.asarray(values, dtype=float))
+            for values in (soc_start_pct, soc_end_pct, charging_duration_hours)
+        ]
+        points = int(np.prod([len(axis) for axis in axes]))
+        if points > MAX_SWEEP_POINTS:
+            raise ValueError(f"La rejilla tiene {points} puntos (máximo {MAX_SWEEP_POINTS})")
+
+        soc_start, soc_end, duration = (grid.ravel() for grid in np.meshgrid(*axes, indexing="ij"))
+        valid = (soc_start >= 0) & (soc_end <= 100) & (soc_end > soc_start) & (duration > 0)
+        soc_start, soc_end, duration = soc_start[valid], soc_end[valid], duration[valid]
+        n = len(soc_start)
+        if n == 0:
+            raise ValueError("Ninguna combinación de la rejilla es válida (SoC final debe superar al inicial)")
+
+        batt = np.full(n, float(battery_capacity_kwh))
+        preds = self.predict_many(
+            battery_capacity_kwh=batt,
+            soc_start_pct=soc_start,
+            soc_end_pct=soc_end,
+            charging_duration_hours=duration,
+            vehicle_year=None if vehicle_year is None else np.full(n, float(vehicle_year)),
+            chunk_size=chunk_size,
+        )
+
+        soc_diff = soc_end - soc_start
+        energy_est_soc = soc_diff * batt / 100.0
+        return pd.DataFrame({
+            "soc_start_pct": soc_start,
+            "soc_end_pct": soc_end,
+            "charging_duration_hours": duration,
+            "soc_diff": soc_diff,
+            "energy_est_soc_kwh": energy_est_soc,
+            "charging_rate_kw": energy_est_soc / duration,
+            "predicted_energy_kwh": np.asarray(preds, dtype=float),
+        })
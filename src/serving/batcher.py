@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class _Request:
+    features: np.ndarray
+    future: "Future[np.ndarray]"
+    enqueued_at: float
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.asarray(values), [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class MicroBatcher:
+    """Agrupa peticiones concurrentes en una sola llamada batched al modelo.
+
+    Un hilo de fondo toma la primera petición de la cola y sigue acumulando
+    hasta `max_batch` filas o hasta que pasan `max_wait_ms` desde que llegó la
+    primera; entonces llama una vez a `predict_fn(matriz)` y reparte los
+    resultados a cada petición en su orden original. Una petición que no cabe
+    en el lote abre el siguiente, y una de más de `max_batch` filas se
+    predice sola, en trozos de `max_batch`: `predict_fn` nunca recibe más filas.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        latency_window: int = 10_000,
+    ):
+        if max_batch <= 0:
+            raise ValueError("max_batch debe ser mayor que 0")
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        # Petición sacada de la cola que no cupo en el lote anterior (solo la usa el hilo de fondo)
+        self._carry: Optional[_Request] = None
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._batch_sizes: Deque[int] = deque(maxlen=latency_window)
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ev-micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features: np.ndarray) -> "Future[np.ndarray]":
+        """Encola una matriz (n, n_features); el Future devuelve n predicciones."""
+        future: "Future[np.ndarray]" = Future()
+        features = np.atleast_2d(np.asarray(features, dtype=float))
+        self._queue.put(_Request(features=features, future=future, enqueued_at=time.perf_counter()))
+        return future
+
+    def predict(self, features: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(features).result(timeout=timeout)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        rows = len(first.features)
+        deadline = first.enqueued_at + self.max_wait_s
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Reencolamos la señal de parada para que _run la vea
+                self._queue.put(None)
+                break
+            if rows + len(item.features) > self.max_batch:
+                self._carry = item
+                break
+            batch.append(item)
+            rows += len(item.features)
+        return batch
+
+    def _predict(self, matrix: np.ndarray) -> np.ndarray:
+        parts = []
+        for start in range(0, len(matrix), self.max_batch):
+            chunk = matrix[start:start + self.max_batch]
+            preds = np.asarray(self.predict_fn(chunk), dtype=float).reshape(-1)
+            if len(preds) != len(chunk):
+                raise ValueError(
+                    f"predict_fn devolvió {len(preds)} predicciones para {len(chunk)} filas"
+                )
+            parts.append(preds)
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def _run(self) -> None:
+        while True:
+            first, self._carry = self._carry, None
+            if first is None:
+                first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                preds = self._predict(np.vstack([r.features for r in batch]))
+            except Exception as exc:
+                for r in batch:
+                    r.future.set_exception(exc)
+                continue
+
+            done = time.perf_counter()
+            offset = 0
+            for r in batch:
+                n = len(r.features)
+                r.future.set_result(preds[offset:offset + n])
+                offset += n
+            with self._stats_lock:
+                self._batch_sizes.append(offset)
+                self._latencies.extend(done - r.enqueued_at for r in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            latencies = list(self._latencies)
+            sizes = list(self._batch_sizes)
+        return {
+            "requests": len(latencies),
+            "batches": len(sizes),
+            "mean_batch_rows": float(np.mean(sizes)) if sizes else None,
+            "latency_seconds": _percentiles(latencies),
+            "queue_depth": self._queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+        }
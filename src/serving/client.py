@@ -0,0 +1,133 @@
+import json
+import math
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.core.session_completer import MODEL_FEATURE_NAMES
+from src.model.ev_model import DEFAULT_BATCH_SIZE, FeatureBatch
+
+
+INFERENCE_URL_ENV = "EV_INFERENCE_URL"
+# Tiempo máximo esperando a que el servicio termine de cargar el modelo (/readyz 503)
+READY_TIMEOUT_S = float(os.getenv("EV_INFERENCE_READY_TIMEOUT_S", "60"))
+READY_BACKOFF_MAX_S = 5.0
+
+
+def _json_value(value: Any) -> Any:
+    if value is None:
+        return None
+    number = float(value)
+    return None if math.isnan(number) else number
+
+
+class RemoteEVEnergyModel:
+    """Cliente del servicio de inferencia con la misma interfaz que EVEnergyModel.
+
+    Permite que las UIs usen un servicio compartido (src/serving/inference_server.py)
+    en lugar de cargar el modelo en cada proceso:
+
+        pipeline = EVEnergyPipeline(model=RemoteEVEnergyModel("http://127.0.0.1:8600"))
+
+    El constructor no contacta el servicio: `/readyz` se consulta en el primer
+    uso (predicción o `feature_names`), reintentando con backoff mientras el
+    servicio arranca, hasta `ready_timeout` segundos. Si se agota, la llamada
+    falla pero la siguiente vuelve a intentarlo.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0, ready_timeout: float = READY_TIMEOUT_S):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.ready_timeout = ready_timeout
+        self._feature_names: List[str] = list(MODEL_FEATURE_NAMES)
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    @property
+    def feature_names(self) -> List[str]:
+        self._ensure_ready()
+        return self._feature_names
+
+    def _ensure_ready(self) -> None:
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            deadline = time.monotonic() + self.ready_timeout
+            delay = 0.1
+            while True:
+                try:
+                    ready = self._request("GET", "/readyz")
+                    break
+                except RuntimeError:
+                    # 503 mientras carga el modelo, o conexión rechazada si aún no escucha
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise
+                    time.sleep(min(delay, remaining))
+                    delay = min(delay * 2, READY_BACKOFF_MAX_S)
+            if ready.get("feature_names"):
+                self._feature_names = list(ready["feature_names"])
+            self._ready = True
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as exc:
+            detail = exc.read().decode("utf-8", errors="replace")
+            raise RuntimeError(
+                f"El servicio de inferencia respondió {exc.code} en {path}: {detail}"
+            ) from exc
+        except urllib.error.URLError as exc:
+            raise RuntimeError(
+                f"No se pudo contactar el servicio de inferencia en {self.base_url}: {exc.reason}"
+            ) from exc
+
+    def predict_from_session(self, session_info: Dict[str, Any]) -> List[float]:
+        record = {name: _json_value(session_info.get(name)) for name in self.feature_names}
+        response = self._request("POST", "/v1/predict_features", {"features": [record]})
+        # El servicio envía null donde el modelo devolvió NaN
+        return [np.nan if p is None else float(p) for p in response["predictions"]]
+
+    def predict_many(self, features: FeatureBatch, chunk_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+        if isinstance(features, pd.DataFrame):
+            matrix = features.loc[:, self.feature_names].to_numpy(dtype=float)
+        elif isinstance(features, np.ndarray):
+            matrix = np.asarray(features, dtype=float)
+        else:
+            matrix = np.array(
+                [[r.get(name) for name in self.feature_names] for r in features], dtype=float
+            )
+
+        preds: List[float] = []
+        for start in range(0, len(matrix), chunk_size):
+            records = [
+                {name: _json_value(v) for name, v in zip(self.feature_names, row)}
+                for row in matrix[start:start + chunk_size]
+            ]
+            preds.extend(self._request("POST", "/v1/predict_features", {"features": records})["predictions"])
+        return np.asarray(preds, dtype=float)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+def remote_model_from_env() -> Optional[RemoteEVEnergyModel]:
+    """RemoteEVEnergyModel si EV_INFERENCE_URL está definida, si no None."""
+    url = os.getenv(INFERENCE_URL_ENV)
+    return RemoteEVEnergyModel(url) if url else None
@@ -0,0 +1,193 @@
+"""Servicio HTTP local de inferencia con micro-batching.
+
+Uso:
+    python -m src.serving.inference_server --port 8600 --max-batch 64 --max-wait-ms 5
+
+Endpoints:
+    GET  /healthz              el proceso responde
+    GET  /readyz               200 cuando el modelo está cargado (503 mientras carga)
+    GET  /latency              latencias p50/p95/p99 y tamaño medio de lote
+    POST /v1/predict           {"sessions": [{battery_capacity_kwh, soc_start_pct,
+                                soc_end_pct, charging_duration_hours, vehicle_year?}, ...]}
+    POST /v1/predict_features  {"features": [{<SessionInfo.to_model_dict()>}, ...]}
+
+Ambos POST responden {"predictions": [...]} en el orden de entrada (null
+donde el modelo devuelve NaN). Las peticiones concurrentes se agrupan en
+una sola llamada a `EVEnergyModel.predict_many` (ver MicroBatcher).
+"""
+
+import argparse
+import json
+import math
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.core.session_completer import MODEL_FEATURE_NAMES, SessionCompleter
+from src.model.ev_model import EVEnergyModel, DEFAULT_REPO_ID
+from src.serving.batcher import MicroBatcher
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+REQUEST_TIMEOUT_S = 30.0
+
+
+class InferenceService:
+    """Modelo + micro-batcher, con carga en segundo plano para poder responder /readyz."""
+
+    def __init__(self, max_batch: int = 64, max_wait_ms: float = 5.0, **model_options):
+        self.model_options = model_options
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.session_completer = SessionCompleter()
+        self.model: Optional[EVEnergyModel] = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.load_error: Optional[str] = None
+        self._ready = threading.Event()
+
+    def load(self) -> None:
+        try:
+            self.model = EVEnergyModel(**self.model_options)
+            self.batcher = MicroBatcher(
+                lambda features: self.model.predict_many(features, chunk_size=len(features)),
+                max_batch=self.max_batch,
+                max_wait_ms=self.max_wait_ms,
+            )
+            self._ready.set()
+        except Exception as exc:
+            self.load_error = str(exc)
+            raise
+
+    def start_loading(self) -> threading.Thread:
+        thread = threading.Thread(target=self.load, name="ev-model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def feature_names(self) -> List[str]:
+        return (self.model.feature_names if self.model else None) or MODEL_FEATURE_NAMES
+
+    def features_from_sessions(self, sessions: List[Dict[str, Any]]) -> np.ndarray:
+        def column(name: str) -> List[Any]:
+            return [s.get(name) for s in sessions]
+
+        return self.session_completer.build_matrix_from_raw(
+            battery_capacity_kwh=column("battery_capacity_kwh"),
+            soc_start_pct=column("soc_start_pct"),
+            soc_end_pct=column("soc_end_pct"),
+            charging_duration_hours=column("charging_duration_hours"),
+            vehicle_year=column("vehicle_year"),
+            feature_names=self.feature_names,
+        )
+
+    def features_from_records(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        names = self.feature_names
+        return np.array([[r.get(name) for name in names] for r in records], dtype=float)
+
+    def predict(self, features: np.ndarray) -> List[Optional[float]]:
+        if self.batcher is None:
+            raise RuntimeError("El modelo aún no está listo")
+        # JSON no admite NaN: se envía null
+        return [
+            None if math.isnan(p) else p
+            for p in self.batcher.predict(features, timeout=REQUEST_TIMEOUT_S).tolist()
+        ]
+
+
+def make_handler(service: InferenceService):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            # Sin log por petición: las latencias se consultan en /latency
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._send(HTTPStatus.OK, {"status": "ok"})
+            elif self.path == "/readyz":
+                if service.ready:
+                    self._send(HTTPStatus.OK, {"ready": True, "feature_names": service.feature_names})
+                else:
+                    self._send(HTTPStatus.SERVICE_UNAVAILABLE,
+                               {"ready": False, "error": service.load_error})
+            elif self.path == "/latency":
+                stats = service.batcher.stats() if service.batcher else {}
+                self._send(HTTPStatus.OK, stats)
+            else:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"Ruta desconocida {self.path}"})
+
+        def do_POST(self):
+            if self.path not in ("/v1/predict", "/v1/predict_features"):
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"Ruta desconocida {self.path}"})
+                return
+            if not service.ready:
+                self._send(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "El modelo aún no está listo"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/v1/predict":
+                    features = service.features_from_sessions(payload["sessions"])
+                else:
+                    features = service.features_from_records(payload["features"])
+            except (KeyError, TypeError, ValueError) as exc:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": f"Petición inválida: {exc}"})
+                return
+
+            try:
+                predictions = service.predict(features) if len(features) else []
+            except Exception as exc:
+                self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(exc)})
+                return
+            self._send(HTTPStatus.OK, {"predictions": predictions})
+
+    return Handler
+
+
+def build_server(service: InferenceService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio HTTP local del modelo de energía EV.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=64, help="Filas máximas por llamada al modelo")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Espera máxima para completar un lote (ms)")
+    parser.add_argument("--repo-id", default=DEFAULT_REPO_ID)
+    args = parser.parse_args(argv)
+
+    service = InferenceService(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                               repo_id=args.repo_id)
+    service.start_loading()
+    server = build_server(service, args.host, args.port)
+    print(f"🚀 Servicio de inferencia en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
 import os
-import re
 import sys
-from typing import Optional, Tuple
 
 import streamlit as st
 
@@ -10,43 +8,22 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
+from src.core.resources import resources
 from src.pipeline.ev_pipeline import EVEnergyPipeline
+from src.core.text_parsing import extract_numbers_from_text as _extract_numbers_from_text
+from src.serving.client import remote_model_from_env
 
-# Instanciamos la pipeline (carga el modelo de Hugging Face)
-pipeline = EVEnergyPipeline()
+# La pipeline (carga el modelo de Hugging Face, o se conecta al servicio de
+# inferencia si EV_INFERENCE_URL está definida) se construye una sola vez por
+# proceso, en el primer uso. Streamlit vuelve a ejecutar este módulo en cada
+# rerun: se registra solo la primera vez
+if not resources.is_registered("ev_pipeline"):
+    resources.register("ev_pipeline", lambda: EVEnergyPipeline(model=remote_model_from_env()))
 
 
-def _extract_numbers_from_text(text: str) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float], Optional[int]]:
-    """
-    Extrae de forma sencilla algunos campos desde texto libre.
-
-    - Capacidad de batería en kWh -> número seguido de 'kWh'
-    - SoC inicio / fin           -> dos porcentajes
-    - Duración en horas          -> número seguido de 'h', 'hora', 'horas'
-    - Año del vehículo           -> año de 4 dígitos (20xx)
-    """
-    text_lower = text.lower()
-
-    # Capacidad de batería
-    batt_match = re.search(r"(\d+(?:[\.,]\d+)?)\s*kwh", text_lower)
-    battery_capacity = float(batt_match.group(1).replace(",", ".")) if batt_match else None
-
-    # SoC inicial y final
-    pct_matches = re.findall(r"(\d{1,3})\s*%", text_lower)
-    soc_start = soc_end = None
-    if len(pct_matches) >= 2:
-        soc_start = float(pct_matches[0])
-        soc_end = float(pct_matches[1])
-
-    # Duración en horas
-    dur_match = re.search(r"(\d+(?:[\.,]\d+)?)\s*(h|hora|horas)", text_lower)
-    duration_hours = float(dur_match.group(1).replace(",", ".")) if dur_match else None
-
-    # Año del vehículo (opcional)
-    year_match = re.search(r"(20\d{2})", text_lower)
-    vehicle_year = int(year_match.group(1)) if year_match else None
-
-    return battery_capacity, soc_start, soc_end, duration_hours, vehicle_year
+@st.cache_resource(show_spinner="Cargando el modelo de predicción...")
+def get_pipeline() -> EVEnergyPipeline:
+    return resources.get("ev_pipeline")
 
 
 def main():
@@ -91,7 +68,7 @@ def main():
             return
 
         try:
-            pred = pipeline.predict(
+            pred = get_pipeline().predict(
                 battery_capacity_kwh=battery_capacity,
                 soc_start_pct=soc_start,
                 soc_end_pct=soc_end,
@@ -7,7 +7,59 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from src.nlp.llm_ev_assistant import run_llm_assistant
+from src.core.resources import resources
+from src.core.telemetry import METRICS_PORT_ENV, configure_logging, metrics, start_metrics_server
+from src.nlp.conversation import ConversationState
+from src.nlp.llm_ev_assistant import get_ev_model, prompt_stats, stream_llm_assistant, warm_up
+from src.pipeline.ev_pipeline import EVEnergyPipeline
+
+
+@st.cache_resource(show_spinner="Cargando dataset, modelo y LLM...")
+def _warm_up_resources():
+    """Construye los recursos costosos una vez por proceso (no en cada rerun)."""
+    return warm_up()
+
+
+@st.cache_resource
+def _start_telemetry():
+    """Logging + endpoint /metrics (si EV_METRICS_PORT está definida), una vez por proceso."""
+    configure_logging()
+    port = os.getenv(METRICS_PORT_ENV)
+    return start_metrics_server(metrics, int(port)) if port else None
+
+
+@st.cache_resource
+def _sweep_pipeline() -> EVEnergyPipeline:
+    """Pipeline sobre el mismo modelo del asistente, para las variantes "¿y si...?"."""
+    return EVEnergyPipeline(model=get_ev_model())
+
+
+def _render_what_if(last: dict) -> None:
+    """Gráfico de energía predicha por SoC final y duración para el último vehículo."""
+    soc_start = last["soc_start_pct"]
+    with st.expander("🔀 ¿Y si...? (SoC final y duración)", expanded=False):
+        low = int(min(100, soc_start + 5))
+        soc_end_range = st.slider("SoC final (%)", low, 100, (low, 100), step=5)
+        base_hours = float(last["charging_duration_hours"])
+        hours = st.multiselect(
+            "Duraciones (horas)",
+            options=sorted({0.5, 1.0, 1.5, 2.0, 3.0, 4.0, base_hours}),
+            default=[base_hours],
+        )
+        if not hours:
+            st.info("Elige al menos una duración.")
+            return
+        table = _sweep_pipeline().sweep(
+            last["battery_capacity_kwh"],
+            soc_start_pct=soc_start,
+            soc_end_pct=range(soc_end_range[0], soc_end_range[1] + 1, 5),
+            charging_duration_hours=hours,
+            vehicle_year=last["vehicle_year"],
+        )
+        chart = table.pivot(index="soc_end_pct", columns="charging_duration_hours", values="predicted_energy_kwh")
+        chart.columns = [f"{h:g} h" for h in chart.columns]
+        st.line_chart(chart, x_label="SoC final (%)", y_label="Energía predicha (kWh)")
+        st.dataframe(table, hide_index=True)
 
 
 def main():
@@ -19,8 +71,19 @@ def main():
         "de predicción en Hugging Face para estimar la energía cargada."
     )
 
-    if "history" not in st.session_state:
+    _start_telemetry()
+    _warm_up_resources()
+    with st.sidebar.expander("⏱️ Recursos"):
+        st.json(resources.stats())
+    with st.sidebar.expander("📈 Latencia por etapa"):
+        st.json(metrics.snapshot())
+    with st.sidebar.expander("🧾 Tokens del prompt final"):
+        st.json(prompt_stats.snapshot())
+
+    if "history" not in st.session_state or st.sidebar.button("🆕 Nueva conversación"):
         st.session_state.history = []
+        # Datos de la sesión acumulados entre turnos (marca, SoC, duración...)
+        st.session_state.conversation = ConversationState()
 
     # Mostrar historial
     for role, msg in st.session_state.history:
@@ -36,9 +99,13 @@ def main():
         st.session_state.history.append(("user", user_msg))
         st.chat_message("user").markdown(user_msg)
 
-        with st.spinner("Pensando..."):
+        with st.chat_message("assistant"):
             try:
-                answer = run_llm_assistant(user_msg)
+                # Extracción + predicción (sin texto que mostrar todavía)
+                with st.spinner("Pensando..."):
+                    stream = stream_llm_assistant(user_msg, st.session_state.conversation)
+                # La explicación final se pinta a medida que llegan los tokens
+                answer = st.write_stream(stream)
             except Exception as exc:
                 answer = (
                     "Ocurrió un error al procesar tu mensaje:\n\n"
@@ -46,9 +113,17 @@ def main():
                     "Verifica que las variables de entorno HF_TOKEN y GROQ_API_KEY "
                     "estén configuradas y que EV-DB.csv existe en la carpeta data/."
                 )
+                st.markdown(answer)
 
         st.session_state.history.append(("assistant", answer))
-        st.chat_message("assistant").markdown(answer)
+
+    last = st.session_state.conversation.last_prediction
+    # La rejilla necesita margen por encima del SoC inicial
+    if last and last["soc_start_pct"] is not None and last["soc_start_pct"] <= 90:
+        _render_what_if(last)
+
+    with st.sidebar.expander("🧩 Datos de la conversación"):
+        st.json(st.session_state.conversation.snapshot())
 
 
 if __name__ == "__main__":
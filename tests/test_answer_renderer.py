@@ -0,0 +1,42 @@
+from src.nlp.answer_renderer import VARIANT_AB, VARIANT_LLM, VARIANT_TEMPLATE, AnswerRouter, render_prediction_answer
+
+
+def _result(prediction=48.6, energy=45.0):
+    return {
+        "mode": "predict",
+        "prediction": prediction,
+        "extracted": {"soc_start": 20, "soc_end": 80},
+        "vehicle_row": {"BRAND": "Kia", "MODEL": "EV6 GT", "MODEL.1": 2022},
+        "session_info": {
+            "Battery Capacity (kWh)": 75.0,
+            "SoC_diff": 60,
+            "Charging Duration (hours)": 1.5,
+            "Energy_est_SoC": energy,
+            "Charging_Rate": energy / 1.5,
+            "Charge_Efficiency": 0.92,
+            "Vehicle Age (years)": 4,
+        },
+    }
+
+
+def test_ab_variant_is_stable_within_a_conversation():
+    router = AnswerRouter(variant=VARIANT_AB, template_share=0.5)
+    result = _result()
+
+    for conversation_id in (f"conv-{i}" for i in range(20)):
+        variants = {router.variant_for(result, f"req-{n}", conversation_id) for n in range(10)}
+        assert len(variants) == 1
+
+    # Sin conversación, cada petición cae en su propia cubeta
+    variants = {router.variant_for(result, f"req-{n}") for n in range(50)}
+    assert variants == {VARIANT_LLM, VARIANT_TEMPLATE}
+
+
+def test_template_reports_only_the_numeric_difference():
+    above = render_prediction_answer(_result(prediction=48.6, energy=45.0))
+    below = render_prediction_answer(_result(prediction=42.3, energy=45.0))
+
+    assert "Diferencia con la energía estimada a partir del SoC: +3,6 kWh (+8 %)." in above
+    assert "Diferencia con la energía estimada a partir del SoC: -2,7 kWh (-6 %)." in below
+    for text in (above, below):
+        assert "pérdidas" not in text and "sesiones similares" not in text
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.serving.batcher import MicroBatcher
+
+
+class _RecordingModel:
+    """predict_fn que devuelve la primera columna y anota el tamaño de cada llamada."""
+
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def __call__(self, features):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append(len(features))
+        return features[:, 0].copy()
+
+
+def _rows(start, n):
+    return np.column_stack([np.arange(start, start + n, dtype=float), np.zeros(n)])
+
+
+def test_concurrent_submits_coalesce_into_one_call_in_input_order():
+    model = _RecordingModel()
+    batcher = MicroBatcher(model, max_batch=64, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(_rows(10 * i, 3)) for i in range(8)]
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.close()
+
+    assert model.calls == [24]
+    for i, preds in enumerate(results):
+        assert preds.tolist() == [10 * i, 10 * i + 1, 10 * i + 2]
+
+
+def test_batches_never_exceed_max_batch():
+    gate = threading.Event()
+    model = _RecordingModel(gate)
+    batcher = MicroBatcher(model, max_batch=8, max_wait_ms=50)
+    try:
+        # El primer lote queda retenido en el modelo mientras se encola el resto
+        first = batcher.submit(_rows(0, 1))
+        futures = [batcher.submit(_rows(100 * i, n)) for i, n in enumerate([5, 5, 3, 20], start=1)]
+        gate.set()
+        results = [f.result(timeout=5) for f in [first] + futures]
+    finally:
+        batcher.close()
+
+    assert max(model.calls) <= 8 and sum(model.calls) == 34
+    assert results[4].tolist() == list(range(400, 420))
+
+
+def test_prediction_count_mismatch_fails_the_batch():
+    batcher = MicroBatcher(lambda features: np.zeros(len(features) - 1), max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError, match="predicciones"):
+            batcher.predict(_rows(0, 3), timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_many_threads_get_their_own_rows():
+    batcher = MicroBatcher(_RecordingModel(), max_batch=16, max_wait_ms=2)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda i: batcher.predict(_rows(i * 10, 1 + i % 4), timeout=5), range(200)))
+    finally:
+        batcher.close()
+
+    for i, preds in enumerate(results):
+        assert preds.tolist() == list(range(i * 10, i * 10 + 1 + i % 4))
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from src.core.resources import resources
+from src.model.ev_model import EVEnergyModel
+from src.nlp.conversation import ConversationState
+
+
+STUB_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "stub_snapshot")
+
+
+def _state(**slots):
+    state = ConversationState()
+    state.merge(slots)
+    state._resolution_key = ("tesla", "model 3", 2021)
+    state._resolution = ({"BRAND": "Tesla"}, [])
+    return state
+
+
+def test_merge_clears_vehicle_slots_when_vehicle_changes():
+    state = _state(brand="Tesla", model="Model 3", year=2021, battery_capacity_kwh=60.0, soc_start=20)
+
+    changed = state.merge({"brand": "Kia", "model": "EV6", "soc_start": 10, "soc_end": 90, "duration_hours": 2})
+
+    assert state.slots["year"] is None
+    assert state.slots["battery_capacity_kwh"] is None
+    assert state.slots["brand"] == "Kia" and state.slots["soc_start"] == 10
+    assert state._resolution is None and state._resolution_key is None
+    assert {"year", "battery_capacity_kwh", "brand", "model"} <= set(changed)
+
+
+def test_merge_keeps_vehicle_slots_for_same_vehicle():
+    state = _state(brand="Kia", model="EV6 Long Range AWD", year=2022, battery_capacity_kwh=77.4)
+
+    state.merge({"brand": "kia", "model": "ev6", "soc_end": 90})
+
+    assert state.slots["year"] == 2022
+    assert state.slots["battery_capacity_kwh"] == 77.4
+    assert state._resolution is not None
+
+
+def test_merge_applies_new_vehicle_details_from_the_same_message():
+    state = _state(brand="Tesla", model="Model 3", year=2021, battery_capacity_kwh=60.0)
+
+    state.merge({"brand": "Kia", "model": "EV6", "year": 2023})
+
+    assert state.slots["year"] == 2023
+    assert state.slots["battery_capacity_kwh"] is None
+
+
+def test_record_result_takes_last_prediction_from_the_predicted_inputs():
+    state = ConversationState()
+    raw_inputs = {
+        "battery_capacity_kwh": 77.4,
+        "soc_start_pct": 20,
+        "soc_end_pct": 80,
+        "charging_duration_hours": 1.5,
+        "vehicle_year": 2022,
+    }
+
+    state.record_result({
+        "mode": "predict",
+        "prediction": 41.2,
+        "vehicle_row": {"BRAND": "Kia"},
+        # Lo extraído del último mensaje no cuenta: la capacidad salió de EV-DB
+        "extracted": {"battery_capacity_kwh": None, "soc_start": 35, "soc_end": 90},
+        "session_info": {"Battery Capacity (kWh)": 77.4, "SoC_diff": 60},
+        "raw_inputs": raw_inputs,
+    })
+
+    assert state.last_prediction == dict(raw_inputs, prediction=41.2)
+
+
+def test_capacity_or_soc_diff_satisfy_the_requirements():
+    state = ConversationState()
+    state.merge({"soc_start": 20, "soc_end": 80})
+    assert state.missing == ["brand", "model", "duration_hours"]
+
+    state.merge({"battery_capacity_kwh": 75.0, "duration_hours": 2})
+    assert state.complete
+
+    # La diferencia de SoC sustituye al inicial/final (y al revés)
+    state.merge({"soc_diff": 50})
+    assert (state.slots["soc_start"], state.slots["soc_end"]) == (None, None) and state.complete
+    state.merge({"soc_start": 10, "soc_end": 70})
+    assert state.slots["soc_diff"] is None and state.complete
+
+
+@pytest.fixture
+def assistant(monkeypatch):
+    resources.override("ev_model", EVEnergyModel(local_dir=STUB_SNAPSHOT_DIR, surrogate=False))
+    from src.nlp import llm_ev_assistant
+
+    def no_llm(user_msg):
+        raise AssertionError(f"no debe llamar al LLM: {user_msg!r}")
+
+    monkeypatch.setattr(llm_ev_assistant, "_llm_extract", no_llm)
+    return llm_ev_assistant
+
+
+def test_capacity_only_follow_up_completes_without_llm(assistant):
+    # Primer turno ya aplicado: el año y el SoC, sin vehículo ni duración
+    state = ConversationState()
+    state.merge({"year": 2022, "soc_start": 20, "soc_end": 80})
+
+    assert assistant._apply_local_turn("75 kWh, 2 horas", state) is False
+    assert state.complete
+
+    result = assistant._finish_conversation_turn(state)
+    assert result["mode"] == "predict"
+    assert result["raw_inputs"]["battery_capacity_kwh"] == 75.0
+    assert result["raw_inputs"]["charging_duration_hours"] == 2
+
+
+def test_answers_to_age_and_soc_diff_questions_are_kept(assistant):
+    state = ConversationState()
+    state.merge({"battery_capacity_kwh": 75.0, "duration_hours": 2, "soc_diff": 60})
+
+    assert assistant._apply_local_turn("tiene 3 años", state) is False
+    assert state.slots["vehicle_age_years"] == 3
+
+    result = assistant._finish_conversation_turn(state)
+    assert result["mode"] == "predict"
+    assert result["session_info"]["SoC_diff"] == 60
+    assert result["session_info"]["Vehicle Age (years)"] == 3
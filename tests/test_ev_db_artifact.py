@@ -0,0 +1,121 @@
+import json
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from src.core import ev_db_artifact
+from src.core.ev_db_artifact import META_NAME, INDEX_NAME, build_artifact, is_fresh, load_artifact
+
+
+ROWS = [
+    ("Tesla", "Model 3 Long Range AWD", 2021, 75.0),
+    ("Kia", "EV6 Long Range AWD", 2022, 77.4),
+    ("Hyundai", "Kona Electric", 2019, 64.0),
+]
+
+
+def _write(path, rows):
+    pd.DataFrame(rows, columns=["BRAND", "MODEL", "MODEL.1", "BATT_CAPACITY"]).to_csv(path, index=False)
+
+
+def _bump_mtime(path):
+    info = os.stat(path)
+    os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "EV-DB.csv")
+    _write(path, ROWS)
+    return path
+
+
+@pytest.fixture
+def sha256_calls(monkeypatch):
+    calls = []
+    real = ev_db_artifact._sha256
+
+    def counting(path):
+        calls.append(path)
+        return real(path)
+
+    monkeypatch.setattr(ev_db_artifact, "_sha256", counting)
+    return calls
+
+
+def test_mtime_only_change_is_revalidated_by_sha256(csv_path, sha256_calls):
+    artifact_dir = build_artifact(csv_path)
+    sha256_calls.clear()
+
+    # Tamaño y mtime iguales: no se hashea
+    assert is_fresh(csv_path) and sha256_calls == []
+
+    # Solo cambia el mtime (p. ej. un checkout): se confirma por sha256 y se guarda la huella nueva
+    _bump_mtime(csv_path)
+    assert is_fresh(csv_path) and len(sha256_calls) == 1
+    with open(os.path.join(artifact_dir, META_NAME), encoding="utf-8") as fh:
+        assert json.load(fh)["source"]["mtime_ns"] == os.stat(csv_path).st_mtime_ns
+    assert is_fresh(csv_path) and len(sha256_calls) == 1
+
+
+def test_content_change_makes_the_artifact_stale(csv_path, sha256_calls):
+    build_artifact(csv_path)
+    sha256_calls.clear()
+
+    # Mismo tamaño, otro contenido: solo el sha256 lo detecta
+    _write(csv_path, [ROWS[0], ("Kia", "EV6 Long Range RWD", 2022, 77.4), ROWS[2]])
+    _bump_mtime(csv_path)
+    assert not is_fresh(csv_path) and len(sha256_calls) == 1
+
+    # Otro tamaño: obsoleto sin hashear
+    sha256_calls.clear()
+    _write(csv_path, ROWS[:2])
+    assert not is_fresh(csv_path) and sha256_calls == []
+
+    artifact = load_artifact(csv_path)
+    assert len(artifact.frame) == 2 and is_fresh(csv_path)
+
+
+def test_rebuild_swaps_the_whole_directory(csv_path):
+    artifact_dir = build_artifact(csv_path)
+
+    _write(csv_path, ROWS + [("Kia", "EV9", 2024, 99.8)])
+    assert build_artifact(csv_path) == artifact_dir
+
+    parent = os.path.dirname(artifact_dir)
+    assert sorted(os.listdir(parent)) == ["EV-DB.csv", os.path.basename(artifact_dir)]
+    artifact = load_artifact(csv_path, rebuild=False)
+    assert artifact.meta["rows"] == 4 and len(artifact.vehicle_index()) == 4
+
+
+def test_failed_build_keeps_the_previous_artifact(csv_path, monkeypatch):
+    artifact_dir = build_artifact(csv_path)
+
+    def failing_dump(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    _write(csv_path, ROWS[:2])
+    monkeypatch.setattr(pickle, "dump", failing_dump)
+    with pytest.raises(OSError):
+        build_artifact(csv_path)
+
+    parent = os.path.dirname(artifact_dir)
+    assert sorted(os.listdir(parent)) == ["EV-DB.csv", os.path.basename(artifact_dir)]
+    with open(os.path.join(artifact_dir, META_NAME), encoding="utf-8") as fh:
+        assert json.load(fh)["rows"] == len(ROWS)
+
+
+def test_untrusted_pickle_is_not_loaded(csv_path, monkeypatch):
+    artifact = load_artifact(csv_path)
+    os.chmod(os.path.join(artifact.artifact_dir, INDEX_NAME), 0o666)
+
+    def no_unpickling(*args, **kwargs):
+        raise AssertionError("no debe deserializar un pickle que otros pueden escribir")
+
+    monkeypatch.setattr(pickle, "load", no_unpickling)
+    index = artifact.vehicle_index()
+
+    assert len(index) == len(ROWS)
+    assert index.row(index.lookup("kia", "ev6 long range awd")[0])["BATT_CAPACITY"] == 77.4
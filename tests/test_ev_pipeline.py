@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.model.ev_model import EVEnergyModel
+from src.pipeline import ev_pipeline
+from src.pipeline.ev_pipeline import EVEnergyPipeline
+
+
+STUB_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "stub_snapshot")
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return EVEnergyPipeline(model=EVEnergyModel(local_dir=STUB_SNAPSHOT_DIR, surrogate=False))
+
+
+def test_sweep_drops_invalid_and_nan_points(pipeline):
+    table = pipeline.sweep(
+        75.0,
+        soc_start_pct=[-5, 20, np.nan],
+        soc_end_pct=[10, 80, 120, np.nan],
+        charging_duration_hours=[0, 1.5, np.nan],
+        vehicle_year=2022,
+    )
+
+    # Solo (20, 80, 1.5) es posible: SoC < 0, final <= inicial, > 100, duración <= 0 y NaN se descartan
+    assert table[["soc_start_pct", "soc_end_pct", "charging_duration_hours"]].values.tolist() == [[20, 80, 1.5]]
+    assert not table.isna().any().any()
+
+
+def test_sweep_without_valid_points_raises(pipeline):
+    with pytest.raises(ValueError, match="Ninguna combinación"):
+        pipeline.sweep(75.0, soc_start_pct=80, soc_end_pct=[50, np.nan], charging_duration_hours=1.0)
+
+
+def test_sweep_rejects_grids_above_the_limit(pipeline, monkeypatch):
+    monkeypatch.setattr(ev_pipeline, "MAX_SWEEP_POINTS", 11)
+
+    with pytest.raises(ValueError, match="máximo 11"):
+        pipeline.sweep(75.0, soc_start_pct=20, soc_end_pct=[60, 70, 80, 90], charging_duration_hours=[1, 2, 3])
+
+
+def test_sweep_single_point_matches_predict(pipeline):
+    table = pipeline.sweep(75.0, soc_start_pct=20, soc_end_pct=80, charging_duration_hours=1.5, vehicle_year=2022)
+
+    expected = pipeline.predict(75.0, 20, 80, 1.5, vehicle_year=2022)
+    assert len(table) == 1
+    assert table["predicted_energy_kwh"].iloc[0] == pytest.approx(expected)
+    assert table["soc_diff"].iloc[0] == 60
+    assert table["energy_est_soc_kwh"].iloc[0] == pytest.approx(45.0)
+    assert table["charging_rate_kw"].iloc[0] == pytest.approx(30.0)
+
+
+def test_sweep_grid_matches_pointwise_predictions(pipeline):
+    table = pipeline.sweep(64.0, soc_start_pct=10, soc_end_pct=[50, 90], charging_duration_hours=[0.5, 2])
+
+    expected = [
+        pipeline.predict(64.0, 10, end, duration)
+        for end, duration in zip(table["soc_end_pct"], table["charging_duration_hours"])
+    ]
+    assert len(table) == 4
+    assert table["predicted_energy_kwh"].tolist() == pytest.approx(expected)
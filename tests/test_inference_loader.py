@@ -0,0 +1,59 @@
+import os
+import sys
+import textwrap
+
+import pytest
+
+from src.model.inference_loader import load_inference_module
+
+
+def _write(directory, name, source):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as fh:
+        fh.write(textwrap.dedent(source))
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    _write(tmp_path, "utils.py", """
+        SCALE = 2.0
+    """)
+    _write(tmp_path, "weights.txt", "3.0")
+    os.makedirs(tmp_path / "models")
+    _write(tmp_path / "models", "bias.txt", "1.0")
+    _write(tmp_path, "inference.py", """
+        import os
+        import utils
+
+        def _read(path):
+            with open(path) as fh:
+                return float(fh.read())
+
+        WEIGHT = _read("weights.txt")
+        BIAS = _read(os.path.join(SNAPSHOT_DIR, "models", "bias.txt"))
+
+        def predict(session_info):
+            from utils import SCALE  # import diferido, después de cargar
+            return [session_info["x"] * WEIGHT * SCALE * utils.SCALE + BIAS]
+
+        def get_feature_names():
+            return ["x"]
+    """)
+    return str(tmp_path)
+
+
+def test_loads_siblings_and_relative_files(snapshot):
+    module = load_inference_module(snapshot)
+    assert module.predict({"x": 1.0}) == [13.0]
+    assert module.__file__ == os.path.join(os.path.realpath(snapshot), "inference.py")
+    assert load_inference_module(snapshot) is module
+
+
+def test_sibling_is_not_shadowed_by_global_module(snapshot, monkeypatch):
+    shadow = type(sys)("utils")
+    shadow.SCALE = 100.0
+    monkeypatch.setitem(sys.modules, "utils", shadow)
+
+    module = load_inference_module(snapshot)
+
+    assert module.predict({"x": 1.0}) == [13.0]
+    assert sys.modules["utils"] is shadow
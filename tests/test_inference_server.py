@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from src.serving.batcher import MicroBatcher
+from src.serving.inference_server import InferenceService, build_server
+
+
+STUB_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "stub_snapshot")
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(service):
+        server = build_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _call(url, payload=None):
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def test_readyz_is_503_until_the_model_loads(serve):
+    service = InferenceService(max_wait_ms=1, local_dir=STUB_SNAPSHOT_DIR, surrogate=False)
+    url = serve(service)
+
+    assert _call(url + "/readyz")[0] == 503
+    session = {"battery_capacity_kwh": 75, "soc_start_pct": 20, "soc_end_pct": 80,
+               "charging_duration_hours": 1.5, "vehicle_year": 2022}
+    assert _call(url + "/v1/predict", {"sessions": [session]})[0] == 503
+
+    service.load()
+
+    status, body = _call(url + "/readyz")
+    assert status == 200 and body["ready"] is True
+    status, body = _call(url + "/v1/predict", {"sessions": [session, dict(session, soc_end_pct=90)]})
+    assert status == 200 and len(body["predictions"]) == 2
+    service.batcher.close()
+
+
+def test_nan_predictions_are_sent_as_null(serve):
+    service = InferenceService()
+    service.batcher = MicroBatcher(
+        lambda features: np.where(features[:, 0] > 0, features[:, 0], np.nan), max_wait_ms=1,
+    )
+    service._ready.set()
+    url = serve(service)
+
+    names = service.feature_names
+    records = [dict.fromkeys(names, 0.0), dict.fromkeys(names, 2.5)]
+    status, body = _call(url + "/v1/predict_features", {"features": records})
+
+    assert status == 200 and body["predictions"] == [None, 2.5]
+    service.batcher.close()
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.stub_llm_server import StubLLMBehaviour, build_server
+from src.nlp.llm_client import (
+    CircuitOpenError,
+    LLMClientConfig,
+    LLMUnavailableError,
+    build_groq_chat_model,
+    loop_http_async_client,
+)
+
+
+ANSWER = "Se estiman unos 30 kWh para esta sesión."
+MESSAGES = [HumanMessage(content="¿Cuánta energía cargo?")]
+
+
+class ConcurrencyProbe(StubLLMBehaviour):
+    """Stub que mide cuántas peticiones atiende a la vez."""
+
+    def __init__(self, hold_s: float, **kwargs):
+        super().__init__(**kwargs)
+        self.hold_s = hold_s
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def reply(self, messages):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.hold_s)
+        with self._lock:
+            self.in_flight -= 1
+        return super().reply(messages)
+
+
+@pytest.fixture
+def stub_llm():
+    servers = []
+
+    def start(behaviour, **config):
+        server = build_server(behaviour, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        options = {"backoff_base_s": 0.01, "backoff_max_s": 0.05, **config}
+        config = LLMClientConfig(base_url=f"http://127.0.0.1:{server.server_address[1]}", **options)
+        return build_groq_chat_model("stub-model", "stub", config)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_invoke_returns_the_stub_answer(stub_llm):
+    llm = stub_llm(StubLLMBehaviour(answer=ANSWER))
+    assert llm.invoke(MESSAGES).content == ANSWER
+    assert llm.breaker_state == "closed"
+
+
+@pytest.mark.parametrize("rate_limit", [False, True])
+def test_transient_errors_are_retried(stub_llm, rate_limit):
+    behaviour = StubLLMBehaviour(answer=ANSWER, fail_first=2, rate_limit=rate_limit)
+    llm = stub_llm(behaviour, max_retries=2)
+    assert llm.invoke(MESSAGES).content == ANSWER
+    assert behaviour.requests == 3
+
+
+def test_retries_exhausted_raise_unavailable(stub_llm):
+    behaviour = StubLLMBehaviour(fail_rate=1.0)
+    llm = stub_llm(behaviour, max_retries=1)
+    with pytest.raises(LLMUnavailableError):
+        llm.invoke(MESSAGES)
+    assert behaviour.requests == 2
+
+
+def test_deadline_covers_the_whole_call(stub_llm):
+    llm = stub_llm(StubLLMBehaviour(latency_s=1.0), timeout_s=0.3, max_retries=5)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        llm.invoke(MESSAGES)
+    assert time.monotonic() - start < 0.9
+
+
+def test_async_deadline_covers_the_whole_call(stub_llm):
+    llm = stub_llm(StubLLMBehaviour(latency_s=1.0), timeout_s=0.3, max_retries=5)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(llm.ainvoke(MESSAGES))
+    assert time.monotonic() - start < 0.9
+
+
+def test_semaphore_bounds_concurrent_calls(stub_llm):
+    behaviour = ConcurrencyProbe(hold_s=0.1, answer=ANSWER)
+    llm = stub_llm(behaviour, max_concurrency=2)
+    threads = [threading.Thread(target=llm.invoke, args=(MESSAGES,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert behaviour.requests == 6
+    assert behaviour.max_in_flight == 2
+
+
+def test_breaker_opens_and_resets_after_half_open_probe(stub_llm):
+    behaviour = StubLLMBehaviour(answer=ANSWER, fail_rate=1.0)
+    llm = stub_llm(behaviour, max_retries=0, breaker_failures=2, breaker_reset_s=0.2)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            llm.invoke(MESSAGES)
+    assert llm.breaker_state == "open"
+
+    # Abierto: falla al instante sin llegar al servidor
+    with pytest.raises(CircuitOpenError):
+        llm.invoke(MESSAGES)
+    assert behaviour.requests == 2
+
+    # La prueba half-open fallida vuelve a abrirlo
+    time.sleep(0.25)
+    with pytest.raises(LLMUnavailableError):
+        llm.invoke(MESSAGES)
+    assert llm.breaker_state == "open"
+
+    behaviour.fail_rate = 0.0
+    time.sleep(0.25)
+    assert llm.invoke(MESSAGES).content == ANSWER
+    assert llm.breaker_state == "closed"
+
+
+def test_stream_yields_the_answer_and_releases_the_permit(stub_llm):
+    llm = stub_llm(StubLLMBehaviour(answer=ANSWER), max_concurrency=1)
+    chunks = [chunk.content for chunk in llm.stream(MESSAGES)]
+    assert len(chunks) > 1
+    assert "".join(chunks) == ANSWER
+    # Con un único permiso, una segunda llamada solo pasa si el stream lo liberó
+    assert llm.invoke(MESSAGES).content == ANSWER
+
+
+def test_stream_retries_until_the_first_chunk(stub_llm):
+    behaviour = StubLLMBehaviour(answer=ANSWER, fail_first=1)
+    llm = stub_llm(behaviour, max_retries=1)
+    assert "".join(chunk.content for chunk in llm.stream(MESSAGES)) == ANSWER
+    assert behaviour.requests == 2
+
+
+def test_astream_yields_the_answer_and_releases_the_permit(stub_llm):
+    llm = stub_llm(StubLLMBehaviour(answer=ANSWER, fail_first=1), max_concurrency=1, max_retries=1)
+
+    async def run():
+        chunks = [chunk.content async for chunk in llm.astream(MESSAGES)]
+        reply = await llm.ainvoke(MESSAGES)
+        return chunks, reply.content
+
+    chunks, reply = asyncio.run(run())
+    assert "".join(chunks) == ANSWER
+    assert reply == ANSWER
+
+
+def test_async_client_is_created_per_event_loop(stub_llm):
+    llm = stub_llm(StubLLMBehaviour(answer=ANSWER))
+    config = llm.config
+
+    async def run():
+        first = await llm.ainvoke(MESSAGES)
+        second = await llm.ainvoke(MESSAGES)
+        assert first.content == second.content == ANSWER
+        return llm._async_inner(), loop_http_async_client(config.max_connections, config.attempt_timeout_s)
+
+    # Cada asyncio.run cierra su loop: el segundo no puede reutilizar el cliente del primero
+    inner_a, client_a = asyncio.run(run())
+    inner_b, client_b = asyncio.run(run())
+    assert inner_a is not inner_b
+    assert client_a is not client_b
+    assert inner_a is not llm.inner
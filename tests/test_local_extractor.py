@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from src.core.vehicle_index import VehicleIndex, normalize_text
+from src.nlp.local_extractor import LocalExtractor, parse_duration
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    df = pd.DataFrame({
+        "BRAND": ["Tesla", "Kia"],
+        "MODEL": ["Model 3 Long Range AWD", "EV6 Long Range AWD"],
+        "MODEL.1": [2021, 2022],
+        "BATT_CAPACITY": [75.0, 77.4],
+    })
+    return LocalExtractor(VehicleIndex(df))
+
+
+@pytest.mark.parametrize("text, hours", [
+    ("en 1.5 horas", 1.5),
+    ("en 1,5 h", 1.5),
+    ("en 1h30", 1.5),
+    ("1 h 30 min", 1.5),
+    ("en 2 horas y 15 min", 2.25),
+    ("2 horas y media", 2.5),
+    ("1 hora y cuarto", 1.25),
+    ("90 minutos", 1.5),
+])
+def test_parse_duration(text, hours):
+    assert parse_duration(normalize_text(text)) == (pytest.approx(hours), False)
+
+
+@pytest.mark.parametrize("text", [
+    "45 min y 1 h",
+    "2 horas y tres cuartos",
+    "en 2 horas y 20 mas",
+])
+def test_parse_duration_marks_unread_continuations_as_ambiguous(text):
+    assert parse_duration(normalize_text(text))[1] is True
+
+
+def test_parse_duration_ignores_years():
+    assert parse_duration(normalize_text("Tesla 2021 hasta el 80%")) == (None, False)
+
+
+@pytest.mark.parametrize("message, hours", [
+    ("Tesla Model 3 2021 del 20% al 80% en 1h30", 1.5),
+    ("Kia EV6 del 10% al 90% en 2 horas y media", 2.5),
+])
+def test_extract_reads_compound_durations(extractor, message, hours):
+    result = extractor.extract(message)
+    assert result.complete
+    assert result.fields["duration_hours"] == pytest.approx(hours)
+
+
+def test_extract_sends_mixed_durations_to_llm(extractor):
+    result = extractor.extract("Kia EV6 del 10% al 90% en 45 min y 1 h")
+    assert not result.complete
+    assert "duration_hours" in result.ambiguous
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from src.core.session_completer import SessionCompleter
+from src.model.prediction_cache import PredictionCache
+
+
+def _session(batt=75.0, soc_start=20.0, soc_end=80.0, duration=1.5, year=2022, efficiency=None):
+    completer = SessionCompleter(current_year=2026)
+    session = completer.build_from_raw(
+        battery_capacity_kwh=batt,
+        soc_start_pct=soc_start,
+        soc_end_pct=soc_end,
+        charging_duration_hours=duration,
+        vehicle_year=year,
+    ).to_model_dict()
+    if efficiency is not None:
+        session["Charge_Efficiency"] = efficiency
+    return session
+
+
+def test_without_quantum_keys_are_exact():
+    cache = PredictionCache(16)
+
+    assert cache.make_key(_session()) == cache.make_key(_session())
+    assert cache.make_key(_session(batt=75.0)) != cache.make_key(_session(batt=75.01))
+
+
+def test_capacity_quantum_does_not_merge_other_features():
+    cache = PredictionCache(16, quantum={"Battery Capacity (kWh)": 5.0, "Energy_per_SoC": 0.05})
+
+    base = cache.make_key(_session(batt=75.0))
+    near = dict(cache.make_key(_session(batt=76.0)))
+    # Capacidad y Energy_per_SoC caen en la misma cubeta...
+    assert near["Battery Capacity (kWh)"] == dict(base)["Battery Capacity (kWh)"]
+    assert near["Energy_per_SoC"] == dict(base)["Energy_per_SoC"]
+    # ...pero la duración, la eficiencia, la edad y las features sin cubeta siguen exactas
+    assert cache.make_key(_session(duration=1.6)) != base
+    assert cache.make_key(_session(efficiency=0.9)) != base
+    assert cache.make_key(_session(year=2021)) != base
+    assert cache.make_key(_session(batt=76.0)) != base  # Energy_est_SoC cambia y no tiene cubeta
+
+
+def test_quantized_sessions_share_an_entry():
+    quantum = {
+        "Battery Capacity (kWh)": 1.0,
+        "Energy_per_SoC": 0.01,
+        "Energy_est_SoC": 1.0,
+        "Charging_Rate": 1.0,
+        "Power_proxy": 1.0,
+    }
+    cache = PredictionCache(16, quantum=quantum)
+
+    cache.put(cache.make_key(_session(batt=75.0)), [40.0])
+
+    assert cache.get(cache.make_key(_session(batt=75.2))) == [40.0]
+    assert cache.get(cache.make_key(_session(batt=75.2, efficiency=0.8))) is None
+
+
+def test_quantum_rejects_discrete_or_unknown_features():
+    with pytest.raises(ValueError):
+        PredictionCache(16, quantum={"Charge_Efficiency": 0.1})
+    with pytest.raises(ValueError):
+        PredictionCache(16, quantum={"Vehicle Age (years)": 1.0})
+    with pytest.raises(ValueError):
+        PredictionCache(16, quantum={"Battery Capacity (kWh)": 0})
+
+
+def test_concurrent_get_and_put():
+    cache = PredictionCache(64)
+    keys = [cache.make_key(_session(batt=40.0 + i)) for i in range(100)]
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(2000):
+                key = keys[(i + offset) % len(keys)]
+                value = cache.get(key)
+                if value is None:
+                    cache.put(key, [float(keys.index(key))])
+                elif value != [float(keys.index(key))]:
+                    errors.append((key, value))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(n * 7,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cache.stats()
+    assert errors == []
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+    assert stats["size"] <= 64
+    # Dos hilos pueden fallar a la vez en la misma clave: el segundo put reemplaza, no expulsa
+    assert stats["evictions"] <= stats["misses"] - stats["size"]
+
@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.model.surrogate import DEFAULT_EFFICIENCY, SurrogateGrid, load_or_build
+
+
+def _grid():
+    axes = [np.array([0.0, 1.0])] * 4
+    return SurrogateGrid(axes, np.zeros((2, 2, 2, 2)))
+
+
+def test_load_or_build_without_table_and_build_disabled(tmp_path):
+    def predict_fn(matrix):
+        raise AssertionError("no debe evaluar el modelo")
+
+    grid = load_or_build(predict_fn, "abc", path=str(tmp_path / "missing.npz"), build_missing=False)
+
+    assert grid is None
+
+
+def test_load_or_build_reuses_a_table_of_the_same_snapshot(tmp_path):
+    path = str(tmp_path / "table.npz")
+    grid = _grid()
+    grid.meta["model_fingerprint"] = "abc"
+    grid.save(path)
+
+    loaded = load_or_build(lambda m: np.zeros(len(m)), "abc", path=path, build_missing=False)
+
+    assert loaded is not None and loaded.values.shape == (2, 2, 2, 2)
+    assert load_or_build(lambda m: np.zeros(len(m)), "other", path=path, build_missing=False) is None
+
+
+def _frame(batt, n):
+    soc_diff, duration = 0.5, 0.5
+    energy_est = soc_diff * batt / 100.0
+    return pd.DataFrame({
+        "Battery Capacity (kWh)": [batt] * n,
+        "SoC_diff": [soc_diff] * n,
+        "Charging Duration (hours)": [duration] * n,
+        "Vehicle Age (years)": [0.5] * n,
+        "Energy_est_SoC": [energy_est] * n,
+        "Charging_Rate": [energy_est / duration] * n,
+        "Power_proxy": [energy_est / duration] * n,
+        "Charge_Efficiency": [DEFAULT_EFFICIENCY] * n,
+        "Energy_per_SoC": [batt / 100.0] * n,
+    })
+
+
+def test_hit_and_fallback_counters_are_exact_across_threads():
+    grid = _grid()
+    # Capacidad 0.5 cae dentro de la rejilla [0, 1]; 5.0 queda fuera
+    inside, outside = _frame(0.5, 10), _frame(5.0, 10)
+    session = inside.iloc[0].to_dict()
+
+    def work():
+        for _ in range(200):
+            grid.predict_frame(inside)
+            grid.predict_frame(outside)
+            grid.predict_session(session)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = grid.stats()
+    assert stats["hits"] == 8 * 200 * 11
+    assert stats["fallbacks"] == 8 * 200 * 10
@@ -0,0 +1,108 @@
+import pandas as pd
+
+from src.core.vehicle_index import VehicleIndex
+
+
+COLUMNS = ["BRAND", "MODEL", "MODEL.1", "BATT_CAPACITY"]
+
+BASE_ROWS = [
+    ("Tesla", "Model 3 Long Range AWD", 2021, 75.0),
+    ("Tesla", "Model 3 Standard Range", 2021, 55.0),
+    ("Tesla", "Model Y Performance", 2022, 75.0),
+    ("Kia", "EV6 Long Range AWD", 2022, 77.4),
+    ("Kia", "Niro EV", 2020, 64.0),
+    ("Hyundai", "Ioniq 5 Long Range", 2022, 72.6),
+    ("Hyundai", "Kona Electric", 2019, 64.0),
+    ("Renault", "Zoe R135", 2020, 52.0),
+]
+
+QUERIES = [
+    ("tesla", "model 3 long range awd"),
+    ("tesla", "model 3"),
+    ("tesla", "model y"),
+    ("kia", "ev6"),
+    ("kia", "niro ev"),
+    ("hyundai", "ioniq 5"),
+    ("hyund", "kona"),
+    ("volkswagen", "id.3"),
+    ("polestar", "polestar 2 long range"),
+    ("renault", "zoe"),
+    ("bmw", "i4 edrive40"),
+    ("xx", "long range"),
+]
+
+
+def _row_key(index, row_id):
+    if row_id is None:
+        return None
+    row = index.row(row_id)
+    return row["BRAND"], row["MODEL"], row["MODEL.1"]
+
+
+def _observed(index):
+    """Resultados de todas las consultas, con filas por contenido (los row_id difieren)."""
+    lookups = {}
+    searches = {}
+    for brand, model in QUERIES:
+        row_id, stage = index.lookup(brand, model)
+        lookups[(brand, model)] = (_row_key(index, row_id), stage)
+        searches[(brand, model)] = [
+            (_row_key(index, c.row_id), c.score, c.similarity) for c in index.search(brand, model, k=3)
+        ]
+    capacity = {
+        (kwh, year): [(_row_key(index, c.row_id), c.score) for c in index.by_capacity(kwh, 5.0, year=year)]
+        for kwh in (55.0, 64.0, 75.0, 100.0)
+        for year in (None, 2021, 2022)
+    }
+    models = {b: index.model_names(b) for b in index.brand_names()}
+    return {
+        "len": len(index),
+        "rows": [_row_key(index, row_id) for row_id, _ in index.iter_rows()],
+        "brands": index.brand_names(),
+        "models": models,
+        "lookups": lookups,
+        "searches": searches,
+        "capacity": capacity,
+    }
+
+
+def _record(row):
+    return dict(zip(COLUMNS, row))
+
+
+def test_with_changes_matches_a_fresh_index_on_the_same_rows():
+    base = VehicleIndex(pd.DataFrame(BASE_ROWS, columns=COLUMNS))
+    row_ids = {row[:3]: row_id for row_id, row in enumerate(BASE_ROWS)}
+
+    added = [
+        ("Volkswagen", "ID.3 Pro S", 2023, 77.0),
+        ("Polestar", "Polestar 2 Long Range Dual Motor", 2023, 78.0),
+        ("Tesla", "Model 3 Long Range AWD", 2023, 78.1),
+    ]
+    changed = {("Tesla", "Model 3 Standard Range", 2021): ("Tesla", "Model 3 Standard Range", 2021, 57.5)}
+    # Renault desaparece entero; de Hyundai queda una fila
+    removed = {("Renault", "Zoe R135", 2020), ("Hyundai", "Ioniq 5 Long Range", 2022)}
+
+    changes = {row_ids[key]: _record(row) for key, row in changed.items()}
+    changes.update((row_ids[key], None) for key in removed)
+    changes.update((base.next_row_id + i, _record(row)) for i, row in enumerate(added))
+    updated = base.with_changes(changes)
+
+    expected_rows = [changed.get(row[:3], row) for row in BASE_ROWS if row[:3] not in removed] + added
+    fresh = VehicleIndex(pd.DataFrame(expected_rows, columns=COLUMNS))
+
+    assert _observed(updated) == _observed(fresh)
+    # La versión anterior sigue intacta para las consultas en curso
+    assert _observed(base) == _observed(VehicleIndex(pd.DataFrame(BASE_ROWS, columns=COLUMNS)))
+
+
+def test_with_changes_keeps_row_ids_of_untouched_rows():
+    base = VehicleIndex(pd.DataFrame(BASE_ROWS, columns=COLUMNS))
+
+    updated = base.with_changes({0: None, base.next_row_id: _record(("Kia", "EV9", 2024, 99.8))})
+
+    assert updated.get_row(0) is None
+    assert updated.row(3)["MODEL"] == "EV6 Long Range AWD"
+    assert updated.row(len(BASE_ROWS))["MODEL"] == "EV9"
+    assert updated.lookup("tesla", "model 3 long range awd")[0] != 0
+    assert base.lookup("tesla", "model 3 long range awd") == (0, VehicleIndex.STAGE_EXACT)
@@ -0,0 +1,107 @@
+"""`VehicleIndex.lookup` frente a la cascada original de `find_vehicle_row` sobre EV-DB."""
+
+import os
+import random
+
+import pandas as pd
+import pytest
+
+from src.core.vehicle_index import VehicleIndex, normalize_text
+
+
+EV_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "EV-DB.csv")
+
+
+def reference_find_vehicle_row(df_tmp: pd.DataFrame, brand_n: str, model_n: str):
+    """Copia de la cascada de `find_vehicle_row` anterior al índice (sin los prints).
+
+    Devuelve (posición de la fila en el CSV, etapa) o (None, None).
+    `df_tmp` ya trae BRAND_N / MODEL_N, como los calculaba la versión original.
+    Única diferencia: `regex=False`. La original pasaba el texto del usuario
+    como regex (un "(" lanzaba `re.error` y "id.3" casaba con "idx3"); el
+    índice compara subcadenas literales.
+    """
+    # 1) match exacto normalizado
+    mask_exact = (df_tmp["BRAND_N"] == brand_n) & (df_tmp["MODEL_N"] == model_n)
+    subset = df_tmp[mask_exact]
+    if len(subset) > 0:
+        return subset.index[0], VehicleIndex.STAGE_EXACT
+
+    # 2) BRAND contiene brand_n y MODEL contiene model_n (subcadena)
+    mask_contains = (
+        df_tmp["BRAND_N"].str.contains(brand_n, na=False, regex=False) &
+        df_tmp["MODEL_N"].str.contains(model_n, na=False, regex=False)
+    )
+    subset = df_tmp[mask_contains]
+    if len(subset) > 0:
+        return subset.index[0], VehicleIndex.STAGE_CONTAINS
+
+    # 3) BRAND coincide y cualquier token relevante del modelo aparece en MODEL
+    model_tokens = [t for t in model_n.split() if len(t) >= 3]
+    if model_tokens:
+        mask_token = df_tmp["BRAND_N"].str.contains(brand_n, na=False, regex=False)
+        for tok in model_tokens:
+            mask_token &= df_tmp["MODEL_N"].str.contains(tok, na=False, regex=False)
+        subset = df_tmp[mask_token]
+        if len(subset) > 0:
+            return subset.index[0], VehicleIndex.STAGE_TOKENS
+
+    # 4) Último recurso: ignorar brand y matchear solo por MODEL (contiene)
+    mask_model_only = df_tmp["MODEL_N"].str.contains(
+        model_tokens[0] if model_tokens else model_n, na=False, regex=False,
+    )
+    subset = df_tmp[mask_model_only]
+    if len(subset) > 0:
+        return subset.index[0], VehicleIndex.STAGE_MODEL_ONLY
+
+    return None, None
+
+
+@pytest.fixture(scope="module")
+def ev_db():
+    df = pd.read_csv(EV_DB_PATH)
+    df_tmp = df.copy()
+    df_tmp["BRAND_N"] = df_tmp["BRAND"].astype(str).apply(normalize_text)
+    df_tmp["MODEL_N"] = df_tmp["MODEL"].astype(str).apply(normalize_text)
+    return VehicleIndex(df), df_tmp
+
+
+def _queries(df_tmp: pd.DataFrame, n_rows: int = 60, seed: int = 7):
+    """Variantes de brand/model de filas reales que recorren todas las etapas."""
+    rng = random.Random(seed)
+    brands = sorted(set(df_tmp["BRAND_N"]))
+    positions = rng.sample(range(len(df_tmp)), n_rows)
+    queries = []
+    for pos in positions:
+        brand_n, model_n = df_tmp.at[pos, "BRAND_N"], df_tmp.at[pos, "MODEL_N"]
+        tokens = model_n.split()
+        other_brand = rng.choice([b for b in brands if b != brand_n])
+        queries.append((brand_n, model_n))                                   # exacto
+        queries.append((brand_n[: max(2, len(brand_n) - 2)], model_n))      # marca recortada
+        queries.append((brand_n, " ".join(tokens[: max(1, len(tokens) - 1)])))  # prefijo del modelo
+        queries.append((brand_n, " ".join(reversed(tokens))))                # tokens desordenados
+        queries.append((brand_n, f"{tokens[-1]} xx"))                        # token + ruido
+        queries.append((other_brand, model_n))                               # marca equivocada
+        queries.append((brand_n, "zzqx 999"))                                # nada
+    queries += [("tesla", "model 3"), ("kia", "ev6"), ("hyundai", "ioniq 5"), ("zzz", "qqqq")]
+    return queries
+
+
+def test_lookup_matches_the_original_cascade(ev_db):
+    index, df_tmp = ev_db
+
+    stages = set()
+    mismatches = []
+    for brand_n, model_n in _queries(df_tmp):
+        expected = reference_find_vehicle_row(df_tmp, brand_n, model_n)
+        got = index.lookup(brand_n, model_n)
+        stages.add(got[1])
+        if got != expected:
+            mismatches.append(((brand_n, model_n), expected, got))
+
+    assert mismatches == []
+    # Las variantes cubren todas las etapas de la cascada y el caso sin resultado
+    assert stages == {
+        VehicleIndex.STAGE_EXACT, VehicleIndex.STAGE_CONTAINS, VehicleIndex.STAGE_TOKENS,
+        VehicleIndex.STAGE_MODEL_ONLY, None,
+    }
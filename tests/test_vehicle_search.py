@@ -0,0 +1,102 @@
+"""Búsqueda difusa (`VehicleIndex.search`) y `resolve_vehicle` sobre el EV-DB real."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from src.core.resources import resources
+from src.core.vehicle_index import VehicleIndex
+
+
+EV_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "EV-DB.csv")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return VehicleIndex(pd.read_csv(EV_DB_PATH))
+
+
+@pytest.fixture(scope="module")
+def resolve_vehicle(index):
+    resources.override("vehicle_index", index)
+    from src.nlp.llm_ev_assistant import resolve_vehicle
+    return resolve_vehicle
+
+
+def test_misspelled_model_finds_the_right_family(index):
+    candidates = index.search("Hyundai", "Ionic 5")
+
+    assert candidates
+    assert all(c.brand == "Hyundai" and "IONIQ 5" in c.model for c in candidates)
+
+
+def test_specific_model_ranks_above_other_rows_of_the_brand(index):
+    candidates = index.search("Tesla", "Model 3 Long Range", k=5)
+
+    assert [c.model.startswith("Model 3 Long Range") for c in candidates] == [True] * 5
+    others = index.search("Tesla", "Model 3 Long Range", k=40)[5:]
+    assert max(c.score for c in others if not c.model.startswith("Model 3")) < candidates[-1].score
+
+
+def test_year_preference(index):
+    for year in (2019, 2020, 2021):
+        best = index.search("Tesla", "Model 3 Long Range AWD", year=year)[0]
+        assert (best.model, best.year) == ("Model 3 Long Range AWD", year)
+
+    # Año dentro del texto del modelo
+    best = index.search("Kia", "EV6 GT 2022")[0]
+    assert (best.model, best.year) == ("EV6 GT", 2022)
+    # Sin año: se prefiere el más reciente
+    assert index.search("Kia", "EV6 GT")[0].year == 2025
+
+
+def test_pruned_search_keeps_the_same_best_candidate(index, monkeypatch):
+    queries = [("Tesla", "Model"), ("Kia", "EV6"), ("Hyundai", "Ionic 5"), (None, "ID.3"), ("BMW", "i4")]
+    pruned = [index.search(b, m)[0].row_id for b, m in queries]
+
+    monkeypatch.setattr(VehicleIndex, "MAX_SCORED_CANDIDATES", 10 ** 9)
+    assert [index.search(b, m)[0].row_id for b, m in queries] == pruned
+
+
+def test_resolve_vehicle_confident_match(resolve_vehicle):
+    row, candidates = resolve_vehicle("Kia", "EV6 GT", year=2022)
+
+    assert (row["MODEL"], row["MODEL.1"]) == ("EV6 GT", 2022)
+    assert candidates[0].model == "EV6 GT"
+
+
+def test_resolve_vehicle_same_name_rivals_are_not_ambiguous(resolve_vehicle):
+    # Los dos primeros son "EV6 GT" de distintos años: no cuenta como ambigüedad
+    row, _ = resolve_vehicle("Kia", "EV6")
+
+    assert row is not None and row["MODEL"] == "EV6 GT"
+
+
+def test_resolve_vehicle_ambiguous_between_versions(resolve_vehicle):
+    # RWD y AWD puntúan casi igual: hay que preguntar
+    row, candidates = resolve_vehicle("Tesla", "Model 3 Long Range")
+
+    assert row is None
+    assert {c.model for c in candidates[:3]} >= {"Model 3 Long Range RWD", "Model 3 Long Range AWD"}
+
+
+def test_resolve_vehicle_low_similarity_is_ambiguous(resolve_vehicle):
+    row, candidates = resolve_vehicle("Hyundai", "Ionic 5")
+
+    assert row is None
+    assert candidates and "IONIQ 5" in candidates[0].model
+
+
+def test_resolve_vehicle_without_a_match(resolve_vehicle):
+    assert resolve_vehicle("Tesla", None) == (None, [])
+    assert resolve_vehicle("Tesla", "!!!") == (None, [])
+    # Solo coincidencias residuales de trigramas: nunca se acepta sin preguntar
+    row, candidates = resolve_vehicle("Zzz", "qqqq xx")
+    assert row is None and all(c.similarity < 0.2 for c in candidates)
+
+
+def test_search_records_the_scoring_path(index):
+    assert index.search("Kia", "EV6 GT")[0].path == VehicleIndex.PATH_EXACT
+    assert index.search("Hyundai", "Ionic 5")[0].path == VehicleIndex.PATH_BRAND
+    assert index.search(None, "EV6 GT")[0].path == VehicleIndex.PATH_MODEL_ONLY
@@ -0,0 +1,176 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.core.vehicle_index import VehicleIndex
+from src.core.vehicle_store import VehicleStore
+
+
+COLUMNS = ["BRAND", "MODEL", "MODEL.1", "BATT_CAPACITY"]
+
+ROWS = [
+    ("Tesla", "Model 3 Long Range AWD", 2021, 75.0),
+    ("Tesla", "Model Y Performance", 2022, 75.0),
+    ("Kia", "EV6 Long Range AWD", 2022, 77.4),
+    ("Kia", "Niro EV", 2020, 64.0),
+    ("Hyundai", "Kona Electric", 2019, 64.0),
+    ("Renault", "Zoe R135", 2020, 52.0),
+]
+
+
+def _write(path, rows, columns=COLUMNS):
+    pd.DataFrame(rows, columns=columns).to_csv(path, index=False)
+    # Fuerza un mtime distinto aunque el sistema de archivos tenga poca resolución
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "EV-DB.csv")
+    _write(path, ROWS)
+    return path
+
+
+def _models(index):
+    return [(row["BRAND"], row["MODEL"], row["MODEL.1"]) for _, row in index.iter_rows()]
+
+
+def test_reload_without_changes_is_a_no_op(csv_path):
+    store = VehicleStore(csv_path)
+    index = store.index
+
+    assert store.reload() is None
+    # Mismo contenido con otro mtime: se confirma por sha256
+    _write(csv_path, ROWS)
+    assert store.reload() is None
+    assert store.index is index and store.version == 0
+
+
+def test_reload_applies_added_changed_and_removed_rows_incrementally(csv_path):
+    store = VehicleStore(csv_path)
+    kona_id, _ = store.index.lookup("hyundai", "kona electric")
+    seen = []
+    store.add_listener(lambda index, df: seen.append((index, len(df))))
+
+    rows = [r for r in ROWS if r[1] != "Zoe R135"]
+    rows[3] = ("Kia", "Niro EV", 2020, 64.8)
+    rows.append(("Volkswagen", "ID.3 Pro S", 2023, 77.0))
+    _write(csv_path, rows)
+    report = store.reload()
+
+    assert (report.added, report.changed, report.removed, report.incremental) == (1, 1, 1, True)
+    assert report.version == store.version == 1
+    assert seen == [(store.index, len(rows))]
+    assert _models(store.index) == [r[:3] for r in rows]
+    # Los row_id ya entregados siguen apuntando al mismo vehículo
+    assert store.index.row(kona_id)["MODEL"] == "Kona Electric"
+    assert store.index.row(store.index.lookup("kia", "niro ev")[0])["BATT_CAPACITY"] == 64.8
+    assert store.index.lookup("renault", "zoe r135") == (None, None)
+
+    # Una segunda recarga parte de la versión nueva
+    _write(csv_path, rows + [("Kia", "EV9", 2024, 99.8)])
+    report = store.reload()
+    assert (report.added, report.changed, report.removed) == (1, 0, 0)
+
+
+def _observed(index):
+    """Resultados de las consultas con desempate por orden del CSV, con filas por contenido."""
+    def key(row_id):
+        row = index.row(row_id)
+        return row["BRAND"], row["MODEL"], row["MODEL.1"]
+
+    return {
+        "rows": _models(index),
+        "brands": index.brand_names(),
+        "models": {b: index.model_names(b) for b in index.brand_names()},
+        "lookups": [key(index.lookup(b, m)[0]) for b, m in [("kia", "ev6 long range awd"), ("ki", "ev6")]],
+        "search": [key(c.row_id) for c in index.search("Kia", "EV6 Long Range AWD", year=2022)],
+        "capacity": [key(c.row_id) for c in index.by_capacity(77.4, 1.0)],
+    }
+
+
+def test_incremental_reload_breaks_ties_by_csv_position(csv_path):
+    store = VehicleStore(csv_path)
+
+    # Filas nuevas por encima de otras con la misma marca/modelo (y capacidad):
+    # ahora son ellas las primeras del CSV
+    ev6 = ("EV6 Long Range AWD", 2022, 77.4)
+    rows = [("KIA",) + ev6] + ROWS[:2] + [("Kia",) + ev6] + ROWS[2:]
+    _write(csv_path, rows)
+    report = store.reload()
+
+    assert report.incremental is True and report.added == 2
+    assert _observed(store.index) == _observed(VehicleIndex(pd.read_csv(csv_path)))
+    assert store.index.brand_names()["kia"] == "KIA"
+
+
+def test_incremental_reload_builds_the_capacity_index_before_publishing(csv_path):
+    store = VehicleStore(csv_path)
+
+    _write(csv_path, ROWS + [("Kia", "EV9", 2024, 99.8)])
+    store.reload()
+
+    assert store.index._capacity_index is not None
+    assert [c.model for c in store.index.by_capacity(99.8, 1.0)] == ["EV9"]
+
+
+def test_reload_rebuilds_when_too_many_rows_change(csv_path):
+    store = VehicleStore(csv_path)
+
+    rows = [(b, m, y, kwh + 1.0) for b, m, y, kwh in ROWS[:4]] + ROWS[4:]
+    _write(csv_path, rows)
+    report = store.reload()
+
+    assert report.incremental is False and report.changed == 4
+    assert _models(store.index) == [r[:3] for r in rows]
+    assert [row_id for row_id, _ in store.index.iter_rows()] == list(range(len(rows)))
+
+    # El catálogo se rehace con los row_id renumerados: la siguiente recarga es incremental
+    _write(csv_path, rows[1:])
+    report = store.reload()
+    assert (report.removed, report.incremental) == (1, True)
+    assert _models(store.index) == [r[:3] for r in rows[1:]]
+
+
+def test_reload_rebuilds_when_columns_change(csv_path):
+    store = VehicleStore(csv_path)
+
+    _write(csv_path, [r + ("AWD",) for r in ROWS], columns=COLUMNS + ["DRIVE"])
+    report = store.reload()
+
+    assert report.incremental is False
+    assert store.index.row(0)["DRIVE"] == "AWD"
+
+
+def test_reload_force_without_changes(csv_path):
+    store = VehicleStore(csv_path)
+
+    report = store.reload(force=True)
+
+    assert report.total == 0 and report.incremental is True
+    assert store.version == 1
+
+
+def test_unreadable_csv_is_not_retried_until_it_changes(csv_path, monkeypatch):
+    store = VehicleStore(csv_path)
+    index = store.index
+    reads = []
+    real_read_csv = pd.read_csv
+
+    def failing_read_csv(*args, **kwargs):
+        reads.append(args)
+        raise ValueError("CSV mal formado")
+
+    _write(csv_path, ROWS[:-1])
+    monkeypatch.setattr(pd, "read_csv", failing_read_csv)
+    with pytest.raises(ValueError):
+        store.reload()
+    assert store.reload() is None
+    assert len(reads) == 1 and store.index is index
+
+    monkeypatch.setattr(pd, "read_csv", real_read_csv)
+    _write(csv_path, ROWS[:-2])
+    report = store.reload()
+    assert report.removed == 2